@@ -0,0 +1,198 @@
+import threading
+import time
+from typing import Any, Dict
+
+from botocore.exceptions import ConnectionClosedError, ConnectTimeoutError, EndpointConnectionError, ReadTimeoutError
+
+from request_metrics import THROTTLE_CODES, THROTTLE_STATUS
+
+# 视为过载的网络错误：与限流响应一样触发快速退避
+TIMEOUT_ERRORS = (ReadTimeoutError, ConnectTimeoutError, ConnectionClosedError, EndpointConnectionError)
+
+# 每个评估窗口至少包含的请求数和时长
+MIN_WINDOW_REQUESTS = 4
+MIN_WINDOW_SECONDS = 0.5
+# 延迟基线的下限，避免本地服务上几毫秒的抖动被当作延迟上升
+MIN_BASELINE = 0.005
+# 请求体小于此大小时延迟视为固定开销，更大的请求体按字节数折算预期延迟
+SMALL_BODY = 64 * 1024
+
+
+class AdaptiveLimiter:
+    """AIMD 并发控制：限制同一客户端同时在途的 HTTP 请求数
+
+    挂在 botocore 事件上（before-send 占用名额，needs-retry 释放），因此所有批量操作
+    （文件夹传输、批量删除、复制）都受它约束。每个窗口结束时评估：吞吐量没有下降、
+    延迟接近基线且名额已用满时上限加一（第一次退避之前按一半的比例增长，尽快找到上限）；
+    延迟明显升高时减一；出现限流响应（429/503 SlowDown）或超时时立即减半，冷却期内只减半一次。
+
+    延迟基线按 API 分为固定开销和每字节耗时两部分，带请求体的请求（PutObject、UploadPart）
+    按请求体大小折算预期延迟，大小不一的上传不会被误判为延迟升高。响应体在 needs-retry 时
+    尚未读取（GetObject 的延迟相当于首字节时间），响应字节只计入吞吐量。
+    """
+
+    def __init__(self, initial: int = 8, min_limit: int = 2, max_limit: int = 50,
+                 increase: float = 1.0, decrease: float = 0.5,
+                 latency_tolerance: float = 1.5, latency_limit: float = 2.0, cooldown: float = 1.0):
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.limit = float(min(max(initial, self.min_limit), self.max_limit))
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_tolerance = latency_tolerance
+        self.latency_limit = latency_limit
+        self.cooldown = cooldown
+        self.inflight = 0
+        self.increases = 0
+        self.decreases = 0
+        self.throttle_events = 0
+        self._condition = threading.Condition()
+        self._local = threading.local()
+        # API -> 固定开销（秒），API -> 每字节耗时（秒）
+        self._baseline: Dict[str, float] = {}
+        self._per_byte: Dict[str, float] = {}
+        self._last_decrease = 0.0
+        self._last_rates = None
+        self._slow_start = True
+        self._reset_window()
+
+    def install(self, client):
+        client.meta.events.register('before-send.s3', self._before_send)
+        client.meta.events.register('needs-retry.s3', self._needs_retry)
+
+    def _reset_window(self):
+        self._window_start = time.monotonic()
+        self._window_requests = 0
+        self._window_bytes = 0
+        self._window_timed = 0
+        self._window_ratio = 0.0
+        self._saturated = False
+
+    def acquire(self):
+        with self._condition:
+            while self.inflight >= int(self.limit):
+                self._condition.wait()
+            self.inflight += 1
+            if self.inflight >= int(self.limit):
+                self._saturated = True
+
+    def release(self):
+        with self._condition:
+            self.inflight -= 1
+            self._condition.notify()
+
+    def _before_send(self, request, **kwargs):
+        # 同一线程上一次请求的名额没有释放（调用中途异常退出），先归还
+        if getattr(self._local, 'held', False):
+            self.release()
+        self.acquire()
+        self._local.held = True
+        self._local.started = time.perf_counter()
+        self._local.sent = int(request.headers.get('Content-Length') or 0)
+        # before-send 返回非 None 会被当作响应
+        return None
+
+    def _needs_retry(self, response=None, operation=None, caught_exception=None, **kwargs):
+        # needs-retry 在每次请求（包括重试）结束后都会触发，且与 before-send 在同一线程中
+        if not getattr(self._local, 'held', False):
+            return None
+        self._local.held = False
+        latency = time.perf_counter() - self._local.started
+        overloaded = False
+        received = 0
+        if response is not None:
+            http_response, parsed = response
+            code = (parsed or {}).get('Error', {}).get('Code')
+            overloaded = http_response.status_code in THROTTLE_STATUS or code in THROTTLE_CODES
+            received = int(http_response.headers.get('content-length') or 0)
+        elif isinstance(caught_exception, TIMEOUT_ERRORS):
+            overloaded = True
+        self.release()
+        self.record(operation.name if operation is not None else "", latency, self._local.sent + received,
+                    overloaded, self._local.sent)
+        # 返回值会被当作重试等待时间，重试仍由 botocore 的重试模式决定
+        return None
+
+    def record(self, operation: str, latency: float, nbytes: int = 0, overloaded: bool = False, sent: int = 0):
+        """记录一次请求：nbytes 为收发的总字节数，sent 为请求体字节数（包含在 latency 中）"""
+        now = time.monotonic()
+        with self._condition:
+            if overloaded:
+                self.throttle_events += 1
+                if now - self._last_decrease >= self.cooldown:
+                    self.limit = max(float(self.min_limit), self.limit * self.decrease)
+                    self.decreases += 1
+                    self._slow_start = False
+                    self._last_decrease = now
+                    self._last_rates = None
+                    self._reset_window()
+                return
+
+            self._window_requests += 1
+            self._window_bytes += nbytes
+            expected = self._expected_latency(operation, latency, sent)
+            if expected is not None:
+                self._window_timed += 1
+                self._window_ratio += latency / max(expected, MIN_BASELINE)
+            elapsed = now - self._window_start
+            if self._window_requests >= max(MIN_WINDOW_REQUESTS, int(self.limit)) and elapsed >= MIN_WINDOW_SECONDS:
+                self._evaluate(elapsed)
+
+    def _expected_latency(self, operation: str, latency: float, sent: int):
+        """更新基线并返回这次请求的预期延迟；大请求体的每字节耗时还未知时返回 None（只计入吞吐量）"""
+        # 基线取最小值，并缓慢上浮以适应网络变化
+        if sent < SMALL_BODY:
+            baseline = self._baseline.get(operation)
+            if baseline is None or latency < baseline:
+                baseline = latency
+            else:
+                baseline += (latency - baseline) * 0.01
+            self._baseline[operation] = baseline
+            return baseline
+
+        fixed = self._baseline.get(operation, 0.0)
+        per_byte = max(latency - fixed, 0.0) / sent
+        known = self._per_byte.get(operation)
+        if known is None or per_byte < known:
+            self._per_byte[operation] = per_byte
+        else:
+            self._per_byte[operation] = known + (per_byte - known) * 0.01
+        if known is None:
+            return None
+        return fixed + sent * known
+
+    def _evaluate(self, elapsed: float):
+        request_rate = self._window_requests / elapsed
+        byte_rate = self._window_bytes / elapsed
+        # 窗口内没有可比较延迟的请求时只看吞吐量
+        latency_ratio = self._window_ratio / self._window_timed if self._window_timed else 1.0
+        if latency_ratio > self.latency_limit:
+            self.limit = max(float(self.min_limit), self.limit - self.increase)
+            self.decreases += 1
+            self._slow_start = False
+        elif self._saturated and latency_ratio <= self.latency_tolerance and self._rates_held(request_rate, byte_rate):
+            step = max(self.increase, self.limit * 0.5) if self._slow_start else self.increase
+            self.limit = min(float(self.max_limit), self.limit + step)
+            self.increases += 1
+            self._condition.notify_all()
+        self._last_rates = (request_rate, byte_rate)
+        self._reset_window()
+
+    def _rates_held(self, request_rate: float, byte_rate: float) -> bool:
+        """上次加并发后吞吐量（请求数或字节数）没有下降"""
+        if self._last_rates is None:
+            return True
+        last_requests, last_bytes = self._last_rates
+        return request_rate >= last_requests * 0.95 or (byte_rate > 0 and byte_rate >= last_bytes * 0.95)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._condition:
+            return {
+                'limit': int(self.limit),
+                'inflight': self.inflight,
+                'min': self.min_limit,
+                'max': self.max_limit,
+                'increases': self.increases,
+                'decreases': self.decreases,
+                'throttle_events': self.throttle_events
+            }
@@ -0,0 +1,512 @@
+#!/usr/bin/env python3
+"""S3 文件管理器性能测试
+
+启动本地 S3 兼容服务（moto 或 MinIO），或使用 config.json 中配置的存储桶，对 S3Client
+执行列表、上传、下载、删除、重命名测试，结果以 JSON 输出，可保存后用 compare 对比：
+
+    python benchmark.py --server moto run --output before.json
+    python benchmark.py --server moto --latency-ms 40 --bandwidth 20 run --scenarios small
+    python benchmark.py compare before.json after.json
+    python benchmark.py --server moto small-files --files 2000 --size 4096
+
+--server moto 需要 `pip install "moto[server]"`；--server minio 需要 PATH 中有 minio 可执行文件；
+--server config 使用 --config 指定的配置（测试对象写入 --prefix 下，结束后删除）。
+--latency-ms / --jitter-ms / --bandwidth 在 botocore 事件中注入延迟和带宽限制，用来模拟
+广域网（例如到 R2）的条件。
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from config_manager import ConfigManager
+from transfer_config import MB
+from transfer_scheduler import TokenBucket
+
+SCENARIOS = ('list', 'small', 'huge')
+STAND_IN_BUCKET = "s3fm-benchmark"
+STAND_IN_KEY = "benchmark"
+STAND_IN_SECRET = "benchmark-secret"
+
+
+def percentile(samples: List[float], q: float) -> Optional[float]:
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+class RequestTimer:
+    """通过 botocore 事件记录每个请求的耗时（从发出调用到解析完响应，不含下载流的读取）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._samples: Dict[str, List[float]] = {}
+
+    def install(self, client):
+        client.meta.events.register('before-call.s3', self._before_call)
+        client.meta.events.register('after-call.s3', self._after_call)
+
+    def _before_call(self, model, context, **kwargs):
+        context['benchmark_started'] = time.perf_counter()
+        # before-call 返回非 None 会跳过请求
+        return None
+
+    def _after_call(self, model, context, **kwargs):
+        started = context.pop('benchmark_started', None)
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self._samples.setdefault(model.name, []).append(elapsed)
+
+    def reset(self):
+        with self._lock:
+            self._samples = {}
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            samples = {name: list(values) for name, values in self._samples.items()}
+        result = {}
+        everything = []
+        for name, values in sorted(samples.items()):
+            everything.extend(values)
+            result[name] = self._stats(values)
+        result['all'] = self._stats(everything)
+        return result
+
+    @staticmethod
+    def _stats(values: List[float]) -> Dict[str, Any]:
+        return {
+            'count': len(values),
+            'p50_ms': round(percentile(values, 0.5) * 1000, 2) if values else None,
+            'p99_ms': round(percentile(values, 0.99) * 1000, 2) if values else None
+        }
+
+
+class NetworkShaper:
+    """在 botocore 事件中注入网络条件
+
+    每个请求发送前等待 latency（加上随机抖动）；请求体按上行带宽、GetObject 响应按下行带宽
+    从共享的令牌桶中扣除，多个并发请求共同占用同一条“链路”。带宽单位为字节/秒，0 不限制。
+    """
+
+    def __init__(self, latency: float = 0, jitter: float = 0, upload_rate: float = 0, download_rate: float = 0):
+        self.latency = latency
+        self.jitter = jitter
+        self.upload = TokenBucket(upload_rate)
+        self.download = TokenBucket(download_rate)
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.latency or self.jitter or self.upload.rate or self.download.rate)
+
+    def install(self, client):
+        if not self.enabled:
+            return
+        client.meta.events.register('before-send.s3', self._before_send)
+        client.meta.events.register('after-call.s3.GetObject', self._after_get)
+
+    def _before_send(self, request, **kwargs):
+        delay = self.latency + random.uniform(0, self.jitter)
+        if delay > 0:
+            time.sleep(delay)
+        length = request.headers.get('Content-Length')
+        if length:
+            self.upload.consume(int(length))
+        # before-send 返回非 None 会被当作响应
+        return None
+
+    def _after_get(self, parsed, **kwargs):
+        self.download.consume(parsed.get('ContentLength', 0) or 0)
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            'latency_ms': self.latency * 1000,
+            'jitter_ms': self.jitter * 1000,
+            'upload_mb_per_sec': self.upload.rate / MB,
+            'download_mb_per_sec': self.download.rate / MB
+        }
+
+
+def current_rss() -> int:
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux 单位为 KB，macOS 为字节
+        return peak if sys.platform == 'darwin' else peak * 1024
+    except ImportError:
+        return 0
+
+
+class RssSampler:
+    """测试期间定时采样常驻内存，记录峰值"""
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, current_rss())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.peak = current_rss()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, current_rss())
+
+
+class BenchContext:
+    def __init__(self, args, config_path: str, s3_config: Optional[Dict[str, str]], work_dir: str):
+        self.args = args
+        self.config_path = config_path
+        self.s3_config = s3_config
+        self.work_dir = work_dir
+        self.prefix = f"{args.prefix.strip('/')}/{int(time.time())}"
+        self.timer = RequestTimer()
+        self.shaper = NetworkShaper(args.latency_ms / 1000, args.jitter_ms / 1000,
+                                    args.bandwidth * MB, args.bandwidth * MB)
+        self.results: List[Dict[str, Any]] = []
+
+    def client(self, overrides: Optional[Dict[str, Any]] = None):
+        from s3_client import S3Client
+
+        config_manager = ConfigManager(self.config_path)
+        if self.s3_config is not None:
+            config_manager.config['s3_config'].update(self.s3_config)
+        # 只修改内存中的设置，不写回配置文件
+        config_manager.config['app_settings'].update(overrides or {})
+        s3 = S3Client(config_manager)
+        if s3.client is None:
+            raise RuntimeError("无法创建 S3 客户端")
+        self.timer.install(s3.client)
+        self.shaper.install(s3.client)
+        return s3
+
+    def measure(self, name: str, fn, objects_of=None, bytes_of=None) -> Dict[str, Any]:
+        """执行 fn 并记录耗时、请求延迟和内存峰值；objects_of/bytes_of 从 fn 的返回值中取出处理量"""
+        self.timer.reset()
+        with RssSampler() as rss:
+            started = time.perf_counter()
+            value = fn()
+            elapsed = time.perf_counter() - started
+        objects = objects_of(value) if objects_of else 0
+        nbytes = bytes_of(value) if bytes_of else 0
+        result = {
+            'scenario': name,
+            'objects': objects,
+            'bytes': nbytes,
+            'seconds': round(elapsed, 3),
+            'objects_per_sec': round(objects / elapsed, 1) if elapsed else None,
+            'mb_per_sec': round(nbytes / MB / elapsed, 2) if elapsed and nbytes else None,
+            'latency': self.timer.summary(),
+            'peak_rss_mb': round(rss.peak / MB, 1)
+        }
+        self.results.append(result)
+        print(f"{name}: {objects} 个对象, {elapsed:.2f} 秒", file=sys.stderr)
+        return result
+
+
+def make_tree(root: str, files: int, size: int, per_folder: int = 100) -> int:
+    """生成 files 个 size 字节的文件，每个子目录最多 per_folder 个，返回总字节数"""
+    block = os.urandom(min(size, 4 * MB))
+    for index in range(files):
+        folder = os.path.join(root, f"d{index // per_folder:05d}")
+        os.makedirs(folder, exist_ok=True)
+        with open(os.path.join(folder, f"f{index:07d}.bin"), 'wb') as f:
+            remaining = size
+            while remaining > 0:
+                f.write(block[:remaining])
+                remaining -= len(block)
+    return files * size
+
+
+def seed_keys(s3, prefix: str, count: int, workers: int = 32):
+    """直接用 put_object 写入 count 个空对象（不计入测试时间）"""
+    def put(index):
+        s3.client.put_object(Bucket=s3.bucket_name, Key=f"{prefix}{index:08d}", Body=b"")
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for _ in executor.map(put, range(count)):
+            pass
+
+
+def bench_list(ctx: BenchContext):
+    for count in ctx.args.keys:
+        s3 = ctx.client({'max_list_objects': count + 1000})
+        prefix = f"{ctx.prefix}/list-{count}/"
+        print(f"写入 {count} 个测试对象...", file=sys.stderr)
+        seed_keys(s3, prefix, count)
+
+        ctx.measure(f"list_objects-{count}", lambda: s3.list_objects(prefix, use_cache=False),
+                    objects_of=lambda value: len(value[1]))
+        ctx.measure(f"iter_object_pages-{count}",
+                    lambda: sum(len(page) for page in s3.iter_object_pages(prefix)),
+                    objects_of=lambda value: value)
+
+        renamed = f"{ctx.prefix}/list-{count}-renamed/"
+        ctx.measure(f"rename_folder-{count}", lambda: s3.rename_folder(prefix, renamed),
+                    objects_of=lambda value: value[0])
+        ctx.measure(f"delete_folder-{count}", lambda: s3.delete_folder(renamed),
+                    objects_of=lambda value: value[0])
+        s3.delete_folder(prefix)
+
+
+def bench_tree(ctx: BenchContext, name: str, files: int, size: int):
+    local = os.path.join(ctx.work_dir, name)
+    download_dir = os.path.join(ctx.work_dir, f"{name}-download")
+    total_bytes = make_tree(local, files, size)
+    s3 = ctx.client()
+    prefix = f"{ctx.prefix}/{name}"
+
+    ctx.measure(f"upload_folder-{name}", lambda: s3.upload_folder(local, prefix),
+                objects_of=lambda value: value[0], bytes_of=lambda value: total_bytes)
+    ctx.measure(f"download_folder-{name}", lambda: s3.download_folder(prefix + "/", download_dir),
+                objects_of=lambda value: value[0], bytes_of=lambda value: total_bytes)
+    s3.delete_folder(prefix + "/")
+    shutil.rmtree(local, ignore_errors=True)
+    shutil.rmtree(download_dir, ignore_errors=True)
+
+
+def bench_small(ctx: BenchContext):
+    bench_tree(ctx, "small", ctx.args.small_files, ctx.args.small_size)
+
+
+def bench_huge(ctx: BenchContext):
+    bench_tree(ctx, "huge", ctx.args.huge_files, ctx.args.huge_size * MB)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port: int, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with socket.socket() as sock:
+            if sock.connect_ex(('127.0.0.1', port)) == 0:
+                return
+        time.sleep(0.2)
+    raise RuntimeError(f"本地 S3 服务未在 {timeout} 秒内启动")
+
+
+@contextlib.contextmanager
+def stand_in(server: str, work_dir: str):
+    """启动本地 S3 兼容服务并创建测试存储桶，返回 s3_config"""
+    port = free_port()
+    endpoint = f"http://127.0.0.1:{port}"
+    process = None
+    moto_server = None
+    if server == 'moto':
+        try:
+            from moto.server import ThreadedMotoServer
+        except ImportError:
+            raise RuntimeError('需要安装 moto: pip install "moto[server]"')
+        moto_server = ThreadedMotoServer(ip_address='127.0.0.1', port=port, verbose=False)
+        moto_server.start()
+    else:
+        executable = shutil.which('minio')
+        if executable is None:
+            raise RuntimeError("未找到 minio 可执行文件")
+        env = dict(os.environ, MINIO_ROOT_USER=STAND_IN_KEY, MINIO_ROOT_PASSWORD=STAND_IN_SECRET)
+        process = subprocess.Popen([executable, 'server', os.path.join(work_dir, 'minio-data'),
+                                    '--address', f"127.0.0.1:{port}", '--quiet'],
+                                   env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_for_port(port)
+        import boto3
+        boto3.client('s3', endpoint_url=endpoint, region_name='us-east-1', aws_access_key_id=STAND_IN_KEY,
+                     aws_secret_access_key=STAND_IN_SECRET).create_bucket(Bucket=STAND_IN_BUCKET)
+        yield {
+            'endpoint': endpoint,
+            'bucket': STAND_IN_BUCKET,
+            'access_key': STAND_IN_KEY,
+            'secret_key': STAND_IN_SECRET,
+            'region': 'us-east-1'
+        }
+    finally:
+        if moto_server is not None:
+            moto_server.stop()
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+
+@contextlib.contextmanager
+def bench_context(args):
+    work_dir = tempfile.mkdtemp(prefix="s3fm-bench-")
+    try:
+        if args.server == 'config':
+            yield BenchContext(args, args.config, None, work_dir)
+        else:
+            with stand_in(args.server, work_dir) as s3_config:
+                # 使用临时配置文件，分片日志、重命名日志也写在临时目录中
+                yield BenchContext(args, os.path.join(work_dir, "config.json"), s3_config, work_dir)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def report(ctx: BenchContext, benchmark: str, **extra) -> Dict[str, Any]:
+    return {
+        'benchmark': benchmark,
+        'time': datetime.now().isoformat(timespec='seconds'),
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'server': ctx.args.server,
+        'shaping': ctx.shaper.describe(),
+        **extra,
+        'results': ctx.results
+    }
+
+
+def cmd_run(args) -> Dict[str, Any]:
+    with bench_context(args) as ctx:
+        for scenario in args.scenarios:
+            {'list': bench_list, 'small': bench_small, 'huge': bench_huge}[scenario](ctx)
+        return report(ctx, 'suite', scenarios=args.scenarios)
+
+
+def cmd_small_files(args) -> Dict[str, Any]:
+    """同一组小文件分别用分片传输管理器（原来的路径）和 put_object 快速路径上传"""
+    with bench_context(args) as ctx:
+        local = os.path.join(ctx.work_dir, "small-files")
+        total_bytes = make_tree(local, args.files, args.size)
+        for mode, overrides in (('managed', {'small_file_threshold': 0}), ('fast_path', {})):
+            s3 = ctx.client(overrides)
+            prefix = f"{ctx.prefix}/small-files-{mode}"
+            ctx.measure(f"upload_folder-{mode}", lambda: s3.upload_folder(local, prefix),
+                        objects_of=lambda value: value[0], bytes_of=lambda value: total_bytes)
+            s3.delete_folder(prefix + "/")
+        before, after = (result['objects_per_sec'] for result in ctx.results)
+        return report(ctx, 'small-files', files=args.files, size=args.size,
+                      speedup=round(after / before, 2) if before and after else None)
+
+
+def cmd_compare(args) -> Dict[str, Any]:
+    """对比两次运行：各场景的吞吐量比值（>1 表示变快）和 p99 延迟变化"""
+    with open(args.baseline, 'r', encoding='utf-8') as f:
+        baseline = {result['scenario']: result for result in json.load(f)['results']}
+    with open(args.candidate, 'r', encoding='utf-8') as f:
+        candidate = {result['scenario']: result for result in json.load(f)['results']}
+
+    def ratio(new, old):
+        return round(new / old, 3) if new and old else None
+
+    comparison = []
+    for name, new in candidate.items():
+        old = baseline.get(name)
+        if old is None:
+            continue
+        comparison.append({
+            'scenario': name,
+            'objects_per_sec': ratio(new['objects_per_sec'], old['objects_per_sec']),
+            'mb_per_sec': ratio(new['mb_per_sec'], old['mb_per_sec']),
+            'p99_ms': [old['latency']['all']['p99_ms'], new['latency']['all']['p99_ms']],
+            'peak_rss_mb': [old['peak_rss_mb'], new['peak_rss_mb']]
+        })
+    return {'benchmark': 'compare', 'baseline': args.baseline, 'candidate': args.candidate,
+            'results': comparison}
+
+
+def int_list(value: str) -> List[int]:
+    return [int(item) for item in value.split(',') if item]
+
+
+def scenario_list(value: str) -> List[str]:
+    scenarios = [item for item in value.split(',') if item]
+    for item in scenarios:
+        if item not in SCENARIOS:
+            raise argparse.ArgumentTypeError(f"未知场景: {item}（可选 {', '.join(SCENARIOS)}）")
+    return scenarios
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="benchmark", description="S3 文件管理器性能测试")
+    parser.add_argument('--server', choices=['moto', 'minio', 'config'], default='moto',
+                        help="moto/minio 在本地启动 S3 兼容服务，config 使用配置文件中的存储桶")
+    parser.add_argument('--config', default="config.json", help="--server config 时使用的配置文件")
+    parser.add_argument('--prefix', default="s3fm-benchmark", help="测试对象写入的前缀")
+    parser.add_argument('--latency-ms', type=float, default=0, help="每个请求注入的延迟（毫秒）")
+    parser.add_argument('--jitter-ms', type=float, default=0, help="延迟的随机抖动上限（毫秒）")
+    parser.add_argument('--bandwidth', type=float, default=0, help="上行/下行带宽上限（MB/s），0 不限制")
+    parser.add_argument('--output', help="同时把结果写入该 JSON 文件")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run = subparsers.add_parser('run', help="运行测试套件")
+    run.add_argument('--scenarios', type=scenario_list, default=list(SCENARIOS),
+                     help="逗号分隔：list（列表/重命名/删除大前缀）、small（大量小文件）、huge（少量大文件）")
+    run.add_argument('--keys', type=int_list, default=[10000, 100000],
+                     help="list 场景的前缀对象数，逗号分隔，如 10000,100000,1000000")
+    run.add_argument('--small-files', type=int, default=10000)
+    run.add_argument('--small-size', type=int, default=4096, help="小文件大小（字节）")
+    run.add_argument('--huge-files', type=int, default=2)
+    run.add_argument('--huge-size', type=int, default=256, help="大文件大小（MB）")
+    run.set_defaults(func=cmd_run)
+
+    small = subparsers.add_parser('small-files', help="大量小文件上传：传输管理器与 put_object 快速路径对比")
+    small.add_argument('--files', type=int, default=2000)
+    small.add_argument('--size', type=int, default=4096)
+    small.set_defaults(func=cmd_small_files)
+
+    compare = subparsers.add_parser('compare', help="对比两次运行的结果文件")
+    compare.add_argument('baseline')
+    compare.add_argument('candidate')
+    compare.set_defaults(func=cmd_compare)
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    try:
+        # 库代码中的 print 输出到标准错误，标准输出只保留 JSON 结果
+        with contextlib.redirect_stdout(sys.stderr):
+            result = args.func(args)
+    except RuntimeError as e:
+        print(f"性能测试失败: {e}", file=sys.stderr)
+        return 1
+    output = json.dumps(result, ensure_ascii=False, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
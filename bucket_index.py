@@ -0,0 +1,341 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from listing_cache import parent_prefix
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS objects (
+    key TEXT PRIMARY KEY,
+    parent TEXT NOT NULL,
+    name TEXT NOT NULL,
+    is_folder INTEGER NOT NULL DEFAULT 0,
+    size INTEGER NOT NULL DEFAULT 0,
+    last_modified REAL,
+    etag TEXT,
+    crawl_id INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_objects_parent ON objects(parent, name);
+CREATE TABLE IF NOT EXISTS meta (
+    name TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def get_index_path(config_manager, endpoint: str, bucket: str) -> str:
+    """索引文件放在 config.json 同级的 bucket_index 目录中，按端点和存储桶区分"""
+    config_path = getattr(config_manager, 'config_path', 'config.json')
+    base_dir = os.path.dirname(os.path.abspath(config_path))
+    digest = hashlib.sha1(f"{endpoint}\n{bucket}".encode('utf-8')).hexdigest()[:16]
+    return os.path.join(base_dir, "bucket_index", f"{bucket}-{digest}.db")
+
+
+def _key_range_end(prefix: str) -> str:
+    # 前缀范围查询的上界，避免 LIKE 对 % 和 _ 的转义问题
+    return prefix + '\U0010ffff'
+
+
+def _to_timestamp(value) -> Optional[float]:
+    if isinstance(value, datetime):
+        return value.timestamp()
+    return value
+
+
+@lru_cache(maxsize=64)
+def _compile(pattern: str):
+    return re.compile(pattern)
+
+
+def _regexp(pattern: str, value: Optional[str]) -> bool:
+    # SQLite 的 X REGEXP Y 调用 regexp(Y, X)
+    return value is not None and _compile(pattern).search(value) is not None
+
+
+def _to_datetime(value: Optional[float]) -> datetime:
+    if value is None:
+        return datetime.fromtimestamp(0, timezone.utc)
+    return datetime.fromtimestamp(value, timezone.utc)
+
+
+class BucketIndex:
+    """存储桶对象的本地 SQLite 索引，按上级前缀建立索引以便即时列出目录"""
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._active_crawl_id = None
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.create_function("REGEXP", 2, _regexp, deterministic=True)
+        self._conn.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _get_meta(self, name: str) -> Optional[str]:
+        row = self._conn.execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, name: str, value: str):
+        self._conn.execute("INSERT OR REPLACE INTO meta(name, value) VALUES (?, ?)", (name, value))
+
+    def _current_crawl_id(self) -> int:
+        # 扫描进行中时增量更新归入本轮扫描，避免扫描结束时被当作过期数据删除
+        if self._active_crawl_id is not None:
+            return self._active_crawl_id
+        return int(self._get_meta('crawl_id') or 0)
+
+    def is_ready(self) -> bool:
+        """是否已完成过至少一次全量扫描"""
+        with self._lock:
+            return self._get_meta('last_crawl') is not None
+
+    def last_crawl_time(self) -> Optional[float]:
+        with self._lock:
+            value = self._get_meta('last_crawl')
+        return float(value) if value else None
+
+    @staticmethod
+    def _folder_rows(key: str, crawl_id: int) -> List[Tuple]:
+        rows = []
+        folder = parent_prefix(key)
+        while folder:
+            parent = parent_prefix(folder)
+            rows.append((folder, parent, folder[len(parent):].rstrip('/'), 1, 0, None, None, crawl_id))
+            folder = parent
+        return rows
+
+    def _object_row(self, obj: Dict, crawl_id: int) -> Tuple:
+        key = obj['Key']
+        parent = parent_prefix(key)
+        is_folder = 1 if key.endswith('/') else 0
+        name = key[len(parent):].rstrip('/') if is_folder else key[len(parent):]
+        etag = obj.get('ETag', '').strip('"') or None
+        return (key, parent, name, is_folder, obj.get('Size', 0),
+                _to_timestamp(obj.get('LastModified')), etag, crawl_id)
+
+    def _page_rows(self, page: List[Dict], crawl_id: int) -> Iterable[Tuple]:
+        rows = {}
+        for obj in page:
+            for row in self._folder_rows(obj['Key'], crawl_id):
+                rows.setdefault(row[0], row)
+            rows[obj['Key']] = self._object_row(obj, crawl_id)
+        return rows.values()
+
+    def _upsert(self, rows: Iterable[Tuple]):
+        self._conn.executemany(
+            "INSERT INTO objects(key, parent, name, is_folder, size, last_modified, etag, crawl_id) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET size=excluded.size, last_modified=excluded.last_modified, "
+            "etag=COALESCE(excluded.etag, objects.etag), crawl_id=excluded.crawl_id",
+            rows
+        )
+
+    def crawl(self, pages: Iterable[List[Dict]], progress_callback=None) -> int:
+        """用不带分隔符的全量列表重建索引，扫描结束后删除本轮未见到的对象"""
+        with self._lock:
+            crawl_id = int(self._get_meta('crawl_id') or 0) + 1
+            self._active_crawl_id = crawl_id
+        count = 0
+        try:
+            for page in pages:
+                rows = self._page_rows(page, crawl_id)
+                with self._lock, self._conn:
+                    self._upsert(rows)
+                count += len(page)
+                if progress_callback:
+                    progress_callback(count)
+
+            with self._lock, self._conn:
+                self._conn.execute("DELETE FROM objects WHERE crawl_id != ?", (crawl_id,))
+                self._set_meta('crawl_id', str(crawl_id))
+                self._set_meta('last_crawl', str(time.time()))
+        finally:
+            with self._lock:
+                self._active_crawl_id = None
+        return count
+
+    def key_quantiles(self, prefix: str, parts: int) -> List[str]:
+        """返回前缀下对象键的分位点，用作并发列表的分片边界"""
+        with self._lock:
+            end = _key_range_end(prefix)
+            total = self._conn.execute(
+                "SELECT COUNT(*) FROM objects WHERE key >= ? AND key < ? AND is_folder = 0", (prefix, end)
+            ).fetchone()[0]
+            if total < parts * 1000:
+                return []
+            boundaries = []
+            for i in range(1, parts):
+                row = self._conn.execute(
+                    "SELECT key FROM objects WHERE key >= ? AND key < ? AND is_folder = 0 "
+                    "ORDER BY key LIMIT 1 OFFSET ?",
+                    (prefix, end, total * i // parts)
+                ).fetchone()
+                if row:
+                    boundaries.append(row[0])
+            return boundaries
+
+    def prefix_stats(self, prefix: str, top: int = 10) -> Dict:
+        """前缀下所有对象（不含文件夹）的数量、总大小、修改时间范围和最大的 top 个对象"""
+        end = _key_range_end(prefix)
+        with self._lock:
+            objects, total_bytes, oldest, newest = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0), MIN(last_modified), MAX(last_modified) "
+                "FROM objects WHERE key >= ? AND key < ? AND is_folder = 0", (prefix, end)
+            ).fetchone()
+            largest = self._conn.execute(
+                "SELECT size, key FROM objects WHERE key >= ? AND key < ? AND is_folder = 0 "
+                "ORDER BY size DESC LIMIT ?", (prefix, end, top)
+            ).fetchall()
+        return {
+            'objects': objects,
+            'bytes': total_bytes,
+            'largest': [(size, key) for size, key in largest],
+            'oldest': _to_datetime(oldest) if oldest is not None else None,
+            'newest': _to_datetime(newest) if newest is not None else None
+        }
+
+    def search(self, prefix: str, match_path: bool = False, like: Optional[str] = None,
+               regex: Optional[str] = None, min_size: Optional[int] = None, max_size: Optional[int] = None,
+               modified_after: Optional[float] = None, modified_before: Optional[float] = None,
+               batch_size: int = 1000) -> Iterable[List[Tuple[str, int, datetime]]]:
+        """分批返回前缀下满足条件的对象 (key, size, last_modified)
+
+        like（ESCAPE '\\'）和 regex 作用于对象名，match_path 时作用于相对于前缀的路径；
+        所有条件都在 SQLite 中过滤。整个存储桶按 rowid 顺序扫描表，其余按键范围查询；
+        按上一批的最后一行续查，批次之间不持有锁。
+        """
+        target = "substr(key, ?)" if match_path else "name"
+        conditions = ["is_folder = 0"]
+        params: List = []
+        for condition, value in ((f"{target} LIKE ? ESCAPE '\\'", like), (f"{target} REGEXP ?", regex),
+                                 ("size >= ?", min_size), ("size <= ?", max_size),
+                                 ("last_modified >= ?", modified_after), ("last_modified < ?", modified_before)):
+            if value is None:
+                continue
+            conditions.append(condition)
+            if match_path and condition.startswith(target):
+                params.append(len(prefix) + 1)
+            params.append(value)
+
+        # 键范围走主键索引；整个存储桶时直接扫描表更快
+        if prefix:
+            order = "key"
+            conditions += ["key > ?", "key < ?"]
+            bounds = [_key_range_end(prefix)]
+            # 前缀本身以 / 结尾，不会是 is_folder = 0 的对象，从前缀开始续查即可
+            last = prefix
+        else:
+            order = "rowid"
+            conditions.append("rowid > ?")
+            bounds = []
+            last = 0
+        sql = (f"SELECT {order}, key, size, last_modified FROM objects WHERE {' AND '.join(conditions)} "
+               f"ORDER BY {order} LIMIT ?")
+        while True:
+            with self._lock:
+                rows = self._conn.execute(sql, params + [last] + bounds + [batch_size]).fetchall()
+            if not rows:
+                return
+            yield [(key, size, _to_datetime(last_modified)) for _, key, size, last_modified in rows]
+            if len(rows) < batch_size:
+                return
+            last = rows[-1][0]
+
+    def list_prefix(self, prefix: str, limit: int = -1) -> Tuple[List[Dict], List[Dict]]:
+        """按 list_objects 的格式返回目录下的文件夹和文件"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, name, is_folder, size, last_modified FROM objects WHERE parent = ? ORDER BY name LIMIT ?",
+                (prefix, limit)
+            ).fetchall()
+        folders = []
+        files = []
+        for key, name, is_folder, size, last_modified in rows:
+            if is_folder:
+                folders.append({'name': name, 'type': 'folder', 'full_path': key})
+            else:
+                files.append({
+                    'name': name,
+                    'type': 'file',
+                    'size': size,
+                    'last_modified': _to_datetime(last_modified),
+                    'full_path': key
+                })
+        return folders, files
+
+    def reconcile_prefix(self, prefix: str, folders: List[Dict], files: List[Dict]) -> bool:
+        """用实时列表结果更新某个目录，返回索引内容是否发生了变化"""
+        with self._lock, self._conn:
+            existing = {
+                row[0]: row[1:]
+                for row in self._conn.execute(
+                    "SELECT key, is_folder, size, last_modified FROM objects WHERE parent = ?", (prefix,)
+                )
+            }
+            live = {}
+            for folder in folders:
+                live[folder['full_path']] = (1, 0, None)
+            for file in files:
+                live[file['full_path']] = (0, file['size'], _to_timestamp(file['last_modified']))
+
+            changed = False
+            for key, (is_folder, size, last_modified) in existing.items():
+                if key in live:
+                    continue
+                changed = True
+                self._conn.execute("DELETE FROM objects WHERE key = ?", (key,))
+                if is_folder:
+                    self._conn.execute("DELETE FROM objects WHERE key >= ? AND key < ?", (key, _key_range_end(key)))
+
+            rows = []
+            for key, value in live.items():
+                if existing.get(key) == value:
+                    continue
+                changed = True
+                is_folder, size, last_modified = value
+                name = key[len(prefix):].rstrip('/')
+                rows.append((key, prefix, name, is_folder, size, last_modified, None, self._current_crawl_id()))
+            self._upsert(rows)
+            return changed
+
+    def record_put(self, s3_key: str, size: int, last_modified: Optional[datetime] = None, etag: str = None):
+        last_modified = last_modified or datetime.now(timezone.utc)
+        obj = {'Key': s3_key, 'Size': size, 'LastModified': last_modified, 'ETag': etag or ''}
+        with self._lock, self._conn:
+            crawl_id = self._current_crawl_id()
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO objects(key, parent, name, is_folder, size, last_modified, etag, crawl_id) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                self._folder_rows(s3_key, crawl_id)
+            )
+            self._upsert([self._object_row(obj, crawl_id)])
+
+    def record_delete(self, s3_key: str):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM objects WHERE key = ?", (s3_key,))
+
+    def record_deletes(self, keys: Iterable[str]):
+        with self._lock, self._conn:
+            self._conn.executemany("DELETE FROM objects WHERE key = ?", ((key,) for key in keys))
+
+    def delete_tree(self, prefix: str):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM objects WHERE key >= ? AND key < ?", (prefix, _key_range_end(prefix)))
+
+    def replace_tree(self, prefix: str, pages: Iterable[List[Dict]]):
+        """用该前缀下的全量列表替换索引中的子树（重命名等批量变更后使用）"""
+        self.delete_tree(prefix)
+        for page in pages:
+            with self._lock, self._conn:
+                self._upsert(self._page_rows(page, self._current_crawl_id()))
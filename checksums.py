@@ -0,0 +1,276 @@
+import base64
+import hashlib
+import threading
+import time
+import zlib
+from typing import Dict, List, Optional
+
+from botocore.exceptions import ClientError
+
+# S3 支持的附加校验算法
+SUPPORTED_ALGORITHMS = ('CRC32', 'CRC32C', 'CRC64NVME', 'SHA1', 'SHA256')
+
+# 按顺序校验时，乱序到达的区间最多在内存中缓存这么多字节，超出后改为最后从磁盘读取
+MAX_REORDER_BUFFER = 256 * 1024 * 1024
+
+READ_BLOCK_SIZE = 1024 * 1024
+
+try:
+    import crc32c as _crc32c
+except ImportError:
+    _crc32c = None
+
+try:
+    from awscrt import checksums as _crt_checksums
+except ImportError:
+    _crt_checksums = None
+
+
+class ChecksumMismatchError(IOError):
+    pass
+
+
+class _CrcHasher:
+    def __init__(self, function, width: int):
+        self._function = function
+        self._width = width
+        self._value = 0
+
+    def update(self, data):
+        self._value = self._function(data, self._value)
+
+    def digest(self) -> bytes:
+        return self._value.to_bytes(self._width, 'big')
+
+
+def is_algorithm_available(algorithm: str) -> bool:
+    if algorithm in ('CRC32', 'SHA1', 'SHA256'):
+        return True
+    if algorithm == 'CRC32C':
+        return _crc32c is not None or _crt_checksums is not None
+    if algorithm == 'CRC64NVME':
+        return _crt_checksums is not None and hasattr(_crt_checksums, 'crc64nvme')
+    return False
+
+
+def new_hasher(algorithm: str):
+    """返回带 update/digest 的哈希对象；CRC32C 需要 crc32c 或 awscrt 包"""
+    if algorithm == 'SHA256':
+        return hashlib.sha256()
+    if algorithm == 'SHA1':
+        return hashlib.sha1()
+    if algorithm == 'CRC32':
+        return _CrcHasher(lambda data, value: zlib.crc32(data, value), 4)
+    if algorithm == 'CRC32C':
+        if _crc32c is not None:
+            return _CrcHasher(lambda data, value: _crc32c.crc32c(data, value), 4)
+        if _crt_checksums is not None:
+            return _CrcHasher(lambda data, value: _crt_checksums.crc32c(data, value), 4)
+    if algorithm == 'CRC64NVME' and is_algorithm_available(algorithm):
+        return _CrcHasher(lambda data, value: _crt_checksums.crc64nvme(data, value), 8)
+    raise ValueError(f"不支持的校验算法: {algorithm}（CRC32C 需要安装 crc32c 或 awscrt）")
+
+
+def checksum_of(algorithm: str, data) -> str:
+    """计算数据的 base64 校验值（与 S3 的 Checksum* 字段格式一致）"""
+    hasher = new_hasher(algorithm)
+    hasher.update(data)
+    return base64.b64encode(hasher.digest()).decode('ascii')
+
+
+def composite_checksum(algorithm: str, part_checksums: List[str]) -> str:
+    """分片上传的组合校验值：各分片校验值（二进制）拼接后再计算一次，后缀为分片数"""
+    combined = b"".join(base64.b64decode(value) for value in part_checksums)
+    return f"{checksum_of(algorithm, combined)}-{len(part_checksums)}"
+
+
+class ExpectedChecksum:
+    """对象上存储的校验值；composite 时 part_sizes 给出各分片大小"""
+
+    def __init__(self, algorithm: str, value: str, part_sizes: Optional[List[int]] = None):
+        self.algorithm = algorithm
+        self.value = value.split('-')[0]
+        self.part_sizes = part_sizes
+
+    @property
+    def composite(self) -> bool:
+        return self.part_sizes is not None
+
+    def to_dict(self) -> Dict:
+        return {
+            'algorithm': self.algorithm,
+            'value': self.value,
+            'type': 'COMPOSITE' if self.composite else 'FULL_OBJECT',
+            'parts': len(self.part_sizes) if self.composite else None
+        }
+
+
+def _pick_checksum(fields: Dict) -> Optional[tuple]:
+    for algorithm in SUPPORTED_ALGORITHMS:
+        value = fields.get(f'Checksum{algorithm}')
+        if value:
+            return algorithm, value
+    return None
+
+
+def fetch_expected_checksum(client, bucket: str, s3_key: str) -> Optional[ExpectedChecksum]:
+    """读取对象的校验值和分片大小；对象没有附加校验值时返回 None
+
+    优先使用 GetObjectAttributes（可获得分片大小），不支持时退回 HeadObject(ChecksumMode=ENABLED)，
+    后者只能校验整体校验值。
+    """
+    try:
+        params = {'Bucket': bucket, 'Key': s3_key, 'ObjectAttributes': ['Checksum', 'ObjectParts'],
+                  'MaxParts': 1000}
+        response = client.get_object_attributes(**params)
+        picked = _pick_checksum(response.get('Checksum', {}))
+        if picked is None:
+            return None
+        algorithm, value = picked
+        object_parts = response.get('ObjectParts')
+        if not object_parts or response['Checksum'].get('ChecksumType') == 'FULL_OBJECT':
+            return ExpectedChecksum(algorithm, value)
+
+        part_sizes = []
+        while True:
+            part_sizes.extend(part['Size'] for part in object_parts.get('Parts', []))
+            if not object_parts.get('IsTruncated'):
+                break
+            params['PartNumberMarker'] = object_parts['NextPartNumberMarker']
+            object_parts = client.get_object_attributes(**params).get('ObjectParts', {})
+        if len(part_sizes) != object_parts.get('TotalPartsCount', len(part_sizes)):
+            return None
+        return ExpectedChecksum(algorithm, value, part_sizes)
+    except ClientError:
+        pass
+
+    response = client.head_object(Bucket=bucket, Key=s3_key, ChecksumMode='ENABLED')
+    picked = _pick_checksum(response)
+    if picked is None or '-' in picked[1]:
+        # 组合校验值缺少分片大小信息，无法在下载时校验
+        return None
+    return ExpectedChecksum(*picked)
+
+
+class StreamingChecksum:
+    """按顺序输入对象数据，边下载边计算校验值；组合校验值按分片边界逐片计算"""
+
+    def __init__(self, expected: ExpectedChecksum):
+        self.expected = expected
+        self._hasher = new_hasher(expected.algorithm)
+        self._part_digests: List[bytes] = []
+        self._part_index = 0
+        self._part_remaining = expected.part_sizes[0] if expected.composite and expected.part_sizes else None
+
+    def update(self, data):
+        if self._part_remaining is None:
+            self._hasher.update(data)
+            return
+        view = memoryview(data)
+        while view:
+            if self._part_index >= len(self.expected.part_sizes):
+                raise ChecksumMismatchError("数据长度超出各分片大小之和")
+            take = min(len(view), self._part_remaining)
+            self._hasher.update(view[:take])
+            view = view[take:]
+            self._part_remaining -= take
+            if self._part_remaining == 0:
+                self._finish_part()
+
+    def _finish_part(self):
+        self._part_digests.append(self._hasher.digest())
+        self._hasher = new_hasher(self.expected.algorithm)
+        self._part_index += 1
+        sizes = self.expected.part_sizes
+        self._part_remaining = sizes[self._part_index] if self._part_index < len(sizes) else 0
+
+    def result(self) -> str:
+        if not self.expected.composite:
+            return base64.b64encode(self._hasher.digest()).decode('ascii')
+        combined = new_hasher(self.expected.algorithm)
+        combined.update(b"".join(self._part_digests))
+        return base64.b64encode(combined.digest()).decode('ascii')
+
+    def verify(self):
+        actual = self.result()
+        if actual != self.expected.value:
+            raise ChecksumMismatchError(
+                f"{self.expected.algorithm} 校验失败: 期望 {self.expected.value}，实际 {actual}")
+
+
+class OrderedChecksumFeeder:
+    """把并发下载的区间按偏移顺序送入 StreamingChecksum
+
+    区间按到达顺序提交；紧接着已校验位置的区间立即计算，其余暂存在内存中。
+    暂存超过上限的区间和续传前已完成的区间在结束时从临时文件中按顺序读取。
+    """
+
+    def __init__(self, expected: ExpectedChecksum, range_size: int, size: int,
+                 max_buffer: int = MAX_REORDER_BUFFER):
+        self.stream = StreamingChecksum(expected)
+        self.range_size = range_size
+        self.size = size
+        self.max_buffer = max_buffer
+        self._next = 0
+        self._pending: Dict[int, List[bytes]] = {}
+        self._buffered = 0
+        self._lock = threading.Lock()
+
+    def submit(self, index: int, chunks: Optional[List[bytes]]):
+        """chunks 为 None 表示该区间的数据不保留在内存中"""
+        with self._lock:
+            if chunks is None or (index != self._next and
+                                  self._buffered + sum(len(c) for c in chunks) > self.max_buffer):
+                # 该区间留到 finish 时从临时文件读取
+                return
+            self._pending[index] = chunks
+            self._buffered += sum(len(c) for c in chunks)
+            self._drain()
+
+    def _drain(self):
+        while self._next in self._pending:
+            chunks = self._pending.pop(self._next)
+            for chunk in chunks:
+                self.stream.update(chunk)
+                self._buffered -= len(chunk)
+            self._next += 1
+
+    @property
+    def range_count(self) -> int:
+        return max(1, (self.size + self.range_size - 1) // self.range_size) if self.size else 0
+
+    def _read_range(self, f, index: int):
+        start = index * self.range_size
+        f.seek(start)
+        remaining = min(self.range_size, self.size - start)
+        while remaining > 0:
+            block = f.read(min(READ_BLOCK_SIZE, remaining))
+            if not block:
+                break
+            self.stream.update(block)
+            remaining -= len(block)
+
+    def catch_up(self, temp_path: str, is_done):
+        """续传时先从临时文件读取开头连续的已完成区间"""
+        with self._lock, open(temp_path, 'rb') as f:
+            while self._next < self.range_count and is_done(self._next):
+                self._read_range(f, self._next)
+                self._next += 1
+
+    def finish(self, temp_path: str):
+        """补齐剩余区间（从临时文件读取）并校验"""
+        with self._lock, open(temp_path, 'rb') as f:
+            while self._next < self.range_count:
+                if self._next in self._pending:
+                    self._drain()
+                    continue
+                self._read_range(f, self._next)
+                self._next += 1
+        self.stream.verify()
+
+
+def verification_result(expected: Optional[ExpectedChecksum], status: str, message: str = "") -> Dict:
+    result = {'status': status, 'time': time.time(), 'message': message}
+    if expected is not None:
+        result.update(expected.to_dict())
+    return result
@@ -33,6 +33,30 @@ class ConfigManager:
                 "max_concurrent_uploads": 5,
                 "max_concurrent_downloads": 3,
                 "chunk_size": 8388608,
+                "multipart_threshold": 8388608,
+                "multipart_concurrency": 10,
+                "max_inflight_bytes": 268435456,
+                "resumable_threshold": 67108864,
+                "max_concurrent_copies": 16,
+                "max_inflight_deletes": 4,
+                "listing_cache_ttl": 300,
+                "listing_cache_max_bytes": 67108864,
+                "use_bucket_index": False,
+                "listing_shards": 8,
+                "checksum_algorithm": "",
+                "verify_download_checksums": False,
+                "max_concurrent_transfers": 8,
+                "bandwidth_limit": 0,
+                "small_file_threshold": 1048576,
+                "small_file_concurrency": 32,
+                "adaptive_concurrency": True,
+                "adaptive_initial_requests": 8,
+                "adaptive_min_requests": 2,
+                "adaptive_max_requests": 50,
+                "retry_mode": "adaptive",
+                "max_retry_attempts": 5,
+                "folder_stats_ttl": 600,
+                "auto_folder_sizes": True,
                 "auto_create_folders": True,
                 "max_list_objects": 10000
             },
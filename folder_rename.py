@@ -0,0 +1,267 @@
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Set, Tuple
+
+from transfer_config import choose_part_size, MB, GB
+
+# copy_object 单次最多复制 5GB，超过需要 upload_part_copy
+MAX_COPY_OBJECT_SIZE = 5 * GB
+COPY_PART_SIZE = 512 * MB
+
+
+def copy_object(client, bucket: str, src_key: str, dst_key: str, size: Optional[int] = None):
+    """服务端复制对象，超过 5GB 的对象使用分片复制"""
+    copy_source = {'Bucket': bucket, 'Key': src_key}
+    if size is None or size <= MAX_COPY_OBJECT_SIZE:
+        client.copy_object(CopySource=copy_source, Bucket=bucket, Key=dst_key)
+        return
+
+    head = client.head_object(Bucket=bucket, Key=src_key)
+    create_args = {'Bucket': bucket, 'Key': dst_key, 'Metadata': head.get('Metadata', {})}
+    if head.get('ContentType'):
+        create_args['ContentType'] = head['ContentType']
+    upload_id = client.create_multipart_upload(**create_args)['UploadId']
+
+    try:
+        part_size = choose_part_size(size, COPY_PART_SIZE)
+        parts = []
+        for index, start in enumerate(range(0, size, part_size)):
+            end = min(start + part_size, size) - 1
+            response = client.upload_part_copy(
+                Bucket=bucket,
+                Key=dst_key,
+                UploadId=upload_id,
+                PartNumber=index + 1,
+                CopySource=copy_source,
+                CopySourceRange=f"bytes={start}-{end}"
+            )
+            parts.append({'PartNumber': index + 1, 'ETag': response['CopyPartResult']['ETag']})
+
+        client.complete_multipart_upload(
+            Bucket=bucket,
+            Key=dst_key,
+            UploadId=upload_id,
+            MultipartUpload={'Parts': parts}
+        )
+    except Exception:
+        client.abort_multipart_upload(Bucket=bucket, Key=dst_key, UploadId=upload_id)
+        raise
+
+
+class RenameJournal:
+    """重命名日志：记录进行中的文件夹重命名，便于中断后继续或回滚
+
+    .json 保存状态和计数；.keys 每行为 + 或 - 加一个 JSON 编码的相对路径：复制前记录本次重命名
+    要复制到新前缀的对象（+，开始前已确认新前缀下没有其他对象），复制失败的再记录一次（-）。
+    回滚只处理复制过的对象，新前缀下其他的对象不受影响。
+    """
+
+    def __init__(self, journal_dir: str, bucket: str, old_prefix: str, new_prefix: str):
+        self.journal_dir = journal_dir
+        digest = hashlib.sha1(f"{bucket}\n{old_prefix}\n{new_prefix}".encode('utf-8')).hexdigest()
+        self.path = os.path.join(journal_dir, f"{digest}.json")
+        self.keys_path = os.path.join(journal_dir, f"{digest}.keys")
+        self.data = {
+            'bucket': bucket,
+            'old_prefix': old_prefix,
+            'new_prefix': new_prefix,
+            'state': 'running',
+            'started': time.time(),
+            'moved': 0,
+            'failed': 0
+        }
+
+    def save(self):
+        os.makedirs(self.journal_dir, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.data, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def load(self):
+        """继续未完成的重命名时读取已有的状态和计数"""
+        with open(self.path, 'r', encoding='utf-8') as f:
+            self.data.update(json.load(f))
+
+    def record_keys(self, suffixes: List[str], copied: bool = True):
+        if not suffixes:
+            return
+        os.makedirs(self.journal_dir, exist_ok=True)
+        mark = '+' if copied else '-'
+        with open(self.keys_path, 'a', encoding='utf-8') as f:
+            f.write(''.join(mark + json.dumps(suffix, ensure_ascii=False) + '\n' for suffix in suffixes))
+            f.flush()
+            os.fsync(f.fileno())
+
+    def copied_suffixes(self) -> Set[str]:
+        suffixes = set()
+        try:
+            with open(self.keys_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        suffix = json.loads(line[1:])
+                    except ValueError:
+                        # 中断时写了一半的最后一行
+                        continue
+                    if line.startswith('+'):
+                        suffixes.add(suffix)
+                    else:
+                        suffixes.discard(suffix)
+        except FileNotFoundError:
+            pass
+        return suffixes
+
+    def remove(self):
+        for path in (self.path, self.keys_path):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    @staticmethod
+    def list_pending(journal_dir: str, bucket: str) -> List[Dict[str, Any]]:
+        pending = []
+        if not os.path.isdir(journal_dir):
+            return pending
+        for name in os.listdir(journal_dir):
+            if not name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(journal_dir, name), 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if data.get('bucket') == bucket:
+                pending.append(data)
+        return pending
+
+
+class FolderRenamer:
+    """分页列出前缀，并发服务端复制，确认复制成功后批量删除源对象"""
+
+    def __init__(self, s3_client, journal_dir: str, max_workers: int = 16):
+        self.s3_client = s3_client
+        self.client = s3_client.client
+        self.bucket = s3_client.bucket_name
+        self.journal_dir = journal_dir
+        self.max_workers = max(1, max_workers)
+
+    def _copy(self, src_key: str, dst_key: str, size: int) -> bool:
+        try:
+            copy_object(self.client, self.bucket, src_key, dst_key, size)
+            return True
+        except Exception as e:
+            print(f"复制对象失败 {src_key} -> {dst_key}: {e}")
+            return False
+
+    def _delete_keys(self, keys: List[str]) -> int:
+        # 重命名和回滚结束后由 S3Client 整体失效两个前缀，不逐个键更新缓存
+        deleted, failures = self.s3_client.delete_keys_batch(keys, record=False)
+        for failure in failures:
+            print(f"删除失败: {failure['Key']} - {failure['Message']}")
+        return deleted
+
+    def _move_pages(self, src_prefix: str, dst_prefix: str, executor, progress_callback=None,
+                    only_suffixes: Optional[Set[str]] = None,
+                    journal: Optional[RenameJournal] = None) -> Tuple[int, int, int]:
+        """复制 src_prefix 下的对象到 dst_prefix 后删除源对象；only_suffixes 限定只移动这些相对路径，
+        journal 不为 None 时在日志中记录复制的相对路径
+        """
+        moved = 0
+        failed = 0
+        total = 0
+        for page in self.s3_client.iter_object_pages(src_prefix):
+            jobs = []
+            for obj in page:
+                suffix = obj['Key'][len(src_prefix):]
+                if only_suffixes is not None and suffix not in only_suffixes:
+                    continue
+                jobs.append((obj['Key'], dst_prefix + suffix, obj.get('Size', 0)))
+            total += len(jobs)
+            if journal is not None:
+                journal.record_keys([job[0][len(src_prefix):] for job in jobs])
+
+            results = executor.map(lambda job: self._copy(*job), jobs)
+            copied = [job[0] for job, ok in zip(jobs, results) if ok]
+            failed += len(jobs) - len(copied)
+            if journal is not None and len(copied) < len(jobs):
+                copied_keys = set(copied)
+                journal.record_keys([job[0][len(src_prefix):] for job in jobs if job[0] not in copied_keys],
+                                    copied=False)
+
+            # 只删除已确认复制成功的源对象，删除失败的源对象同样计入失败
+            deleted = self._delete_keys(copied)
+            moved += deleted
+            failed += len(copied) - deleted
+            if progress_callback:
+                progress_callback(moved, failed, total)
+        return moved, failed, total
+
+    def _check_destination(self, old_prefix: str, new_prefix: str, journal: RenameJournal):
+        """新旧前缀不能互相包含；新前缀下只能有本次重命名（继续时）复制过去的对象"""
+        if new_prefix.startswith(old_prefix) or old_prefix.startswith(new_prefix):
+            raise ValueError(f"目标 {new_prefix} 与源 {old_prefix} 互相包含")
+        copied = journal.copied_suffixes() if journal.exists() else set()
+        for page in self.s3_client.iter_object_pages(new_prefix):
+            for obj in page:
+                if obj['Key'][len(new_prefix):] not in copied:
+                    raise ValueError(f"目标 {new_prefix} 已存在对象: {obj['Key']}")
+
+    def rename(self, old_prefix: str, new_prefix: str, progress_callback=None) -> Tuple[int, int]:
+        journal = RenameJournal(self.journal_dir, self.bucket, old_prefix, new_prefix)
+        self._check_destination(old_prefix, new_prefix, journal)
+        if journal.exists():
+            # 继续未完成的重命名，保留已记录的复制列表
+            journal.load()
+            journal.data['state'] = 'running'
+        else:
+            journal.remove()
+        journal.save()
+
+        def report(moved, failed, total):
+            journal.data['moved'] = moved
+            journal.data['failed'] = failed
+            journal.save()
+            if progress_callback:
+                progress_callback(moved, failed, total)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            moved, failed, total = self._move_pages(old_prefix, new_prefix, executor, report,
+                                                    journal=journal)
+
+        if failed:
+            # 保留日志，之后可以继续或回滚
+            journal.data['state'] = 'incomplete'
+            journal.save()
+        else:
+            journal.remove()
+        return moved, total
+
+    def rollback(self, old_prefix: str, new_prefix: str, progress_callback=None) -> Tuple[int, int]:
+        """把本次重命名复制到新前缀的对象移回旧前缀；源对象仍在旧前缀的只删除其副本
+
+        只处理日志中记录的对象，新前缀下原有的对象不会被移动或删除。
+        """
+        journal = RenameJournal(self.journal_dir, self.bucket, old_prefix, new_prefix)
+        copied = journal.copied_suffixes()
+        remaining = set()
+        for page in self.s3_client.iter_object_pages(old_prefix):
+            for obj in page:
+                suffix = obj['Key'][len(old_prefix):]
+                if suffix in copied:
+                    remaining.add(suffix)
+        self._delete_keys([new_prefix + suffix for suffix in sorted(remaining)])
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            moved, failed, total = self._move_pages(new_prefix, old_prefix, executor, progress_callback,
+                                                    only_suffixes=copied - remaining)
+
+        if not failed:
+            journal.remove()
+        return moved, total
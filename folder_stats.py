@@ -0,0 +1,161 @@
+import heapq
+import os
+import threading
+from bisect import bisect_left
+import time
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+# 统计结果中保留的最大对象个数
+DEFAULT_TOP = 10
+# 记录最近的失效操作条数，用于判断扫描期间前缀是否发生过变化
+INVALIDATION_HISTORY = 1024
+
+
+def stats_result(prefix: str, objects: int, total_bytes: int, largest: List[Tuple[int, str]],
+                 oldest: Optional[datetime], newest: Optional[datetime], source: str) -> Dict[str, Any]:
+    """统一的统计结果格式，largest 为 (大小, 键) 列表"""
+    return {
+        'prefix': prefix,
+        'objects': objects,
+        'bytes': total_bytes,
+        'largest': [{'key': key, 'size': size} for size, key in sorted(largest, reverse=True)],
+        'oldest': oldest,
+        'newest': newest,
+        'source': source,
+        'computed_at': time.time()
+    }
+
+
+def _contains_prefix(sorted_keys: List[str], prefix: str) -> bool:
+    """已排序的键中是否有以 prefix 开头的"""
+    index = bisect_left(sorted_keys, prefix)
+    return index < len(sorted_keys) and sorted_keys[index].startswith(prefix)
+
+
+class FolderStats:
+    """流式累计前缀下所有对象的数量、总大小、最大的若干对象和修改时间范围
+
+    按页调用 add_page，内存占用只与 top 有关；文件夹占位对象（以 / 结尾的空对象）不计入。
+    """
+
+    def __init__(self, prefix: str, top: int = DEFAULT_TOP):
+        self.prefix = prefix
+        self.top = top
+        self.objects = 0
+        self.bytes = 0
+        self.oldest: Optional[datetime] = None
+        self.newest: Optional[datetime] = None
+        self._largest: List[Tuple[int, str]] = []
+
+    def add_page(self, page: List[Dict]):
+        for obj in page:
+            key = obj['Key']
+            if key.endswith('/'):
+                continue
+            size = obj.get('Size', 0)
+            self.objects += 1
+            self.bytes += size
+            if len(self._largest) < self.top:
+                heapq.heappush(self._largest, (size, key))
+            elif size > self._largest[0][0]:
+                heapq.heapreplace(self._largest, (size, key))
+            last_modified = obj.get('LastModified')
+            if last_modified is not None:
+                if self.oldest is None or last_modified < self.oldest:
+                    self.oldest = last_modified
+                if self.newest is None or last_modified > self.newest:
+                    self.newest = last_modified
+
+    def to_dict(self, source: str = 'scan') -> Dict[str, Any]:
+        return stats_result(self.prefix, self.objects, self.bytes, self._largest, self.oldest, self.newest, source)
+
+
+class FolderStatsCache:
+    """文件夹统计缓存：按 (endpoint, bucket, prefix) 存储，带 TTL 和条目数上限
+
+    对象被上传、删除或移动时使前缀链上的所有统计失效（a/b/c.txt 影响 ""、a/、a/b/）。
+    每次失效递增 generation，统计开始前记录 generation；写入时若期间有失效涉及该前缀
+    则丢弃结果，避免扫描期间发生的变更被过期结果覆盖。
+    """
+
+    def __init__(self, ttl: float = 600, max_entries: int = 4096):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.generation = 0
+        self._entries: "OrderedDict[Tuple[str, str, str], Dict[str, Any]]" = OrderedDict()
+        # (generation, endpoint, bucket, 路径, 是否整个子树)
+        self._history = deque(maxlen=INVALIDATION_HISTORY)
+        self._lock = threading.Lock()
+
+    def get(self, endpoint: str, bucket: str, prefix: str) -> Optional[Dict[str, Any]]:
+        key = (endpoint, bucket, prefix)
+        with self._lock:
+            stats = self._entries.get(key)
+            if stats is None:
+                return None
+            if self.ttl and time.time() - stats['computed_at'] > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return dict(stats)
+
+    def put(self, endpoint: str, bucket: str, prefix: str, stats: Dict[str, Any],
+            generation: Optional[int] = None):
+        with self._lock:
+            if generation is not None and self._changed_since(generation, endpoint, bucket, prefix):
+                return
+            self._entries[(endpoint, bucket, prefix)] = dict(stats)
+            self._entries.move_to_end((endpoint, bucket, prefix))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _changed_since(self, generation: int, endpoint: str, bucket: str, prefix: str) -> bool:
+        if generation == self.generation:
+            return False
+        if not self._history or self._history[0][0] > generation + 1:
+            # 历史记录已不完整（或发生过 clear），保守地认为有变化
+            return True
+        for changed, changed_endpoint, changed_bucket, path, tree in self._history:
+            if changed <= generation or changed_endpoint != endpoint or changed_bucket != bucket:
+                continue
+            if path.startswith(prefix) or (tree and prefix.startswith(path)):
+                return True
+        return False
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._history.clear()
+            self.generation += 1
+
+    def invalidate_key(self, endpoint: str, bucket: str, s3_key: str):
+        """键发生变化后，使包含它的所有前缀的统计失效"""
+        self.invalidate_keys(endpoint, bucket, [s3_key])
+
+    def invalidate_keys(self, endpoint: str, bucket: str, keys: List[str]):
+        """一批键发生变化后（批量删除），使包含其中任一键的前缀的统计失效
+
+        整批只递增一次 generation；历史中记录这批键的公共前缀并按子树处理，
+        判断扫描期间是否有变化时偏保守。
+        """
+        if not keys:
+            return
+        keys = sorted(keys)
+        with self._lock:
+            self.generation += 1
+            self._history.append((self.generation, endpoint, bucket, os.path.commonprefix(keys), len(keys) > 1))
+            for key in [k for k in self._entries
+                        if k[0] == endpoint and k[1] == bucket and _contains_prefix(keys, k[2])]:
+                del self._entries[key]
+
+    def invalidate_tree(self, endpoint: str, bucket: str, prefix: str):
+        """前缀整体变化（删除、重命名文件夹）后，使上级前缀和所有子前缀的统计失效"""
+        with self._lock:
+            self.generation += 1
+            self._history.append((self.generation, endpoint, bucket, prefix, True))
+            for key in [k for k in self._entries
+                        if k[0] == endpoint and k[1] == bucket
+                        and (prefix.startswith(k[2]) or k[2].startswith(prefix))]:
+                del self._entries[key]
@@ -0,0 +1,289 @@
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from transfer_config import choose_part_size, MB
+
+UPLOAD = "upload"
+DOWNLOAD = "download"
+
+COMPARE_MTIME = "mtime"
+COMPARE_CHECKSUM = "checksum"
+
+# 不同文件系统的时间戳精度不同（如 FAT 为 2 秒），比较修改时间时留出容差
+MTIME_TOLERANCE = 2.0
+
+HASH_BLOCK_SIZE = 1 * MB
+
+
+def normalize_prefix(s3_prefix: str) -> str:
+    prefix = s3_prefix.strip('/')
+    return prefix + '/' if prefix else ""
+
+
+def _md5_parts(local_path: str, part_size: int) -> Tuple[str, str]:
+    """返回整个文件的 MD5 以及按 part_size 分片计算的分片 ETag（不含分片数后缀）"""
+    whole = hashlib.md5()
+    part_digests = []
+    with open(local_path, 'rb') as f:
+        while True:
+            part = hashlib.md5()
+            remaining = part_size
+            while remaining > 0:
+                block = f.read(min(HASH_BLOCK_SIZE, remaining))
+                if not block:
+                    break
+                whole.update(block)
+                part.update(block)
+                remaining -= len(block)
+            if remaining == part_size:
+                break
+            part_digests.append(part.digest())
+            if remaining > 0:
+                break
+    return whole.hexdigest(), hashlib.md5(b"".join(part_digests)).hexdigest()
+
+
+def etag_matches(local_path: str, size: int, etag: str, chunk_size: int) -> bool:
+    """用本地文件内容核对对象 ETag
+
+    普通上传的 ETag 是文件 MD5；分片上传的 ETag 为“各分片 MD5 拼接后的 MD5-分片数”，
+    依次尝试本程序使用的分片大小和由分片数推算的分片大小。使用 SSE-KMS 等加密时
+    ETag 不是内容摘要，此时总会判定为不一致。
+    """
+    etag = etag.strip('"')
+    if '-' not in etag:
+        return _md5_parts(local_path, max(size, 1))[0] == etag
+
+    digest, _, count = etag.partition('-')
+    try:
+        part_count = int(count)
+    except ValueError:
+        return False
+    candidates = [choose_part_size(size, chunk_size)]
+    derived = -(-size // part_count)
+    candidates.append(-(-derived // MB) * MB)
+    for part_size in dict.fromkeys(candidates):
+        if -(-size // part_size) != part_count:
+            continue
+        if _md5_parts(local_path, part_size)[1] == digest:
+            return True
+    return False
+
+
+class SyncAction:
+    __slots__ = ('rel_path', 'local_path', 's3_key', 'size', 'mtime', 'reason')
+
+    def __init__(self, rel_path: str, local_path: str, s3_key: str, size: int, mtime: float, reason: str):
+        self.rel_path = rel_path
+        self.local_path = local_path
+        self.s3_key = s3_key
+        self.size = size
+        self.mtime = mtime
+        self.reason = reason
+
+    def to_dict(self) -> Dict:
+        return {'path': self.rel_path, 'key': self.s3_key, 'size': self.size, 'reason': self.reason}
+
+
+class SyncPlan:
+    """一次同步需要执行的变更：transfers 为需要传输的文件，deletes 为目标端多出的文件"""
+
+    def __init__(self, direction: str, local_folder: str, s3_prefix: str, delete: bool):
+        self.direction = direction
+        self.local_folder = local_folder
+        self.s3_prefix = s3_prefix
+        self.delete = delete
+        self.transfers: List[SyncAction] = []
+        # 上传方向为 S3 键，下载方向为本地路径
+        self.deletes: List[str] = []
+        self.unchanged = 0
+
+    @property
+    def transfer_bytes(self) -> int:
+        return sum(action.size for action in self.transfers)
+
+    def summary(self) -> Dict:
+        return {
+            'direction': self.direction,
+            'transfer': len(self.transfers),
+            'transfer_bytes': self.transfer_bytes,
+            'delete': len(self.deletes),
+            'unchanged': self.unchanged
+        }
+
+
+class FolderSync:
+    """比较本地目录和 S3 前缀，只传输新增或变化的文件，可选删除目标端多出的文件"""
+
+    def __init__(self, s3_client, compare: str = COMPARE_MTIME):
+        self.s3_client = s3_client
+        self.compare = compare
+        self.settings = s3_client.get_transfer_settings()
+
+    def scan_local(self, local_folder: str) -> Dict[str, Tuple[int, float]]:
+        files = {}
+        root = Path(local_folder)
+        if not root.is_dir():
+            return files
+        for file_path in root.rglob('*'):
+            if file_path.is_file() and not file_path.name.endswith(('.s3part', '.s3part.json')):
+                stat = file_path.stat()
+                files[file_path.relative_to(root).as_posix()] = (stat.st_size, stat.st_mtime)
+        return files
+
+    def scan_remote(self, s3_prefix: str) -> Dict[str, Tuple[int, float, str]]:
+        objects = {}
+        for page in self.s3_client.iter_object_pages(s3_prefix):
+            for obj in page:
+                rel_path = obj['Key'][len(s3_prefix):]
+                if not rel_path or rel_path.endswith('/'):
+                    continue
+                objects[rel_path] = (obj.get('Size', 0), obj['LastModified'].timestamp(), obj.get('ETag', ''))
+        return objects
+
+    def _content_differs(self, local_path: str, size: int, etag: str) -> bool:
+        try:
+            return not etag_matches(local_path, size, etag, self.settings.chunk_size)
+        except OSError as e:
+            print(f"计算文件摘要失败 {local_path}: {e}")
+            return True
+
+    def plan(self, local_folder: str, s3_prefix: str, direction: str = UPLOAD, delete: bool = False) -> SyncPlan:
+        s3_prefix = normalize_prefix(s3_prefix)
+        plan = SyncPlan(direction, local_folder, s3_prefix, delete)
+        local_files = self.scan_local(local_folder)
+        remote_objects = self.scan_remote(s3_prefix)
+
+        source, target = (local_files, remote_objects) if direction == UPLOAD else (remote_objects, local_files)
+        same_size = []
+        for rel_path, source_info in source.items():
+            local_path = os.path.join(local_folder, *rel_path.split('/'))
+            size, mtime = source_info[0], source_info[1]
+            action = SyncAction(rel_path, local_path, s3_prefix + rel_path, size, mtime, "new")
+            target_info = target.get(rel_path)
+            if target_info is None:
+                plan.transfers.append(action)
+            elif target_info[0] != size:
+                action.reason = "size"
+                plan.transfers.append(action)
+            elif self.compare == COMPARE_CHECKSUM:
+                same_size.append(action)
+            elif self._mtime_changed(direction, mtime, target_info[1]):
+                action.reason = "mtime"
+                plan.transfers.append(action)
+            else:
+                plan.unchanged += 1
+
+        if same_size:
+            # 大小相同的文件按内容核对，摘要计算并行进行
+            with ThreadPoolExecutor(max_workers=self.settings.max_concurrent_uploads) as executor:
+                results = executor.map(
+                    lambda a: self._content_differs(a.local_path, a.size, remote_objects[a.rel_path][2]), same_size)
+                for action, differs in zip(same_size, results):
+                    if differs:
+                        action.reason = "checksum"
+                        plan.transfers.append(action)
+                    else:
+                        plan.unchanged += 1
+
+        if delete:
+            for rel_path in target:
+                if rel_path not in source:
+                    if direction == UPLOAD:
+                        plan.deletes.append(s3_prefix + rel_path)
+                    else:
+                        plan.deletes.append(os.path.join(local_folder, *rel_path.split('/')))
+        return plan
+
+    @staticmethod
+    def _mtime_changed(direction: str, source_mtime: float, target_mtime: float) -> bool:
+        if direction == UPLOAD:
+            # 对象的 LastModified 是上传完成时间，本地文件之后再修改过才需要重新上传
+            return source_mtime > target_mtime + MTIME_TOLERANCE
+        # 下载后会把本地修改时间设为对象的 LastModified，不一致说明对象或本地文件有变化
+        return abs(source_mtime - target_mtime) > MTIME_TOLERANCE
+
+    def _transfer(self, plan: SyncPlan, action: SyncAction, shared_workers: int, job) -> bool:
+        if plan.direction == UPLOAD:
+            return self.s3_client.upload_file(action.local_path, action.s3_key, shared_workers=shared_workers, job=job)
+        success = self.s3_client.download_file(action.s3_key, action.local_path, shared_workers=shared_workers,
+                                               job=job)
+        if success:
+            os.utime(action.local_path, (action.mtime, action.mtime))
+        return success
+
+    def execute(self, plan: SyncPlan, progress_callback=None, errors: Optional[List[Dict[str, str]]] = None,
+                job=None) -> Dict:
+        """执行同步计划，progress_callback 接收统计字典；传输任务提交给全局调度器，job 为空时新建作业"""
+        if plan.direction == UPLOAD:
+            max_workers = self.settings.max_concurrent_uploads
+        else:
+            max_workers = self.settings.max_concurrent_downloads
+        scheduler = self.s3_client.get_scheduler()
+        if job is None:
+            job = scheduler.create_job(f"同步 {plan.local_folder}", max_running=max_workers, presized=True)
+        if job.presized:
+            job.add_bytes_total(plan.transfer_bytes)
+
+        stats = {
+            'files_done': 0,
+            'files_failed': 0,
+            'files_total': len(plan.transfers),
+            'bytes_done': 0,
+            'bytes_total': plan.transfer_bytes,
+            'deleted': 0,
+            'delete_failed': 0,
+            'unchanged': plan.unchanged
+        }
+
+        def report():
+            if progress_callback:
+                progress_callback(dict(stats))
+
+        futures = {scheduler.submit(job, self._transfer, plan, action, scheduler.max_workers, job): action
+                   for action in plan.transfers}
+        job.seal()
+        for future in as_completed(futures):
+            action = futures[future]
+            try:
+                success = future.result()
+            except Exception as e:
+                print(f"同步文件失败 {action.rel_path}: {e}")
+                success = False
+            if success:
+                stats['files_done'] += 1
+                stats['bytes_done'] += action.size
+            else:
+                stats['files_failed'] += 1
+                if errors is not None:
+                    errors.append({'Key': action.s3_key, 'Message': "传输失败"})
+            report()
+
+        if job.cancelled:
+            # 取消后不再删除目标端文件，避免只同步了一部分就开始镜像删除
+            return stats
+
+        if plan.deletes:
+            if plan.direction == UPLOAD:
+                delete_errors = []
+                deleted, _ = self.s3_client.delete_many(plan.deletes, errors=delete_errors)
+                stats['deleted'] = deleted
+                stats['delete_failed'] = len(plan.deletes) - deleted
+                if errors is not None:
+                    errors.extend(delete_errors)
+            else:
+                for local_path in plan.deletes:
+                    try:
+                        os.remove(local_path)
+                        stats['deleted'] += 1
+                    except OSError as e:
+                        print(f"删除本地文件失败 {local_path}: {e}")
+                        stats['delete_failed'] += 1
+                        if errors is not None:
+                            errors.append({'Key': local_path, 'Message': str(e)})
+            report()
+
+        return stats
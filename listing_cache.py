@@ -0,0 +1,143 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# 每个条目的固定开销估算（字典、列表槽位等）
+ITEM_OVERHEAD_BYTES = 400
+
+
+def parent_prefix(key: str) -> str:
+    """返回键所在目录的前缀，如 a/b/c.txt -> a/b/，a/b/ -> a/"""
+    stripped = key.rstrip('/')
+    if '/' not in stripped:
+        return ""
+    return stripped.rsplit('/', 1)[0] + '/'
+
+
+def _estimate_size(folders: List[Dict], files: List[Dict]) -> int:
+    size = 0
+    for item in folders:
+        size += ITEM_OVERHEAD_BYTES + 2 * (len(item['name']) + len(item['full_path']))
+    for item in files:
+        size += ITEM_OVERHEAD_BYTES + 2 * (len(item['name']) + len(item['full_path']))
+    return size
+
+
+class _Entry:
+    __slots__ = ('folders', 'files', 'created', 'size')
+
+    def __init__(self, folders: List[Dict], files: List[Dict]):
+        self.folders = folders
+        self.files = files
+        self.created = time.monotonic()
+        self.size = _estimate_size(folders, files)
+
+
+class ListingCache:
+    """目录列表缓存：按 (endpoint, bucket, prefix) 存储，带 TTL 和内存上限的 LRU 淘汰"""
+
+    def __init__(self, ttl: float = 300, max_bytes: int = 64 * 1024 * 1024):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Tuple[str, str, str], _Entry]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, endpoint: str, bucket: str, prefix: str) -> Optional[Tuple[List[Dict], List[Dict]]]:
+        key = (endpoint, bucket, prefix)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if self.ttl and time.monotonic() - entry.created > self.ttl:
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return list(entry.folders), list(entry.files)
+
+    def put(self, endpoint: str, bucket: str, prefix: str, folders: List[Dict], files: List[Dict]):
+        key = (endpoint, bucket, prefix)
+        entry = _Entry(list(folders), list(files))
+        if entry.size > self.max_bytes:
+            return
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = entry
+            self._bytes += entry.size
+            while self._bytes > self.max_bytes and self._entries:
+                self._remove(next(iter(self._entries)))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry.size
+
+    def invalidate(self, endpoint: str, bucket: str, prefix: str):
+        with self._lock:
+            self._remove((endpoint, bucket, prefix))
+
+    def invalidate_tree(self, endpoint: str, bucket: str, prefix: str, remove_folder: bool = True):
+        """使该前缀及其所有子目录的缓存失效，remove_folder 时还从上级目录中移除该文件夹"""
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == endpoint and k[1] == bucket and k[2].startswith(prefix)]:
+                self._remove(key)
+            parent = self._entries.get((endpoint, bucket, parent_prefix(prefix)))
+            if parent is not None and prefix and remove_folder:
+                parent.folders = [f for f in parent.folders if f['full_path'] != prefix]
+
+    def record_put(self, endpoint: str, bucket: str, s3_key: str, size: int,
+                   last_modified: Optional[datetime] = None):
+        """上传或复制完成后直接更新已缓存的目录列表"""
+        last_modified = last_modified or datetime.now(timezone.utc)
+        with self._lock:
+            self._ensure_ancestors(endpoint, bucket, s3_key)
+            entry = self._entries.get((endpoint, bucket, parent_prefix(s3_key)))
+            if entry is None or s3_key.endswith('/'):
+                return
+            name = s3_key[len(parent_prefix(s3_key)):]
+            files = [f for f in entry.files if f['full_path'] != s3_key]
+            files.append({
+                'name': name,
+                'type': 'file',
+                'size': size,
+                'last_modified': last_modified,
+                'full_path': s3_key
+            })
+            entry.files = files
+
+    def record_delete(self, endpoint: str, bucket: str, s3_key: str):
+        self.record_deletes(endpoint, bucket, [s3_key])
+
+    def record_deletes(self, endpoint: str, bucket: str, keys: Iterable[str]):
+        """批量删除后更新已缓存的目录列表，按上级目录分组，每个目录只重建一次"""
+        by_parent: Dict[str, Set[str]] = {}
+        for key in keys:
+            by_parent.setdefault(parent_prefix(key), set()).add(key)
+        with self._lock:
+            for parent, deleted in by_parent.items():
+                entry = self._entries.get((endpoint, bucket, parent))
+                if entry is not None:
+                    entry.files = [f for f in entry.files if f['full_path'] not in deleted]
+
+    def _ensure_ancestors(self, endpoint: str, bucket: str, s3_key: str):
+        # 为新键的各级目录补上文件夹条目，如 a/b/c.txt 需要 "" 中有 a/，a/ 中有 a/b/
+        folder = parent_prefix(s3_key) if not s3_key.endswith('/') else s3_key
+        while folder:
+            parent = parent_prefix(folder)
+            entry = self._entries.get((endpoint, bucket, parent))
+            if entry is not None and not any(f['full_path'] == folder for f in entry.folders):
+                folders = list(entry.folders)
+                folders.append({
+                    'name': folder[len(parent):].rstrip('/'),
+                    'type': 'folder',
+                    'full_path': folder
+                })
+                entry.folders = folders
+            folder = parent
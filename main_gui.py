@@ -7,9 +7,15 @@ from datetime import datetime
 from pathlib import Path
 import queue
 from typing import List, Dict, Any, Optional
+from concurrent.futures import ThreadPoolExecutor
 
 from config_manager import ConfigManager
 from s3_client import S3Client
+from startup_timing import startup_timer
+from virtual_tree import VirtualTreeView
+from progress_bus import ProgressBus, format_rate, format_eta
+from object_search import SearchQuery, MODE_SUBSTRING, MODE_GLOB, MODE_REGEX, parse_size, parse_date
+from transfer_scheduler import JOB_QUEUED, JOB_RUNNING, JOB_PAUSED, JOB_DONE, JOB_CANCELLED
 
 class S3GUI:
     def __init__(self):
@@ -17,11 +23,17 @@ class S3GUI:
         self.s3_client = None
         self.current_prefix = ""
         self.selected_items = []
-        self.upload_queue = queue.Queue()
-        self.download_queue = queue.Queue()
+        self.listing_cancel = None
+        self.search_active = False
+        self.transfer_window = None
         
         self.setup_ui()
-        self.connect_s3()
+        # 传输进度由总线按固定频率汇总后刷新界面，工作线程不直接更新控件
+        self.progress_bus = ProgressBus(self.transfer_jobs)
+        self.progress_bus.subscribe(self.on_transfer_progress)
+        self.progress_bus.attach(self.root)
+        # 先让窗口显示出来，再开始连接
+        self.root.after_idle(self.on_window_shown)
     
     def setup_ui(self):
         self.root = TkinterDnD.Tk()
@@ -37,6 +49,7 @@ class S3GUI:
         
         self.root.drop_target_register(DND_FILES)
         self.root.dnd_bind('<<Drop>>', self.on_drop)
+        self.root.bind("<Control-f>", lambda e: self.show_search_dialog())
     
     def create_menu(self):
         self.menubar = tk.Menu(self.root)
@@ -53,20 +66,33 @@ class S3GUI:
         file_menu.add_command(label="下载", command=self.download_selected)
         file_menu.add_command(label="删除", command=self.delete_selected)
         file_menu.add_separator()
-        file_menu.add_command(label="刷新", command=self.refresh_view)
+        file_menu.add_command(label="搜索", command=self.show_search_dialog, accelerator="Ctrl+F")
+        file_menu.add_command(label="刷新", command=lambda: self.refresh_view(force=True))
         file_menu.add_separator()
         file_menu.add_command(label="退出", command=self.root.quit)
         
         settings_menu = tk.Menu(self.menubar, tearoff=0)
         self.menubar.add_cascade(label="设置", menu=settings_menu)
         settings_menu.add_command(label="连接设置", command=self.show_connection_settings)
+        settings_menu.add_command(label="清理未完成的分片上传", command=self.cleanup_multipart_uploads)
+        settings_menu.add_command(label="未完成的重命名", command=self.resume_pending_renames)
+        settings_menu.add_command(label="建立本地索引", command=self.build_bucket_index)
+        settings_menu.add_command(label="请求统计", command=self.show_request_stats)
+        
+        transfer_menu = tk.Menu(self.menubar, tearoff=0)
+        self.menubar.add_cascade(label="传输", menu=transfer_menu)
+        transfer_menu.add_command(label="传输列表", command=self.show_transfer_panel)
+        transfer_menu.add_separator()
+        transfer_menu.add_command(label="全部暂停", command=self.pause_all_transfers)
+        transfer_menu.add_command(label="全部继续", command=self.resume_all_transfers)
+        transfer_menu.add_command(label="取消全部", command=self.cancel_all_transfers)
     
     def create_toolbar(self):
         self.toolbar = ttk.Frame(self.root)
         self.toolbar.pack(fill=tk.X, padx=5, pady=5)
         
         ttk.Button(self.toolbar, text="返回上级", command=self.go_parent).pack(side=tk.LEFT, padx=2)
-        ttk.Button(self.toolbar, text="刷新", command=self.refresh_view).pack(side=tk.LEFT, padx=2)
+        ttk.Button(self.toolbar, text="刷新", command=lambda: self.refresh_view(force=True)).pack(side=tk.LEFT, padx=2)
         
         ttk.Separator(self.toolbar, orient=tk.VERTICAL).pack(side=tk.LEFT, fill=tk.Y, padx=5)
         
@@ -80,6 +106,10 @@ class S3GUI:
         ttk.Button(self.toolbar, text="下载", command=self.download_selected).pack(side=tk.LEFT, padx=2)
         ttk.Button(self.toolbar, text="删除", command=self.delete_selected).pack(side=tk.LEFT, padx=2)
         
+        ttk.Separator(self.toolbar, orient=tk.VERTICAL).pack(side=tk.LEFT, fill=tk.Y, padx=5)
+        
+        ttk.Button(self.toolbar, text="搜索", command=self.show_search_dialog).pack(side=tk.LEFT, padx=2)
+        
         self.path_label = ttk.Label(self.toolbar, text="路径: /")
         self.path_label.pack(side=tk.RIGHT, padx=10)
     
@@ -88,7 +118,9 @@ class S3GUI:
         self.main_frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
         
         columns = ("name", "type", "size", "modified")
-        self.tree = ttk.Treeview(self.main_frame, columns=columns, show='tree headings')
+        # 虚拟列表：只创建可见区域的行，十万级条目也能流畅滚动和排序
+        self.tree = VirtualTreeView(self.main_frame, columns=columns, show='tree headings',
+                                    size_formatter=self.format_size)
         
         self.tree.heading("#0", text="名称", anchor=tk.W)
         self.tree.heading("name", text="名称", anchor=tk.W)
@@ -144,6 +176,9 @@ class S3GUI:
         self.progress_bar = ttk.Progressbar(self.status_frame, variable=self.progress_var, 
                                            maximum=100, length=200)
         self.progress_bar.pack(side=tk.RIGHT, padx=10)
+        
+        self.transfer_label = ttk.Label(self.status_frame, text="")
+        self.transfer_label.pack(side=tk.RIGHT)
     
     def connect_s3(self):
         if not self.config_manager.is_configured():
@@ -151,87 +186,181 @@ class S3GUI:
             return
         
         self.status_label.config(text="连接中...")
-        self.s3_client = S3Client(self.config_manager)
         
-        if self.s3_client.test_connection():
+        # 创建客户端（导入 boto3、加载服务模型）和 head_bucket 都在后台线程中进行，不阻塞界面
+        def connect():
+            s3_client = S3Client(self.config_manager)
+            startup_timer.mark('client')
+            connected = s3_client.client is not None and s3_client.test_connection()
+            startup_timer.mark('connect')
+            self.root.after(0, lambda: self.on_connected(s3_client, connected))
+        
+        threading.Thread(target=connect, daemon=True).start()
+    
+    def on_window_shown(self):
+        startup_timer.mark('window')
+        self.connect_s3()
+    
+    def on_connected(self, s3_client, connected: bool):
+        self.s3_client = s3_client
+        if connected:
             self.status_label.config(text="已连接")
             self.refresh_view()
         else:
             self.status_label.config(text="连接失败")
+            startup_timer.report()
             messagebox.showerror("连接错误", "无法连接到S3存储，请检查配置")
     
-    def refresh_view(self):
+    def refresh_view(self, force: bool = False):
+        """显示当前目录；导航时优先使用列表缓存，force=True（刷新按钮）时重新请求
+
+        列表按页流式返回，界面定时批量追加已到达的页；切换目录时取消尚未完成的列表。
+        """
         if not self.s3_client:
             return
         
-        self.tree.delete(*self.tree.get_children())
+        # 取消上一次尚未完成的列表，避免旧目录的结果覆盖当前目录
+        if self.listing_cancel:
+            self.listing_cancel.set()
+        cancel_event = threading.Event()
+        self.listing_cancel = cancel_event
+        self.search_active = False
+        
+        self.tree.clear()
         self.status_label.config(text="加载中...")
+        self.path_label.config(text=f"路径: /{self.current_prefix}")
         self.progress_var.set(0)
         
-        def progress_callback(page_count, current_count, has_more):
-            self.root.after(0, lambda: self.status_label.config(
-                text=f"正在加载第{page_count}页... 已加载{current_count}个项目" + ("，还有更多..." if has_more else "")
-            ))
+        prefix = self.current_prefix
+        pending_pages = queue.Queue()
+        counts = {'pages': 0, 'folders': 0, 'files': 0}
+        
+        def reconcile_callback(folders, files):
+            # 后台核对发现索引过期时，若仍停留在该目录则刷新显示
+            self.root.after(0, lambda: not cancel_event.is_set() and self.populate_tree(folders, files))
         
         def load_objects():
             try:
-                folders, files = self.s3_client.list_objects(self.current_prefix, progress_callback=progress_callback)
-                self.root.after(0, self.populate_tree, folders, files)
+                for page in self.s3_client.list_objects_stream(prefix, use_cache=not force,
+                                                               reconcile_callback=reconcile_callback,
+                                                               cancel_event=cancel_event):
+                    pending_pages.put(page)
             except Exception as e:
                 self.root.after(0, lambda: messagebox.showerror("错误", f"加载失败: {e}"))
                 self.root.after(0, lambda: self.status_label.config(text="加载失败"))
+            finally:
+                pending_pages.put(None)
+        
+        def flush_pages():
+            if cancel_event.is_set():
+                return
+            
+            finished = False
+            has_more = False
+            appended = 0
+            while True:
+                try:
+                    page = pending_pages.get_nowait()
+                except queue.Empty:
+                    break
+                if page is None:
+                    finished = True
+                    break
+                folders, files, has_more = page
+                self.tree.append_items(folders, files)
+                counts['pages'] += 1
+                counts['folders'] += len(folders)
+                counts['files'] += len(files)
+                appended += 1
+            
+            if appended:
+                self.tree.sort_new_items()
+            
+            if finished:
+                self.show_listing_status(counts['folders'], counts['files'])
+                self.load_folder_sizes()
+                startup_timer.mark('first_listing')
+                startup_timer.report()
+            else:
+                if appended:
+                    self.status_label.config(
+                        text=f"正在加载第{counts['pages']}页... 已加载{counts['folders'] + counts['files']}个项目"
+                             + ("，还有更多..." if has_more else "")
+                    )
+                self.root.after(100, flush_pages)
         
         threading.Thread(target=load_objects, daemon=True).start()
+        self.root.after(50, flush_pages)
     
     def populate_tree(self, folders: List[Dict], files: List[Dict]):
-        self.current_items = folders + files
+        self.tree.set_items(folders, files)
         self.sort_items()
         self.path_label.config(text=f"路径: /{self.current_prefix}")
+        self.show_listing_status(len(folders), len(files))
+        self.load_folder_sizes()
+    
+    def load_folder_sizes(self):
+        """在后台统计当前目录中各文件夹的大小，结果定时批量填入大小列；切换目录时停止"""
+        if not self.s3_client or not self.config_manager.get_app_settings().get('auto_folder_sizes', True):
+            return
+        prefixes = self.tree.folder_paths()
+        cancel_event = self.listing_cancel
+        if not prefixes or cancel_event is None:
+            return
+        
+        results = queue.Queue()
+        
+        def compute_sizes():
+            # 两个线程即可：每个文件夹的全量列表本身已按键区间并发
+            def compute(prefix):
+                if cancel_event.is_set():
+                    return
+                stats = self.s3_client.get_folder_stats(prefix, cancel_event=cancel_event)
+                if stats is not None:
+                    results.put((prefix, stats['bytes']))
+            
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                list(executor.map(compute, prefixes))
+            results.put(None)
+        
+        def flush_sizes():
+            if cancel_event.is_set():
+                return
+            sizes = {}
+            finished = False
+            while True:
+                try:
+                    item = results.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    finished = True
+                    break
+                sizes[item[0]] = item[1]
+            if sizes:
+                self.tree.set_folder_sizes(sizes)
+                if self.sort_var.get() == "size":
+                    self.sort_items()
+                else:
+                    self.tree.refresh()
+            if not finished:
+                self.root.after(200, flush_sizes)
         
+        threading.Thread(target=compute_sizes, daemon=True).start()
+        self.root.after(50, flush_sizes)
+    
+    def show_listing_status(self, folder_count: int, file_count: int):
         # 检查是否达到了最大文件数限制
         max_objects = self.config_manager.get_app_settings().get('max_list_objects', 10000)
-        total_items = len(folders) + len(files)
+        total_items = folder_count + file_count
         
         if total_items >= max_objects:
-            self.status_label.config(text=f"加载完成 - {len(folders)}个文件夹, {len(files)}个文件 (已达到最大显示数量)")
+            self.status_label.config(text=f"加载完成 - {folder_count}个文件夹, {file_count}个文件 (已达到最大显示数量)")
         else:
-            self.status_label.config(text=f"加载完成 - {len(folders)}个文件夹, {len(files)}个文件")
+            self.status_label.config(text=f"加载完成 - {folder_count}个文件夹, {file_count}个文件")
     
     def sort_items(self):
-        if not hasattr(self, 'current_items'):
-            return
-        
-        self.tree.delete(*self.tree.get_children())
-        
-        sort_key = self.sort_var.get()
-        reverse = self.sort_desc_var.get()
-        
-        folders = [item for item in self.current_items if item['type'] == 'folder']
-        files = [item for item in self.current_items if item['type'] == 'file']
-        
-        def get_sort_key(item):
-            if sort_key == "name":
-                return item['name'].lower()
-            elif sort_key == "type":
-                return item['type']
-            elif sort_key == "size":
-                return item.get('size', 0)
-            elif sort_key == "modified":
-                return item.get('last_modified', datetime.min)
-            return item['name'].lower()
-        
-        folders.sort(key=get_sort_key, reverse=reverse)
-        files.sort(key=get_sort_key, reverse=reverse)
-        
-        for folder in folders:
-            self.tree.insert("", "end", text=f"📁 {folder['name']}", 
-                           values=("", "文件夹", "", ""), tags=("folder",))
-        
-        for file in files:
-            size_str = self.format_size(file['size'])
-            time_str = file['last_modified'].strftime("%Y-%m-%d %H:%M")
-            self.tree.insert("", "end", text=f"📄 {file['name']}", 
-                           values=("", "文件", size_str, time_str), tags=("file",))
+        self.tree.sort(self.sort_var.get(), self.sort_desc_var.get())
     
     def format_size(self, size: int) -> str:
         for unit in ['B', 'KB', 'MB', 'GB']:
@@ -253,12 +382,153 @@ class S3GUI:
             self.refresh_view()
     
     def go_parent(self):
+        if self.search_active:
+            # 退出搜索结果，回到搜索所在的目录
+            self.refresh_view()
+            return
         if self.current_prefix:
             self.current_prefix = "/".join(self.current_prefix.rstrip("/").split("/")[:-1])
             if self.current_prefix and not self.current_prefix.endswith("/"):
                 self.current_prefix += "/"
             self.refresh_view()
     
+    def show_search_dialog(self):
+        if not self.s3_client:
+            messagebox.showerror("错误", "未连接到S3")
+            return
+        
+        dialog = tk.Toplevel(self.root)
+        dialog.title("搜索")
+        dialog.geometry("420x300")
+        dialog.transient(self.root)
+        
+        ttk.Label(dialog, text=f"在 /{self.current_prefix} 及其子目录中搜索").grid(
+            row=0, column=0, columnspan=3, sticky=tk.W, padx=10, pady=(10, 5))
+        
+        pattern_var = tk.StringVar()
+        mode_var = tk.StringVar(value=MODE_SUBSTRING)
+        case_var = tk.BooleanVar()
+        min_size_var = tk.StringVar()
+        max_size_var = tk.StringVar()
+        after_var = tk.StringVar()
+        before_var = tk.StringVar()
+        
+        ttk.Label(dialog, text="名称:").grid(row=1, column=0, sticky=tk.W, padx=10, pady=5)
+        pattern_entry = ttk.Entry(dialog, textvariable=pattern_var, width=36)
+        pattern_entry.grid(row=1, column=1, columnspan=2, sticky=tk.W, pady=5)
+        
+        mode_frame = ttk.Frame(dialog)
+        mode_frame.grid(row=2, column=1, columnspan=2, sticky=tk.W)
+        for text, value in (("包含", MODE_SUBSTRING), ("通配符", MODE_GLOB), ("正则", MODE_REGEX)):
+            ttk.Radiobutton(mode_frame, text=text, variable=mode_var, value=value).pack(side=tk.LEFT, padx=(0, 5))
+        ttk.Checkbutton(mode_frame, text="区分大小写", variable=case_var).pack(side=tk.LEFT, padx=5)
+        
+        for row, label, first_var, second_var, hint in ((3, "大小:", min_size_var, max_size_var, "如 10M、1.5G"),
+                                                        (4, "修改时间:", after_var, before_var, "如 2024-01-31")):
+            ttk.Label(dialog, text=label).grid(row=row, column=0, sticky=tk.W, padx=10, pady=5)
+            range_frame = ttk.Frame(dialog)
+            range_frame.grid(row=row, column=1, columnspan=2, sticky=tk.W, pady=5)
+            ttk.Entry(range_frame, textvariable=first_var, width=12).pack(side=tk.LEFT)
+            ttk.Label(range_frame, text=" 至 ").pack(side=tk.LEFT)
+            ttk.Entry(range_frame, textvariable=second_var, width=12).pack(side=tk.LEFT)
+            ttk.Label(range_frame, text=f"  {hint}").pack(side=tk.LEFT)
+        
+        ttk.Label(dialog, text="名称中含有 / 时匹配相对路径，否则匹配对象名；留空的条件不限制").grid(
+            row=5, column=0, columnspan=3, sticky=tk.W, padx=10, pady=5)
+        
+        def start_search(event=None):
+            try:
+                query = SearchQuery(
+                    pattern_var.get(), mode_var.get(), case_var.get(),
+                    min_size=parse_size(min_size_var.get()) if min_size_var.get().strip() else None,
+                    max_size=parse_size(max_size_var.get()) if max_size_var.get().strip() else None,
+                    modified_after=parse_date(after_var.get()) if after_var.get().strip() else None,
+                    modified_before=parse_date(before_var.get()) if before_var.get().strip() else None
+                )
+            except ValueError as e:
+                messagebox.showerror("错误", str(e), parent=dialog)
+                return
+            dialog.destroy()
+            self.run_search(query)
+        
+        button_frame = ttk.Frame(dialog)
+        button_frame.grid(row=6, column=0, columnspan=3, pady=15)
+        ttk.Button(button_frame, text="搜索", command=start_search).pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="取消", command=dialog.destroy).pack(side=tk.LEFT, padx=5)
+        
+        dialog.bind("<Return>", start_search)
+        pattern_entry.focus_set()
+    
+    def run_search(self, query: SearchQuery):
+        """在当前目录的子树中搜索，匹配结果边找边追加到列表（名称显示为相对路径）
+
+        已建立本地索引时直接查询索引，否则并发列出整个子树；切换目录或再次搜索时取消。
+        """
+        if self.listing_cancel:
+            self.listing_cancel.set()
+        cancel_event = threading.Event()
+        self.listing_cancel = cancel_event
+        self.search_active = True
+        
+        self.tree.clear()
+        self.progress_var.set(0)
+        self.path_label.config(text=f"搜索: /{self.current_prefix}（返回上级退出搜索）")
+        self.status_label.config(text="搜索中...")
+        
+        prefix = self.current_prefix
+        max_results = self.config_manager.get_app_settings().get('max_list_objects', 10000)
+        pending = queue.Queue()
+        progress = {'scanned': None, 'matched': 0}
+        
+        def progress_callback(scanned, matched):
+            progress['scanned'] = scanned
+            progress['matched'] = matched
+        
+        def search_thread():
+            try:
+                for files in self.s3_client.search_objects(prefix, query, max_results=max_results,
+                                                           progress_callback=progress_callback,
+                                                           cancel_event=cancel_event):
+                    pending.put(files)
+            except Exception as e:
+                self.root.after(0, lambda: messagebox.showerror("错误", f"搜索失败: {e}"))
+            finally:
+                pending.put(None)
+        
+        def flush_results():
+            if cancel_event.is_set():
+                return
+            finished = False
+            appended = False
+            while True:
+                try:
+                    files = pending.get_nowait()
+                except queue.Empty:
+                    break
+                if files is None:
+                    finished = True
+                    break
+                self.tree.append_items([], files)
+                appended = True
+            if appended:
+                self.tree.sort_new_items()
+            
+            found = progress['matched']
+            if finished:
+                text = f"搜索完成 - 找到{found}个对象"
+                if found >= max_results:
+                    text += " (已达到最大显示数量)"
+                self.status_label.config(text=text)
+                return
+            if progress['scanned'] is not None:
+                self.status_label.config(text=f"搜索中... 已检查{progress['scanned']}个对象，找到{found}个")
+            else:
+                self.status_label.config(text=f"搜索中... 找到{found}个")
+            self.root.after(100, flush_results)
+        
+        threading.Thread(target=search_thread, daemon=True).start()
+        self.root.after(50, flush_results)
+    
     def on_drop(self, event):
         files = self.root.tk.splitlist(event.data)
         for file_path in files:
@@ -285,21 +555,20 @@ class S3GUI:
         filename = os.path.basename(file_path)
         s3_key = f"{self.current_prefix}{filename}"
         
-        def upload_thread():
-            def progress_callback(progress):
-                self.root.after(0, lambda: self.progress_var.set(progress))
-                self.root.after(0, lambda: self.status_label.config(text=f"上传中: {progress:.1f}%"))
-            
-            success = self.s3_client.upload_file(file_path, s3_key, progress_callback)
-            
-            self.root.after(0, lambda: self.progress_var.set(0))
+        def on_done(future):
+            success = not future.cancelled() and future.exception() is None and future.result()
             if success:
                 self.root.after(0, lambda: self.status_label.config(text="上传完成"))
                 self.root.after(0, self.refresh_view)
+            elif job.cancelled:
+                self.root.after(0, lambda: self.status_label.config(text=f"上传已取消: {filename}"))
             else:
                 self.root.after(0, lambda: messagebox.showerror("错误", f"上传失败: {filename}"))
         
-        threading.Thread(target=upload_thread, daemon=True).start()
+        # 由全局调度器排队执行，和其他传输共用并发数和带宽限制
+        job, future = self.s3_client.submit_upload(file_path, s3_key)
+        self.status_label.config(text=f"上传中: {filename}")
+        future.add_done_callback(on_done)
     
     def upload_folder(self, folder_path: str):
         if not self.s3_client:
@@ -310,14 +579,16 @@ class S3GUI:
         s3_prefix = f"{self.current_prefix}{folder_name}"
         
         def upload_thread():
-            def progress_callback(progress):
-                self.root.after(0, lambda: self.progress_var.set(progress))
-                self.root.after(0, lambda: self.status_label.config(text=f"上传文件夹: {progress:.1f}%"))
+            def progress_callback(stats):
+                text = self.format_folder_progress("上传文件夹", stats)
+                self.root.after(0, lambda: self.status_label.config(text=text))
             
             success_count, total_count = self.s3_client.upload_folder(folder_path, s3_prefix, progress_callback)
             
-            self.root.after(0, lambda: self.progress_var.set(0))
-            self.root.after(0, lambda: self.status_label.config(text=f"上传完成: {success_count}/{total_count}"))
+            text = f"上传完成: {success_count}/{total_count}"
+            if success_count < total_count:
+                text += f", 失败 {total_count - success_count} 个"
+            self.root.after(0, lambda: self.status_label.config(text=text))
             self.root.after(0, self.refresh_view)
         
         threading.Thread(target=upload_thread, daemon=True).start()
@@ -346,34 +617,221 @@ class S3GUI:
                 self.download_file(s3_key, local_path)
     
     def download_file(self, s3_key: str, local_path: str):
-        def download_thread():
-            def progress_callback(progress):
-                self.root.after(0, lambda: self.progress_var.set(progress))
-                self.root.after(0, lambda: self.status_label.config(text=f"下载中: {progress:.1f}%"))
-            
-            success = self.s3_client.download_file(s3_key, local_path, progress_callback)
-            
-            self.root.after(0, lambda: self.progress_var.set(0))
+        def on_done(future):
+            success = not future.cancelled() and future.exception() is None and future.result()
             if success:
                 self.root.after(0, lambda: self.status_label.config(text="下载完成"))
+            elif job.cancelled:
+                self.root.after(0, lambda: self.status_label.config(text=f"下载已取消: {s3_key}"))
             else:
                 self.root.after(0, lambda: messagebox.showerror("错误", f"下载失败: {s3_key}"))
         
-        threading.Thread(target=download_thread, daemon=True).start()
+        job, future = self.s3_client.submit_download(s3_key, local_path)
+        self.status_label.config(text=f"下载中: {os.path.basename(s3_key)}")
+        future.add_done_callback(on_done)
     
     def download_folder(self, s3_prefix: str, local_folder: str):
         def download_thread():
-            def progress_callback(progress):
-                self.root.after(0, lambda: self.progress_var.set(progress))
-                self.root.after(0, lambda: self.status_label.config(text=f"下载文件夹: {progress:.1f}%"))
+            def progress_callback(stats):
+                text = self.format_folder_progress("下载文件夹", stats)
+                self.root.after(0, lambda: self.status_label.config(text=text))
             
             success_count, total_count = self.s3_client.download_folder(s3_prefix, local_folder, progress_callback)
             
-            self.root.after(0, lambda: self.progress_var.set(0))
-            self.root.after(0, lambda: self.status_label.config(text=f"下载完成: {success_count}/{total_count}"))
+            text = f"下载完成: {success_count}/{total_count}"
+            if success_count < total_count:
+                text += f", 失败 {total_count - success_count} 个"
+            self.root.after(0, lambda: self.status_label.config(text=text))
         
         threading.Thread(target=download_thread, daemon=True).start()
     
+    def format_folder_progress(self, label: str, stats: Dict[str, Any]) -> str:
+        """文件夹传输的状态文字：按字节计算百分比，失败文件的字节也算作已结束"""
+        total = stats['bytes_total']
+        finished = stats['bytes_done'] + stats['bytes_failed']
+        percent = (finished / total) * 100 if total else 0
+        text = (f"{label}: {percent:.1f}%, {stats['files_done']}/{stats['files_total']} 个文件, "
+                f"{self.format_size(stats['bytes_done'])}/{self.format_size(total)}, {format_rate(stats['rate'])}")
+        if stats['files_failed']:
+            text += f", 失败 {stats['files_failed']} 个"
+        if not stats['listing_complete']:
+            text += " (正在列出...)"
+        return text
+    
+    def transfer_jobs(self):
+        if self.s3_client is None or self.s3_client.scheduler is None:
+            return []
+        return self.s3_client.scheduler.jobs()
+    
+    def on_transfer_progress(self, snapshot: Dict[str, Any]):
+        """状态栏显示所有进行中传输的总进度和总速度"""
+        if snapshot['active']:
+            total = snapshot['bytes_total']
+            self.progress_var.set((snapshot['bytes_done'] / total) * 100 if total else 0)
+            self.transfer_label.config(text=f"{snapshot['active']} 个传输  {format_rate(snapshot['rate'])}")
+        elif self.transfer_label.cget("text"):
+            self.progress_var.set(0)
+            self.transfer_label.config(text="")
+    
+    def show_transfer_panel(self):
+        if self.transfer_window is not None and self.transfer_window.winfo_exists():
+            self.transfer_window.lift()
+            return
+        
+        window = tk.Toplevel(self.root)
+        window.title("传输列表")
+        window.geometry("760x320")
+        self.transfer_window = window
+        
+        columns = ("state", "files", "progress", "rate", "eta")
+        tree = ttk.Treeview(window, columns=columns, selectmode="extended")
+        tree.heading("#0", text="名称")
+        tree.heading("state", text="状态")
+        tree.heading("files", text="文件")
+        tree.heading("progress", text="进度")
+        tree.heading("rate", text="速度")
+        tree.heading("eta", text="剩余时间")
+        tree.column("#0", width=260)
+        tree.column("state", width=70)
+        tree.column("files", width=90)
+        tree.column("progress", width=150)
+        tree.column("rate", width=90)
+        tree.column("eta", width=80)
+        tree.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        
+        bottom = ttk.Frame(window)
+        bottom.pack(fill=tk.X, padx=5, pady=5)
+        total_label = ttk.Label(bottom, text="")
+        total_label.pack(side=tk.LEFT)
+        
+        state_text = {JOB_QUEUED: "排队中", JOB_RUNNING: "传输中", JOB_PAUSED: "已暂停",
+                      JOB_CANCELLED: "已取消", JOB_DONE: "已完成"}
+        
+        def selected_jobs():
+            ids = {int(item) for item in tree.selection()}
+            return [job for job in self.transfer_jobs() if job.id in ids]
+        
+        def clear_finished():
+            if self.s3_client and self.s3_client.scheduler:
+                self.s3_client.scheduler.remove_finished_jobs()
+        
+        ttk.Button(bottom, text="清除已完成", command=clear_finished).pack(side=tk.RIGHT, padx=2)
+        ttk.Button(bottom, text="取消", command=lambda: [job.cancel() for job in selected_jobs()]).pack(side=tk.RIGHT, padx=2)
+        ttk.Button(bottom, text="继续", command=lambda: [job.resume() for job in selected_jobs()]).pack(side=tk.RIGHT, padx=2)
+        ttk.Button(bottom, text="暂停", command=lambda: [job.pause() for job in selected_jobs()]).pack(side=tk.RIGHT, padx=2)
+        
+        def update(snapshot):
+            shown = set()
+            for entry in snapshot['jobs']:
+                item = str(entry['id'])
+                shown.add(item)
+                total = entry['bytes_total']
+                percent = (entry['bytes_done'] / total) * 100 if total else (100 if entry['state'] == JOB_DONE else 0)
+                files = f"{entry['files_done']}/{entry['files_done'] + entry['files_failed'] + entry['files_pending']}"
+                if entry['files_failed']:
+                    files += f" 失败{entry['files_failed']}"
+                values = (
+                    state_text.get(entry['state'], entry['state']),
+                    files,
+                    f"{percent:.1f}%  {self.format_size(entry['bytes_done'])}/{self.format_size(total)}",
+                    format_rate(entry['rate']) if entry['rate'] else "",
+                    format_eta(entry['eta']) if entry['state'] not in (JOB_DONE, JOB_CANCELLED) else ""
+                )
+                if tree.exists(item):
+                    tree.item(item, values=values)
+                else:
+                    tree.insert("", tk.END, iid=item, text=entry['name'], values=values)
+            for item in tree.get_children():
+                if item not in shown:
+                    tree.delete(item)
+            total_label.config(text=f"进行中 {snapshot['active']} 个  总速度 {format_rate(snapshot['rate'])}")
+        
+        def on_close():
+            self.progress_bus.unsubscribe(update)
+            self.transfer_window = None
+            window.destroy()
+        
+        self.progress_bus.subscribe(update)
+        window.protocol("WM_DELETE_WINDOW", on_close)
+    
+    def show_request_stats(self):
+        """诊断面板：各 API 的请求数、错误、重试、限流、流量和延迟，每秒刷新"""
+        if not self.s3_client:
+            messagebox.showerror("错误", "未连接到S3")
+            return
+        
+        window = tk.Toplevel(self.root)
+        window.title("请求统计")
+        window.geometry("860x320")
+        
+        columns = ("calls", "requests", "errors", "retries", "throttled", "sent", "received", "p50", "p99")
+        headings = ("调用", "请求", "错误", "重试", "限流", "发送", "接收", "p50 (ms)", "p99 (ms)")
+        tree = ttk.Treeview(window, columns=columns)
+        tree.heading("#0", text="API")
+        tree.column("#0", width=170)
+        for column, heading in zip(columns, headings):
+            tree.heading(column, text=heading)
+            tree.column(column, width=75, anchor=tk.E)
+        tree.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        
+        bottom = ttk.Frame(window)
+        bottom.pack(fill=tk.X, padx=5, pady=5)
+        since_label = ttk.Label(bottom, text="")
+        since_label.pack(side=tk.LEFT)
+        
+        def row_values(stats):
+            return (stats['calls'], stats['requests'], stats['errors'], stats['retries'], stats['throttled'],
+                    self.format_size(stats['bytes_sent']), self.format_size(stats['bytes_received']),
+                    stats['latency_p50_ms'] if stats['latency_p50_ms'] is not None else "",
+                    stats['latency_p99_ms'] if stats['latency_p99_ms'] is not None else "")
+        
+        def refresh():
+            if not window.winfo_exists():
+                return
+            snapshot = self.s3_client.get_request_stats()
+            tree.delete(*tree.get_children())
+            for name, stats in snapshot['operations'].items():
+                tree.insert("", tk.END, text=name, values=row_values(stats))
+            tree.insert("", tk.END, text="合计", values=row_values(snapshot['total']))
+            since = datetime.fromtimestamp(snapshot['since']).strftime('%Y-%m-%d %H:%M:%S')
+            concurrency = snapshot.get('concurrency')
+            text = f"统计开始于 {since}"
+            if concurrency:
+                text += f"    并发上限 {concurrency['limit']}（进行中 {concurrency['inflight']}，限流 {concurrency['throttle_events']} 次）"
+            since_label.config(text=text)
+            window.after(1000, refresh)
+        
+        def export():
+            path = filedialog.asksaveasfilename(
+                parent=window, title="导出请求统计", defaultextension=".json",
+                filetypes=[("JSON", "*.json"), ("Prometheus 文本格式", "*.prom")])
+            if path:
+                try:
+                    self.s3_client.metrics.dump(path)
+                except OSError as e:
+                    messagebox.showerror("错误", f"导出失败: {e}", parent=window)
+        
+        ttk.Button(bottom, text="导出", command=export).pack(side=tk.RIGHT, padx=2)
+        ttk.Button(bottom, text="重置", command=self.s3_client.metrics.reset).pack(side=tk.RIGHT, padx=2)
+        refresh()
+    
+    def pause_all_transfers(self):
+        if self.s3_client:
+            self.s3_client.get_scheduler().pause_all()
+            self.status_label.config(text="传输已全部暂停")
+    
+    def resume_all_transfers(self):
+        if self.s3_client:
+            self.s3_client.get_scheduler().resume_all()
+            self.status_label.config(text="传输已继续")
+    
+    def cancel_all_transfers(self):
+        if not self.s3_client:
+            return
+        if messagebox.askyesno("确认", "确定要取消所有传输吗？"):
+            self.s3_client.get_scheduler().cancel_all()
+            self.status_label.config(text="传输已取消")
+    
     def delete_selected(self):
         selected = self.tree.selection()
         if not selected:
@@ -383,68 +841,33 @@ class S3GUI:
         if not messagebox.askyesno("确认删除", f"确定要删除选中的 {len(selected)} 个项目吗？"):
             return
         
+        targets = []
+        for item in selected:
+            item_text = self.tree.item(item, "text")
+            name = item_text[2:]
+            if item_text.startswith("📁"):
+                targets.append(f"{self.current_prefix}{name}/")
+            else:
+                targets.append(f"{self.current_prefix}{name}")
+        
         def delete_thread():
-            deleted_items = 0
-            total_items = len(selected)
+            def progress_callback(phase, current, total, message):
+                if phase == "delete" and total > 0:
+                    progress = (current / total) * 100
+                    self.root.after(0, lambda p=progress: self.progress_var.set(p))
+                self.root.after(0, lambda m=message: self.status_label.config(text=m))
             
-            for i, item in enumerate(selected):
-                item_text = self.tree.item(item, "text")
-                
-                if item_text.startswith("📁"):
-                    folder_name = item_text[2:]
-                    s3_prefix = f"{self.current_prefix}{folder_name}/"
-                    
-                    # 文件夹删除进度回调
-                    def folder_progress_callback(phase, current, total, message, idx=i, fname=folder_name, titems=total_items):
-                        if phase == "scan":
-                            self.root.after(0, lambda: self.status_label.config(
-                                text=f"[{idx+1}/{titems}] 删除文件夹 '{fname}': {message}"
-                            ))
-                        elif phase == "delete":
-                            if total > 0:
-                                folder_progress = (current / total) * 100
-                                self.root.after(0, lambda p=folder_progress: self.progress_var.set(p))
-                                self.root.after(0, lambda m=message: self.status_label.config(
-                                    text=f"[{idx+1}/{titems}] 删除文件夹 '{fname}': {m}"
-                                ))
-                        elif phase == "complete":
-                            self.root.after(0, lambda m=message: self.status_label.config(
-                                text=f"[{idx+1}/{titems}] 文件夹 '{fname}' {m}"
-                            ))
-                        elif phase == "error":
-                            self.root.after(0, lambda m=message: self.status_label.config(
-                                text=f"[{idx+1}/{titems}] 删除文件夹 '{fname}' 失败: {m}"
-                            ))
-                    
-                    success_count, _ = self.s3_client.delete_folder(s3_prefix, folder_progress_callback)
-                    if success_count > 0:
-                        deleted_items += 1
-                else:
-                    file_name = item_text[2:]
-                    s3_key = f"{self.current_prefix}{file_name}"
-                    
-                    self.root.after(0, lambda idx=i, fname=file_name, titems=total_items: self.status_label.config(
-                        text=f"[{idx+1}/{titems}] 删除文件: {fname}"
-                    ))
-                    
-                    if self.s3_client.delete_object(s3_key):
-                        deleted_items += 1
-                        self.root.after(0, lambda idx=i, fname=file_name, titems=total_items: self.status_label.config(
-                            text=f"[{idx+1}/{titems}] 文件 '{fname}' 删除成功"
-                        ))
-                    else:
-                        self.root.after(0, lambda idx=i, fname=file_name, titems=total_items: self.status_label.config(
-                            text=f"[{idx+1}/{titems}] 文件 '{fname}' 删除失败"
-                        ))
-                
-                # 更新总体进度
-                overall_progress = ((i + 1) / total_items) * 100
-                if not item_text.startswith("📁"):  # 只在文件删除时更新进度条，文件夹删除有自己的进度
-                    self.root.after(0, lambda p=overall_progress: self.progress_var.set(p))
+            errors = []
+            deleted_count, total_count = self.s3_client.delete_many(targets, progress_callback, errors)
             
             # 完成所有删除操作
             self.root.after(0, lambda: self.progress_var.set(0))
-            self.root.after(0, lambda: self.status_label.config(text=f"删除完成: {deleted_items}/{total_items} 个项目"))
+            self.root.after(0, lambda: self.status_label.config(text=f"删除完成: {deleted_count}/{total_count} 个文件"))
+            if errors:
+                failed_keys = "\n".join(error['Key'] for error in errors[:20])
+                self.root.after(0, lambda: messagebox.showerror(
+                    "删除失败", f"{len(errors)} 个文件删除失败:\n{failed_keys}"
+                ))
             self.root.after(0, self.refresh_view)
         
         threading.Thread(target=delete_thread, daemon=True).start()
@@ -519,7 +942,11 @@ class S3GUI:
                 old_prefix = f"{self.current_prefix}{current_name}/"
                 new_prefix = f"{self.current_prefix}{new_name}/"
                 
-                success_count, total_count = self.s3_client.rename_folder(old_prefix, new_prefix)
+                def progress_callback(moved, failed, total):
+                    text = f"重命名文件夹: 已移动 {moved}/{total} 个文件" + (f", 失败 {failed} 个" if failed else "")
+                    self.root.after(0, lambda: self.status_label.config(text=text))
+                
+                success_count, total_count = self.s3_client.rename_folder(old_prefix, new_prefix, progress_callback)
                 
                 if success_count > 0:
                     self.root.after(0, lambda: self.status_label.config(text=f"文件夹重命名完成: {success_count}/{total_count}"))
@@ -567,7 +994,9 @@ class S3GUI:
         item = selected[0]
         item_text = self.tree.item(item, "text")
         
-        if not item_text.startswith("📁"):
+        if item_text.startswith("📁"):
+            self.show_folder_properties(item_text[2:])
+        else:
             file_name = item_text[2:]
             s3_key = f"{self.current_prefix}{file_name}"
             
@@ -580,15 +1009,168 @@ class S3GUI:
 内容类型: {info['content_type']}
 ETag: {info['etag']}"""
                 
+                checksum = info.get('checksum')
+                if checksum:
+                    props_text += f"\n校验值: {checksum['algorithm']} {checksum['value']}"
+                    if checksum['type'] == 'COMPOSITE':
+                        props_text += f" (分片组合, {checksum['parts']} 个分片)"
+                else:
+                    props_text += "\n校验值: 无"
+                
+                verification = info.get('verification')
+                if verification:
+                    status_text = {'verified': "通过", 'mismatch': "失败"}.get(verification['status'], verification['status'])
+                    checked_at = datetime.fromtimestamp(verification['time']).strftime('%Y-%m-%d %H:%M:%S')
+                    props_text += f"\n最近校验: {status_text} ({verification.get('algorithm', '')}, {checked_at})"
+                    if verification.get('message'):
+                        props_text += f"\n{verification['message']}"
+                
                 props_window = tk.Toplevel(self.root)
                 props_window.title("文件属性")
-                props_window.geometry("400x200")
+                props_window.geometry("480x260")
                 
                 text_widget = tk.Text(props_window, wrap=tk.WORD)
                 text_widget.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
                 text_widget.insert(tk.END, props_text)
                 text_widget.config(state=tk.DISABLED)
     
+    def show_folder_properties(self, folder_name: str):
+        """文件夹属性：后台递归统计对象数、总大小、修改时间范围和最大的对象"""
+        prefix = f"{self.current_prefix}{folder_name}/"
+        cancel_event = threading.Event()
+        
+        props_window = tk.Toplevel(self.root)
+        props_window.title("文件夹属性")
+        props_window.geometry("560x360")
+        
+        text_widget = tk.Text(props_window, wrap=tk.NONE)
+        text_widget.pack(fill=tk.BOTH, expand=True, padx=10, pady=(10, 5))
+        
+        def show_text(text):
+            if not props_window.winfo_exists():
+                return
+            text_widget.config(state=tk.NORMAL)
+            text_widget.delete("1.0", tk.END)
+            text_widget.insert(tk.END, text)
+            text_widget.config(state=tk.DISABLED)
+        
+        def format_time(value):
+            return value.strftime('%Y-%m-%d %H:%M:%S') if value else "-"
+        
+        def show_stats(stats):
+            if stats is None:
+                show_text(f"文件夹: {folder_name}\n路径: {prefix}\n\n统计失败或已取消")
+                return
+            source = {'index': "本地索引", 'scan': "实时列表"}.get(stats['source'], stats['source'])
+            computed_at = datetime.fromtimestamp(stats['computed_at']).strftime('%Y-%m-%d %H:%M:%S')
+            lines = [
+                f"文件夹: {folder_name}",
+                f"路径: {prefix}",
+                f"对象数: {stats['objects']}",
+                f"总大小: {self.format_size(stats['bytes'])} ({stats['bytes']} 字节)",
+                f"最早修改: {format_time(stats['oldest'])}",
+                f"最近修改: {format_time(stats['newest'])}",
+                f"统计来源: {source}，{computed_at}",
+            ]
+            if stats['largest']:
+                lines.append("")
+                lines.append("最大的对象:")
+                for entry in stats['largest']:
+                    lines.append(f"  {self.format_size(entry['size']):>10}  {entry['key'][len(prefix):]}")
+            show_text("\n".join(lines))
+        
+        def compute(use_cache=True):
+            show_text(f"文件夹: {folder_name}\n路径: {prefix}\n\n正在统计...")
+            
+            def progress_callback(objects, total_bytes):
+                text = f"文件夹: {folder_name}\n路径: {prefix}\n\n正在统计... {objects} 个对象, {self.format_size(total_bytes)}"
+                self.root.after(0, lambda: show_text(text))
+            
+            def stats_thread():
+                stats = self.s3_client.get_folder_stats(prefix, use_cache=use_cache,
+                                                        progress_callback=progress_callback,
+                                                        cancel_event=cancel_event)
+                if not cancel_event.is_set():
+                    self.root.after(0, lambda: show_stats(stats))
+            
+            threading.Thread(target=stats_thread, daemon=True).start()
+        
+        def on_close():
+            cancel_event.set()
+            props_window.destroy()
+        
+        ttk.Button(props_window, text="重新统计", command=lambda: compute(use_cache=False)).pack(pady=(0, 10))
+        props_window.protocol("WM_DELETE_WINDOW", on_close)
+        compute()
+    
+    def cleanup_multipart_uploads(self):
+        """中止存储桶中遗留的未完成分片上传"""
+        if not self.s3_client:
+            messagebox.showerror("错误", "未连接到S3")
+            return
+        
+        if not messagebox.askyesno("确认清理", "将中止超过24小时且没有本地续传记录的分片上传，是否继续？"):
+            return
+        
+        def cleanup_thread():
+            self.root.after(0, lambda: self.status_label.config(text="正在清理未完成的分片上传..."))
+            aborted = self.s3_client.cleanup_multipart_uploads()
+            self.root.after(0, lambda: self.status_label.config(text=f"已中止 {aborted} 个未完成的分片上传"))
+        
+        threading.Thread(target=cleanup_thread, daemon=True).start()
+    
+    def resume_pending_renames(self):
+        """继续或回滚中断的文件夹重命名"""
+        if not self.s3_client:
+            messagebox.showerror("错误", "未连接到S3")
+            return
+        
+        pending = self.s3_client.get_pending_renames()
+        if not pending:
+            messagebox.showinfo("提示", "没有未完成的重命名")
+            return
+        
+        for journal in pending:
+            old_prefix = journal['old_prefix']
+            new_prefix = journal['new_prefix']
+            answer = messagebox.askyesnocancel(
+                "未完成的重命名",
+                f"'{old_prefix}' -> '{new_prefix}' 未完成（已移动 {journal.get('moved', 0)} 个文件）。\n"
+                f"选择\"是\"继续重命名，\"否\"回滚到原名称。"
+            )
+            if answer is None:
+                continue
+            
+            def rename_thread(old_prefix=old_prefix, new_prefix=new_prefix, resume=answer):
+                if resume:
+                    success_count, total_count = self.s3_client.rename_folder(old_prefix, new_prefix)
+                    text = f"继续重命名完成: {success_count}/{total_count}"
+                else:
+                    success_count, total_count = self.s3_client.rollback_rename(old_prefix, new_prefix)
+                    text = f"回滚重命名完成: {success_count}/{total_count}"
+                self.root.after(0, lambda: self.status_label.config(text=text))
+                self.root.after(0, self.refresh_view)
+            
+            threading.Thread(target=rename_thread, daemon=True).start()
+    
+    def build_bucket_index(self):
+        """全量扫描存储桶建立本地索引，之后目录列表直接从索引读取"""
+        if not self.s3_client:
+            messagebox.showerror("错误", "未连接到S3")
+            return
+        
+        if not messagebox.askyesno("建立本地索引", "将列出整个存储桶中的所有对象，对象较多时需要较长时间，是否继续？"):
+            return
+        
+        def index_thread():
+            def progress_callback(count):
+                self.root.after(0, lambda: self.status_label.config(text=f"正在建立索引: 已扫描 {count} 个对象..."))
+            
+            count = self.s3_client.build_bucket_index(progress_callback)
+            self.root.after(0, lambda: self.status_label.config(text=f"索引建立完成: {count} 个对象"))
+        
+        threading.Thread(target=index_thread, daemon=True).start()
+    
     def show_connection_settings(self):
         settings_window = tk.Toplevel(self.root)
         settings_window.title("连接设置")
@@ -641,12 +1223,15 @@ ETag: {info['etag']}"""
             
             temp_config_manager = ConfigManager.__new__(ConfigManager)
             temp_config_manager.config = temp_config
-            temp_s3_client = S3Client(temp_config_manager)
             
-            if temp_s3_client.test_connection():
-                messagebox.showinfo("测试连接", "连接成功！")
-            else:
-                messagebox.showerror("测试连接", "连接失败，请检查配置")
+            def run_test():
+                temp_s3_client = S3Client(temp_config_manager)
+                if temp_s3_client.client is not None and temp_s3_client.test_connection():
+                    self.root.after(0, lambda: messagebox.showinfo("测试连接", "连接成功！"))
+                else:
+                    self.root.after(0, lambda: messagebox.showerror("测试连接", "连接失败，请检查配置"))
+            
+            threading.Thread(target=run_test, daemon=True).start()
         
         def save_settings():
             try:
@@ -0,0 +1,289 @@
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, Optional, Set
+
+from botocore.exceptions import ClientError
+
+from transfer_config import choose_part_size
+from checksums import ChecksumMismatchError, checksum_of, composite_checksum
+
+
+def get_journal_dir(config_manager, name: str = "transfer_journal") -> str:
+    """日志目录放在 config.json 同级"""
+    config_path = getattr(config_manager, 'config_path', 'config.json')
+    base_dir = os.path.dirname(os.path.abspath(config_path))
+    return os.path.join(base_dir, name)
+
+
+class UploadJournal:
+    """分片上传日志：记录 upload id、分片大小、已完成分片的 ETag 以及源文件状态"""
+
+    def __init__(self, journal_dir: str, bucket: str, s3_key: str, local_path: str):
+        self.bucket = bucket
+        self.s3_key = s3_key
+        self.local_path = os.path.abspath(local_path)
+        digest = hashlib.sha1(f"{bucket}\n{s3_key}\n{self.local_path}".encode('utf-8')).hexdigest()
+        self.path = os.path.join(journal_dir, f"{digest}.json")
+        self.data: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def load(self) -> bool:
+        if not os.path.exists(self.path):
+            return False
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.data = json.load(f)
+            return True
+        except (OSError, ValueError):
+            self.data = {}
+            return False
+
+    def start(self, upload_id: str, part_size: int, file_size: int, mtime: float,
+              checksum_algorithm: Optional[str] = None):
+        self.data = {
+            'bucket': self.bucket,
+            'key': self.s3_key,
+            'local_path': self.local_path,
+            'upload_id': upload_id,
+            'part_size': part_size,
+            'file_size': file_size,
+            'mtime': mtime,
+            'checksum_algorithm': checksum_algorithm,
+            'parts': {},
+            'checksums': {}
+        }
+        self.save()
+
+    def matches(self, file_size: int, mtime: float, checksum_algorithm: Optional[str] = None) -> bool:
+        return (self.data.get('file_size') == file_size and
+                self.data.get('mtime') == mtime and
+                self.data.get('checksum_algorithm') == checksum_algorithm and
+                bool(self.data.get('upload_id')))
+
+    def record_part(self, part_number: int, etag: str, checksum: Optional[str] = None):
+        with self._lock:
+            self.data['parts'][str(part_number)] = etag
+            if checksum:
+                self.data.setdefault('checksums', {})[str(part_number)] = checksum
+            self.save()
+
+    def completed_parts(self) -> Dict[int, str]:
+        return {int(number): etag for number, etag in self.data.get('parts', {}).items()}
+
+    def completed_checksums(self) -> Dict[int, str]:
+        return {int(number): value for number, value in self.data.get('checksums', {}).items()}
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.data, f)
+        os.replace(tmp_path, self.path)
+
+    def remove(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def list_journal_upload_ids(journal_dir: str) -> Set[str]:
+    upload_ids = set()
+    if not os.path.isdir(journal_dir):
+        return upload_ids
+    for name in os.listdir(journal_dir):
+        if not name.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(journal_dir, name), 'r', encoding='utf-8') as f:
+                upload_id = json.load(f).get('upload_id')
+            if upload_id:
+                upload_ids.add(upload_id)
+        except (OSError, ValueError):
+            continue
+    return upload_ids
+
+
+class ResumableUploader:
+    """基于 create_multipart_upload/upload_part/list_parts 的可续传上传"""
+
+    def __init__(self, client, bucket: str, journal_dir: str, chunk_size: int, max_workers: int = 4,
+                 checksum_algorithm: Optional[str] = None):
+        self.client = client
+        self.bucket = bucket
+        self.journal_dir = journal_dir
+        self.chunk_size = chunk_size
+        self.max_workers = max(1, max_workers)
+        # 设置后每个分片附带校验值由服务端验证，完成时再核对组合校验值
+        self.checksum_algorithm = checksum_algorithm
+
+    def _list_server_parts(self, s3_key: str, upload_id: str) -> Dict[int, Dict[str, str]]:
+        parts = {}
+        marker = 0
+        while True:
+            response = self.client.list_parts(
+                Bucket=self.bucket,
+                Key=s3_key,
+                UploadId=upload_id,
+                PartNumberMarker=marker
+            )
+            for part in response.get('Parts', []):
+                parts[part['PartNumber']] = {
+                    'ETag': part['ETag'],
+                    'Checksum': part.get(f'Checksum{self.checksum_algorithm}') if self.checksum_algorithm else None
+                }
+            if not response.get('IsTruncated', False):
+                break
+            marker = response.get('NextPartNumberMarker', 0)
+        return parts
+
+    def _abort(self, s3_key: str, upload_id: str):
+        try:
+            self.client.abort_multipart_upload(Bucket=self.bucket, Key=s3_key, UploadId=upload_id)
+        except ClientError:
+            pass
+
+    def _resume_or_start(self, journal: UploadJournal, s3_key: str, file_size: int,
+                         mtime: float, extra_args: Dict[str, Any]) -> Dict[int, str]:
+        if journal.load():
+            upload_id = journal.data.get('upload_id')
+            if journal.matches(file_size, mtime, self.checksum_algorithm):
+                try:
+                    # 以服务端已有分片为准，日志中多记录的分片会被重新上传
+                    server_parts = self._list_server_parts(s3_key, upload_id)
+                    journal.data['parts'] = {str(n): part['ETag'] for n, part in server_parts.items()}
+                    journal.data['checksums'] = {str(n): part['Checksum'] for n, part in server_parts.items()
+                                                 if part['Checksum']}
+                    journal.save()
+                    return {n: part['ETag'] for n, part in server_parts.items()}
+                except ClientError as e:
+                    print(f"续传失败，重新开始上传 {s3_key}: {e}")
+            elif upload_id:
+                # 源文件已变化，旧的分片上传作废
+                self._abort(s3_key, upload_id)
+            journal.remove()
+
+        part_size = choose_part_size(file_size, self.chunk_size)
+        create_args = dict(extra_args)
+        if self.checksum_algorithm:
+            create_args['ChecksumAlgorithm'] = self.checksum_algorithm
+        response = self.client.create_multipart_upload(Bucket=self.bucket, Key=s3_key, **create_args)
+        journal.start(response['UploadId'], part_size, file_size, mtime, self.checksum_algorithm)
+        return {}
+
+    def upload(self, local_path: str, s3_key: str, extra_args: Optional[Dict[str, Any]] = None,
+               progress_callback=None, throttle=None) -> bool:
+        """throttle(nbytes) 在发送每个分片前调用，可阻塞（暂停、限速）或抛出异常（取消）"""
+        stat = os.stat(local_path)
+        file_size = stat.st_size
+        journal = UploadJournal(self.journal_dir, self.bucket, s3_key, local_path)
+        completed = self._resume_or_start(journal, s3_key, file_size, stat.st_mtime, extra_args or {})
+
+        upload_id = journal.data['upload_id']
+        part_size = journal.data['part_size']
+        part_count = max(1, (file_size + part_size - 1) // part_size)
+        missing = [n for n in range(1, part_count + 1) if n not in completed]
+
+        transferred = sum(min(part_size, file_size - (n - 1) * part_size) for n in completed)
+        progress_lock = threading.Lock()
+
+        def report(length: int):
+            nonlocal transferred
+            if not progress_callback:
+                return
+            with progress_lock:
+                transferred += length
+                progress = (transferred / file_size) * 100 if file_size else 100
+            progress_callback(progress)
+
+        def upload_part(part_number: int):
+            offset = (part_number - 1) * part_size
+            with open(local_path, 'rb') as f:
+                f.seek(offset)
+                data = f.read(part_size)
+            if throttle:
+                throttle(len(data))
+            part_args = {}
+            checksum = None
+            if self.checksum_algorithm:
+                # 分片已在内存中，直接计算校验值随请求发送，服务端不一致时会拒绝该分片
+                checksum = checksum_of(self.checksum_algorithm, data)
+                part_args['ChecksumAlgorithm'] = self.checksum_algorithm
+                part_args[f'Checksum{self.checksum_algorithm}'] = checksum
+            response = self.client.upload_part(
+                Bucket=self.bucket,
+                Key=s3_key,
+                UploadId=upload_id,
+                PartNumber=part_number,
+                Body=data,
+                **part_args
+            )
+            journal.record_part(part_number, response['ETag'], checksum)
+            report(len(data))
+
+        if missing:
+            report(0)
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                futures = [executor.submit(upload_part, n) for n in missing]
+                for future in as_completed(futures):
+                    # 任一分片失败即停止，保留日志以便下次续传
+                    future.result()
+
+        parts = journal.completed_parts()
+        checksums = journal.completed_checksums()
+        part_list = []
+        for n in sorted(parts):
+            part = {'PartNumber': n, 'ETag': parts[n]}
+            if self.checksum_algorithm and n in checksums:
+                part[f'Checksum{self.checksum_algorithm}'] = checksums[n]
+            part_list.append(part)
+        response = self.client.complete_multipart_upload(
+            Bucket=self.bucket,
+            Key=s3_key,
+            UploadId=upload_id,
+            MultipartUpload={'Parts': part_list}
+        )
+        journal.remove()
+
+        if self.checksum_algorithm and len(checksums) == len(parts):
+            actual = response.get(f'Checksum{self.checksum_algorithm}')
+            expected = composite_checksum(self.checksum_algorithm, [checksums[n] for n in sorted(checksums)])
+            if actual and actual.split('-')[0] != expected.split('-')[0]:
+                raise ChecksumMismatchError(f"{s3_key} 组合校验值不一致: 期望 {expected}，服务端 {actual}")
+        return True
+
+    def abort_orphaned_uploads(self, prefix: str = "", older_than: timedelta = timedelta(days=1)) -> int:
+        """中止存储桶中没有对应本地日志且超过指定时间的分片上传"""
+        active_ids = list_journal_upload_ids(self.journal_dir)
+        cutoff = datetime.now(timezone.utc) - older_than
+        aborted = 0
+        params = {'Bucket': self.bucket, 'Prefix': prefix}
+
+        while True:
+            response = self.client.list_multipart_uploads(**params)
+            for upload in response.get('Uploads', []):
+                if upload['UploadId'] in active_ids:
+                    continue
+                initiated = upload.get('Initiated')
+                if initiated and initiated > cutoff:
+                    continue
+                try:
+                    self.client.abort_multipart_upload(
+                        Bucket=self.bucket,
+                        Key=upload['Key'],
+                        UploadId=upload['UploadId']
+                    )
+                    aborted += 1
+                except ClientError as e:
+                    print(f"中止分片上传失败 {upload['Key']}: {e}")
+
+            if not response.get('IsTruncated', False):
+                break
+            params['KeyMarker'] = response.get('NextKeyMarker')
+            params['UploadIdMarker'] = response.get('NextUploadIdMarker')
+
+        return aborted
@@ -0,0 +1,131 @@
+import fnmatch
+import re
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+MODE_SUBSTRING = "substring"
+MODE_GLOB = "glob"
+MODE_REGEX = "regex"
+SEARCH_MODES = (MODE_SUBSTRING, MODE_GLOB, MODE_REGEX)
+
+SIZE_UNITS = {'': 1, 'B': 1, 'K': 1024, 'KB': 1024, 'M': 1024 ** 2, 'MB': 1024 ** 2,
+              'G': 1024 ** 3, 'GB': 1024 ** 3, 'T': 1024 ** 4, 'TB': 1024 ** 4}
+
+
+def parse_size(text: str) -> int:
+    """解析 1048576、512K、10MB、1.5G 等大小（按 1024 进位）"""
+    match = re.fullmatch(r'\s*([\d.]+)\s*([A-Za-z]*)\s*', text)
+    if not match or match.group(2).upper() not in SIZE_UNITS:
+        raise ValueError(f"无效的大小: {text}")
+    return int(float(match.group(1)) * SIZE_UNITS[match.group(2).upper()])
+
+
+def parse_date(text: str) -> datetime:
+    """解析 2024-01-31 或 2024-01-31T12:00:00，不带时区时按本地时间"""
+    try:
+        value = datetime.fromisoformat(text.strip())
+    except ValueError:
+        raise ValueError(f"无效的日期: {text}")
+    if value.tzinfo is None:
+        value = value.astimezone()
+    return value.astimezone(timezone.utc)
+
+
+def _escape_like(text: str) -> str:
+    return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+class SearchQuery:
+    """对象搜索条件：名称模式（包含、通配符或正则）加大小和修改时间范围
+
+    模式中不含 / 时匹配对象名（最后一段），否则匹配相对于搜索前缀的路径。
+    包含和通配符模式可以转换为 SQLite 的 LIKE 条件，在本地索引中预先过滤；
+    最终结果总是由 matches 按完整语义判断。
+    """
+
+    def __init__(self, pattern: str = "", mode: str = MODE_SUBSTRING, case_sensitive: bool = False,
+                 min_size: Optional[int] = None, max_size: Optional[int] = None,
+                 modified_after: Optional[datetime] = None, modified_before: Optional[datetime] = None):
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"未知的搜索方式: {mode}")
+        self.pattern = pattern
+        self.mode = mode
+        self.case_sensitive = case_sensitive
+        self.min_size = min_size
+        self.max_size = max_size
+        self.modified_after = modified_after
+        self.modified_before = modified_before
+        self.match_path = '/' in pattern
+
+        flags = 0 if case_sensitive else re.IGNORECASE
+        if mode == MODE_REGEX:
+            try:
+                self._regex = re.compile(pattern, flags)
+            except re.error as e:
+                raise ValueError(f"无效的正则表达式: {e}")
+        elif mode == MODE_GLOB:
+            self._regex = re.compile(fnmatch.translate(pattern), flags)
+        else:
+            self._regex = None
+            self._needle = pattern if case_sensitive else pattern.lower()
+
+    def target(self, key: str, prefix: str) -> str:
+        relative = key[len(prefix):]
+        return relative if self.match_path else relative.rsplit('/', 1)[-1]
+
+    def matches(self, key: str, size: int, last_modified: Optional[datetime], prefix: str = "") -> bool:
+        if self.min_size is not None and size < self.min_size:
+            return False
+        if self.max_size is not None and size > self.max_size:
+            return False
+        if self.modified_after is not None and (last_modified is None or last_modified < self.modified_after):
+            return False
+        if self.modified_before is not None and (last_modified is None or last_modified >= self.modified_before):
+            return False
+        if not self.pattern:
+            return True
+        text = self.target(key, prefix)
+        if self._regex is not None:
+            if self.mode == MODE_REGEX:
+                return self._regex.search(text) is not None
+            return self._regex.match(text) is not None
+        if not self.case_sensitive:
+            text = text.lower()
+        return self._needle in text
+
+    def like_pattern(self) -> Optional[str]:
+        """可用于预过滤的 LIKE 模式（ESCAPE '\\'），无法转换时返回 None
+
+        SQLite 的 LIKE 只对 ASCII 字母忽略大小写，因此模式含非 ASCII 字符时不预过滤；
+        大小写敏感的搜索同样可以用它预过滤，只是结果多一些。
+        """
+        if not self.pattern or self.mode == MODE_REGEX or not self.pattern.isascii():
+            return None
+        if self.mode == MODE_SUBSTRING:
+            return '%' + _escape_like(self.pattern) + '%'
+        if '[' in self.pattern:
+            return None
+        return ''.join('%' if c == '*' else '_' if c == '?' else _escape_like(c) for c in self.pattern)
+
+    def regex_pattern(self) -> Optional[str]:
+        """无法转换为 LIKE 的模式（正则、带 [] 的通配符）在索引中用 REGEXP 过滤"""
+        if not self.pattern or self.like_pattern() is not None:
+            return None
+        flags = "" if self.case_sensitive else "(?i)"
+        if self.mode == MODE_GLOB:
+            return flags + "^" + fnmatch.translate(self.pattern)
+        if self.mode == MODE_REGEX:
+            return flags + self.pattern
+        return None
+
+    def index_filter(self) -> Dict[str, Any]:
+        """BucketIndex.search 的过滤参数"""
+        return {
+            'match_path': self.match_path,
+            'like': self.like_pattern(),
+            'regex': self.regex_pattern(),
+            'min_size': self.min_size,
+            'max_size': self.max_size,
+            'modified_after': self.modified_after.timestamp() if self.modified_after else None,
+            'modified_before': self.modified_before.timestamp() if self.modified_before else None
+        }
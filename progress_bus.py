@@ -0,0 +1,218 @@
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, Iterable, List, Optional
+
+from transfer_scheduler import TransferJob, JOB_DONE, JOB_CANCELLED
+
+# 界面刷新频率（秒），所有进度按这个节奏合并成一次快照
+DEFAULT_INTERVAL = 0.1
+# 计算速度的滑动窗口（秒）
+RATE_WINDOW = 3.0
+
+
+class ProgressBus:
+    """传输进度总线
+
+    工作线程只在各作业上累加字节数（TransferJob.checkpoint），不直接触碰界面；
+    总线按固定频率读取一次所有作业的计数，计算每个作业的速度、剩余时间和总速度，
+    把同一份快照发给所有订阅者。jobs_source 返回当前的作业列表。
+    """
+
+    def __init__(self, jobs_source: Callable[[], Iterable[TransferJob]], interval: float = DEFAULT_INTERVAL,
+                 window: float = RATE_WINDOW):
+        self.jobs_source = jobs_source
+        self.interval = interval
+        self.window = window
+        self._samples: Dict[int, deque] = {}
+        self._subscribers: List[Callable[[Dict], None]] = []
+        self._lock = threading.Lock()
+        self._root = None
+        self._after_id = None
+
+    def subscribe(self, callback: Callable[[Dict], None]):
+        with self._lock:
+            self._subscribers.append(callback)
+
+    def unsubscribe(self, callback: Callable[[Dict], None]):
+        with self._lock:
+            if callback in self._subscribers:
+                self._subscribers.remove(callback)
+
+    def _rate(self, job: TransferJob, now: float) -> float:
+        samples = self._samples.setdefault(job.id, deque())
+        samples.append((now, job.bytes_transferred))
+        while len(samples) > 2 and now - samples[0][0] > self.window:
+            samples.popleft()
+        elapsed = now - samples[0][0]
+        if elapsed <= 0:
+            return 0.0
+        return max(0.0, (samples[-1][1] - samples[0][1]) / elapsed)
+
+    def snapshot(self) -> Dict:
+        """返回 {'jobs': [...], 'rate', 'bytes_done', 'bytes_total', 'active'}，速度单位为字节/秒"""
+        now = time.monotonic()
+        jobs = []
+        total_rate = 0.0
+        bytes_done = 0
+        bytes_total = 0
+        active = 0
+        seen = set()
+        with self._lock:
+            for job in self.jobs_source():
+                seen.add(job.id)
+                state = job.state
+                finished = state in (JOB_DONE, JOB_CANCELLED)
+                rate = 0.0 if finished else self._rate(job, now)
+                done = job.bytes_transferred
+                total = max(job.bytes_total, done)
+                remaining = total - done
+                if finished or not remaining:
+                    eta = 0.0
+                else:
+                    eta = remaining / rate if rate > 0 else None
+                jobs.append({
+                    'id': job.id,
+                    'name': job.name,
+                    'state': state,
+                    'priority': job.priority,
+                    'files_done': job.done,
+                    'files_failed': job.failed,
+                    'files_pending': job.pending + job.running,
+                    'bytes_done': done,
+                    'bytes_total': total,
+                    'rate': rate,
+                    'eta': eta
+                })
+                if not finished:
+                    active += 1
+                    total_rate += rate
+                    bytes_done += done
+                    bytes_total += total
+            # 丢弃已移除作业的采样
+            for job_id in list(self._samples):
+                if job_id not in seen:
+                    del self._samples[job_id]
+        return {
+            'jobs': jobs,
+            'rate': total_rate,
+            'bytes_done': bytes_done,
+            'bytes_total': bytes_total,
+            'active': active
+        }
+
+    def publish(self):
+        snapshot = self.snapshot()
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            try:
+                callback(snapshot)
+            except Exception as e:
+                print(f"进度回调失败: {e}")
+
+    def attach(self, root):
+        """在 Tk 主循环中按 interval 定时发布快照，订阅者直接在界面线程中执行"""
+        self._root = root
+        self._schedule()
+
+    def _schedule(self):
+        self._after_id = self._root.after(int(self.interval * 1000), self._tick)
+
+    def _tick(self):
+        self.publish()
+        self._schedule()
+
+    def detach(self):
+        if self._root is not None and self._after_id is not None:
+            self._root.after_cancel(self._after_id)
+        self._root = None
+        self._after_id = None
+
+
+def format_rate(rate: float) -> str:
+    return f"{rate / (1024 * 1024):.2f} MB/s"
+
+
+def format_eta(eta: Optional[float]) -> str:
+    if eta is None:
+        return "--"
+    eta = int(eta)
+    if eta >= 3600:
+        return f"{eta // 3600}:{eta % 3600 // 60:02d}:{eta % 60:02d}"
+    return f"{eta // 60}:{eta % 60:02d}"
+
+
+class FolderProgress:
+    """文件夹传输的字节级进度
+
+    各工作线程通过 file_callback 返回的百分比回调报告单个文件的进度，这里换算成字节并与
+    已完成文件的字节数合并；失败文件计入 bytes_failed，使 (bytes_done + bytes_failed)
+    最终等于 bytes_total。回调按 interval 节流，结束时强制报告一次。
+    """
+
+    def __init__(self, callback=None, interval: float = DEFAULT_INTERVAL, listing_complete: bool = True):
+        self.callback = callback
+        self.interval = interval
+        self.started = time.monotonic()
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, int] = {}
+        self._completed_bytes = 0
+        self._last_report = 0.0
+        self.stats = {
+            'files_done': 0,
+            'files_failed': 0,
+            'files_total': 0,
+            'bytes_done': 0,
+            'bytes_failed': 0,
+            'bytes_total': 0,
+            'rate': 0.0,
+            'listing_complete': listing_complete
+        }
+
+    def add_file(self, size: int):
+        with self._lock:
+            self.stats['files_total'] += 1
+            self.stats['bytes_total'] += size
+
+    def file_callback(self, key: str, size: int):
+        def callback(percent: float):
+            with self._lock:
+                self._inflight[key] = min(size, int(size * percent / 100))
+            self.report()
+        return callback
+
+    def file_finished(self, key: str, size: int, success: bool):
+        with self._lock:
+            self._inflight.pop(key, None)
+            if success:
+                self.stats['files_done'] += 1
+                self._completed_bytes += size
+            else:
+                self.stats['files_failed'] += 1
+                self.stats['bytes_failed'] += size
+        self.report()
+
+    def finish_listing(self):
+        with self._lock:
+            self.stats['listing_complete'] = True
+        self.report()
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            snapshot = dict(self.stats)
+            snapshot['bytes_done'] = self._completed_bytes + sum(self._inflight.values())
+        elapsed = time.monotonic() - self.started
+        # 整体平均速度（字节/秒）
+        snapshot['rate'] = snapshot['bytes_done'] / elapsed if elapsed > 0 else 0.0
+        return snapshot
+
+    def report(self, force: bool = False):
+        if not self.callback:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if not force and now - self._last_report < self.interval:
+                return
+            self._last_report = now
+        self.callback(self.snapshot())
@@ -0,0 +1,249 @@
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Any, Optional
+
+from transfer_config import choose_part_size
+from checksums import ExpectedChecksum, OrderedChecksumFeeder, StreamingChecksum
+
+READ_CHUNK_SIZE = 1024 * 1024
+
+
+class RangeBitmap:
+    """记录已完成的字节区间，保存在下载文件旁的 sidecar 文件中"""
+
+    def __init__(self, sidecar_path: str):
+        self.path = sidecar_path
+        self.etag = None
+        self.size = 0
+        self.range_size = 0
+        self.bits = bytearray()
+        self._lock = threading.Lock()
+
+    @property
+    def range_count(self) -> int:
+        if not self.range_size:
+            return 0
+        return max(1, (self.size + self.range_size - 1) // self.range_size)
+
+    def load(self) -> bool:
+        if not os.path.exists(self.path):
+            return False
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.etag = data['etag']
+            self.size = data['size']
+            self.range_size = data['range_size']
+            self.bits = bytearray.fromhex(data['bitmap'])
+            return True
+        except (OSError, ValueError, KeyError):
+            return False
+
+    def reset(self, etag: str, size: int, range_size: int):
+        self.etag = etag
+        self.size = size
+        self.range_size = range_size
+        self.bits = bytearray((self.range_count + 7) // 8)
+        self.save()
+
+    def is_done(self, index: int) -> bool:
+        return bool(self.bits[index // 8] & (1 << (index % 8)))
+
+    def mark_done(self, index: int):
+        with self._lock:
+            self.bits[index // 8] |= 1 << (index % 8)
+            self.save()
+
+    def missing(self):
+        return [i for i in range(self.range_count) if not self.is_done(i)]
+
+    def save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'etag': self.etag,
+                'size': self.size,
+                'range_size': self.range_size,
+                'bitmap': self.bits.hex()
+            }, f)
+        os.replace(tmp_path, self.path)
+
+    def remove(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class _OffsetWriter:
+    """按偏移写入预分配文件；有 os.pwrite 时直接使用，否则每个线程单独打开文件句柄"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fd = os.open(path, os.O_RDWR | getattr(os, 'O_BINARY', 0)) if hasattr(os, 'pwrite') else None
+        self._local = threading.local()
+        self._handles = []
+        self._lock = threading.Lock()
+
+    def write(self, offset: int, data: bytes):
+        if self._fd is not None:
+            view = memoryview(data)
+            while view:
+                written = os.pwrite(self._fd, view, offset)
+                view = view[written:]
+                offset += written
+            return
+        handle = getattr(self._local, 'handle', None)
+        if handle is None:
+            handle = open(self.path, 'r+b')
+            self._local.handle = handle
+            with self._lock:
+                self._handles.append(handle)
+        handle.seek(offset)
+        handle.write(data)
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+        for handle in self._handles:
+            handle.close()
+
+
+class RangedDownloader:
+    """按字节区间并发下载大对象，支持断点续传"""
+
+    def __init__(self, client, bucket: str, chunk_size: int, max_workers: int = 4):
+        self.client = client
+        self.bucket = bucket
+        self.chunk_size = chunk_size
+        self.max_workers = max(1, max_workers)
+
+    def download(self, s3_key: str, local_path: str, head: Optional[Dict[str, Any]] = None,
+                 progress_callback=None, expected_checksum: Optional[ExpectedChecksum] = None,
+                 throttle=None) -> bool:
+        """expected_checksum 不为空时边下载边校验，校验失败会丢弃临时文件和续传记录
+
+        throttle(nbytes) 在每读到一块数据后调用，可阻塞（暂停、限速）或抛出异常（取消）。
+        """
+        if head is None:
+            head = self.client.head_object(Bucket=self.bucket, Key=s3_key)
+        size = head['ContentLength']
+        etag = head['ETag']
+
+        temp_path = f"{local_path}.s3part"
+        bitmap = RangeBitmap(f"{temp_path}.json")
+        resumed = (bitmap.load() and bitmap.etag == etag and bitmap.size == size
+                   and os.path.exists(temp_path) and os.path.getsize(temp_path) == size)
+        if not resumed:
+            # 对象已变化或没有可用的续传记录，重新预分配文件
+            bitmap.reset(etag, size, choose_part_size(size, self.chunk_size))
+            with open(temp_path, 'wb') as f:
+                f.truncate(size)
+
+        range_size = bitmap.range_size
+        missing = bitmap.missing()
+        transferred = size - sum(min(range_size, size - i * range_size) for i in missing)
+        progress_lock = threading.Lock()
+
+        def report(length: int):
+            nonlocal transferred
+            if not progress_callback:
+                return
+            with progress_lock:
+                transferred += length
+                progress = (transferred / size) * 100 if size else 100
+            progress_callback(progress)
+
+        writer = _OffsetWriter(temp_path)
+        feeder = None
+        if expected_checksum is not None:
+            feeder = OrderedChecksumFeeder(expected_checksum, range_size, size)
+            if resumed:
+                feeder.catch_up(temp_path, bitmap.is_done)
+
+        def fetch_range(index: int):
+            start = index * range_size
+            end = min(start + range_size, size) - 1
+            # IfMatch 保证各区间来自同一个对象版本
+            response = self.client.get_object(
+                Bucket=self.bucket,
+                Key=s3_key,
+                Range=f"bytes={start}-{end}",
+                IfMatch=etag
+            )
+            body = response['Body']
+            offset = start
+            # 校验时保留本区间的数据块，写盘后直接送去计算，不必再从磁盘读回
+            chunks = [] if feeder is not None else None
+            try:
+                for chunk in iter(lambda: body.read(READ_CHUNK_SIZE), b''):
+                    if throttle:
+                        throttle(len(chunk))
+                    writer.write(offset, chunk)
+                    offset += len(chunk)
+                    if chunks is not None:
+                        chunks.append(chunk)
+                    report(len(chunk))
+            finally:
+                body.close()
+            if offset != end + 1:
+                raise IOError(f"区间 {start}-{end} 数据不完整")
+            bitmap.mark_done(index)
+            if feeder is not None:
+                feeder.submit(index, chunks)
+
+        try:
+            if size and missing:
+                report(0)
+                with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                    futures = [executor.submit(fetch_range, i) for i in missing]
+                    for future in as_completed(futures):
+                        future.result()
+        finally:
+            writer.close()
+
+        if feeder is not None:
+            try:
+                feeder.finish(temp_path)
+            except IOError:
+                # 数据已损坏，下次需要完整重新下载
+                bitmap.remove()
+                os.remove(temp_path)
+                raise
+
+        os.replace(temp_path, local_path)
+        bitmap.remove()
+        return True
+
+
+def download_verified(client, bucket: str, s3_key: str, local_path: str, expected_checksum: ExpectedChecksum,
+                      progress_callback=None, throttle=None) -> bool:
+    """顺序下载小对象，写入的同时计算校验值，校验通过后才替换目标文件"""
+    response = client.get_object(Bucket=bucket, Key=s3_key)
+    size = response['ContentLength']
+    temp_path = f"{local_path}.s3part"
+    stream = StreamingChecksum(expected_checksum)
+    transferred = 0
+    body = response['Body']
+    try:
+        with open(temp_path, 'wb') as f:
+            for chunk in iter(lambda: body.read(READ_CHUNK_SIZE), b''):
+                if throttle:
+                    throttle(len(chunk))
+                f.write(chunk)
+                stream.update(chunk)
+                transferred += len(chunk)
+                if progress_callback:
+                    progress_callback((transferred / size) * 100 if size else 100)
+        stream.verify()
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    finally:
+        body.close()
+
+    os.replace(temp_path, local_path)
+    return True
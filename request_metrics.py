@@ -0,0 +1,219 @@
+import json
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+# 延迟直方图的桶上限（秒），与 Prometheus 默认桶一致
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# 表示请求被限流的状态码和错误码
+THROTTLE_STATUS = (429, 503)
+THROTTLE_CODES = ('SlowDown', 'Throttling', 'ThrottlingException', 'RequestLimitExceeded',
+                  'TooManyRequests', 'TooManyRequestsException', 'RequestThrottled')
+
+
+class LatencyHistogram:
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds: float):
+        index = len(LATENCY_BUCKETS)
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                index = i
+                break
+        self.counts[index] += 1
+        self.count += 1
+        self.sum += seconds
+
+    def quantile(self, q: float) -> Optional[float]:
+        """按桶内线性插值估计分位数（秒）"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        lower = 0.0
+        for i, bucket_count in enumerate(self.counts):
+            upper = LATENCY_BUCKETS[i] if i < len(LATENCY_BUCKETS) else LATENCY_BUCKETS[-1]
+            if bucket_count and seen + bucket_count >= rank:
+                return lower + (upper - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+            lower = upper
+        return LATENCY_BUCKETS[-1]
+
+
+class _OperationStats:
+    __slots__ = ('calls', 'requests', 'errors', 'retries', 'throttled', 'bytes_sent', 'bytes_received', 'latency')
+
+    def __init__(self):
+        self.calls = 0
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.throttled = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.latency = LatencyHistogram()
+
+
+class RequestMetrics:
+    """挂在 botocore 事件上的请求统计
+
+    按 API（PutObject、ListObjectsV2 ...）记录调用次数、实际发送的请求数（含重试）、
+    错误、重试、限流响应、收发字节数和调用延迟直方图（从发起调用到解析完响应，包含重试）。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._operations: Dict[str, _OperationStats] = {}
+        self.started = time.time()
+
+    def install(self, client):
+        events = client.meta.events
+        events.register('before-call.s3', self._before_call)
+        events.register('before-send.s3', self._before_send)
+        events.register('needs-retry.s3', self._needs_retry)
+        events.register('after-call.s3', self._after_call)
+        events.register('after-call-error.s3', self._after_call_error)
+
+    def _stats(self, operation: str) -> _OperationStats:
+        stats = self._operations.get(operation)
+        if stats is None:
+            stats = self._operations[operation] = _OperationStats()
+        return stats
+
+    def _before_call(self, model, context, **kwargs):
+        context['metrics_started'] = time.perf_counter()
+        context['metrics_operation'] = model.name
+        with self._lock:
+            self._stats(model.name).calls += 1
+        # before-call 返回非 None 会跳过请求
+        return None
+
+    def _before_send(self, request, event_name, **kwargs):
+        operation = event_name.rsplit('.', 1)[-1]
+        length = request.headers.get('Content-Length')
+        with self._lock:
+            stats = self._stats(operation)
+            stats.requests += 1
+            if length:
+                stats.bytes_sent += int(length)
+        # before-send 返回非 None 会被当作响应
+        return None
+
+    def _needs_retry(self, response=None, operation=None, **kwargs):
+        if response is None or operation is None:
+            return None
+        http_response, parsed = response
+        code = (parsed or {}).get('Error', {}).get('Code')
+        if http_response.status_code in THROTTLE_STATUS or code in THROTTLE_CODES:
+            with self._lock:
+                self._stats(operation.name).throttled += 1
+        # 返回值会被当作重试等待时间，这里只做统计
+        return None
+
+    def _finish(self, operation: str, context, metadata: Dict, received: int, error: bool):
+        started = context.pop('metrics_started', None)
+        with self._lock:
+            stats = self._stats(operation)
+            stats.retries += metadata.get('RetryAttempts', 0)
+            stats.bytes_received += received
+            if error:
+                stats.errors += 1
+            if started is not None:
+                stats.latency.observe(time.perf_counter() - started)
+
+    def _after_call(self, http_response, parsed, model, context, **kwargs):
+        # 错误响应（4xx/5xx）同样经过 after-call，之后才由客户端抛出 ClientError
+        length = http_response.headers.get('content-length')
+        self._finish(model.name, context, parsed.get('ResponseMetadata', {}), int(length) if length else 0,
+                     http_response.status_code >= 400)
+
+    def _after_call_error(self, context, **kwargs):
+        # 连接失败等没有响应的错误；旧版 botocore 没有该事件，这类调用只计入调用次数
+        operation = context.get('metrics_operation')
+        if operation is not None:
+            self._finish(operation, context, {}, 0, True)
+
+    def reset(self):
+        with self._lock:
+            self._operations = {}
+            self.started = time.time()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """返回 {'since', 'operations': {API: {...}}, 'total': {...}}，延迟单位为毫秒"""
+        with self._lock:
+            operations = {}
+            total = _OperationStats()
+            for name, stats in sorted(self._operations.items()):
+                operations[name] = self._describe(stats)
+                for field in _OperationStats.__slots__[:-1]:
+                    setattr(total, field, getattr(total, field) + getattr(stats, field))
+                for i, count in enumerate(stats.latency.counts):
+                    total.latency.counts[i] += count
+                total.latency.count += stats.latency.count
+                total.latency.sum += stats.latency.sum
+            return {'since': self.started, 'operations': operations, 'total': self._describe(total)}
+
+    @staticmethod
+    def _describe(stats: _OperationStats) -> Dict[str, Any]:
+        def ms(value):
+            return round(value * 1000, 2) if value is not None else None
+
+        latency = stats.latency
+        return {
+            'calls': stats.calls,
+            'requests': stats.requests,
+            'errors': stats.errors,
+            'retries': stats.retries,
+            'throttled': stats.throttled,
+            'bytes_sent': stats.bytes_sent,
+            'bytes_received': stats.bytes_received,
+            'latency_avg_ms': ms(latency.sum / latency.count) if latency.count else None,
+            'latency_p50_ms': ms(latency.quantile(0.5)),
+            'latency_p99_ms': ms(latency.quantile(0.99)),
+            'latency_buckets': list(latency.counts)
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.snapshot(), ensure_ascii=False, indent=2)
+
+    def to_prometheus(self) -> str:
+        """Prometheus 文本格式"""
+        with self._lock:
+            items = [(name, stats) for name, stats in sorted(self._operations.items())]
+            lines: List[str] = []
+            counters = (
+                ('s3fm_calls_total', 'calls', "API calls"),
+                ('s3fm_requests_total', 'requests', "HTTP requests sent, including retries"),
+                ('s3fm_errors_total', 'errors', "API calls that failed"),
+                ('s3fm_retries_total', 'retries', "Retried requests"),
+                ('s3fm_throttled_total', 'throttled', "Throttling responses (429/503 SlowDown)"),
+                ('s3fm_bytes_sent_total', 'bytes_sent', "Request body bytes"),
+                ('s3fm_bytes_received_total', 'bytes_received', "Response body bytes"),
+            )
+            for metric, field, help_text in counters:
+                lines.append(f"# HELP {metric} {help_text}")
+                lines.append(f"# TYPE {metric} counter")
+                for name, stats in items:
+                    lines.append(f'{metric}{{operation="{name}"}} {getattr(stats, field)}')
+
+            metric = 's3fm_call_latency_seconds'
+            lines.append(f"# HELP {metric} API call latency including retries")
+            lines.append(f"# TYPE {metric} histogram")
+            for name, stats in items:
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS + ('+Inf',), stats.latency.counts):
+                    cumulative += count
+                    lines.append(f'{metric}_bucket{{operation="{name}",le="{bound}"}} {cumulative}')
+                lines.append(f'{metric}_sum{{operation="{name}"}} {stats.latency.sum:.6f}')
+                lines.append(f'{metric}_count{{operation="{name}"}} {stats.latency.count}')
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path: str):
+        """写入统计：.prom/.txt 为 Prometheus 文本格式，其余为 JSON"""
+        text = self.to_prometheus() if path.endswith(('.prom', '.txt')) else self.to_json()
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
@@ -3,8 +3,11 @@
 S3 API 文件管理器启动脚本
 """
 
+from startup_timing import startup_timer
+
 import sys
 import os
+import importlib.util
 from pathlib import Path
 
 def check_dependencies():
@@ -12,10 +15,9 @@ def check_dependencies():
     required_packages = ['boto3', 'tkinterdnd2']
     missing_packages = []
     
+    # 只查找模块是否存在，不真正导入（boto3 导入较慢，推迟到创建客户端时）
     for package in required_packages:
-        try:
-            __import__(package)
-        except ImportError:
+        if importlib.util.find_spec(package) is None:
             missing_packages.append(package)
     
     if missing_packages:
@@ -28,17 +30,19 @@ def check_dependencies():
     
     return True
 
-def load_env_file():
+def load_env_file(verbose: bool = True):
     """加载.env文件"""
     env_file = Path('.env')
     if env_file.exists():
         try:
             from dotenv import load_dotenv
             load_dotenv()
-            print("已加载 .env 配置文件")
+            if verbose:
+                print("已加载 .env 配置文件")
         except ImportError:
-            print("提示: 安装 python-dotenv 可自动加载 .env 文件")
-    else:
+            if verbose:
+                print("提示: 安装 python-dotenv 可自动加载 .env 文件")
+    elif verbose:
         print("提示: 可以创建 .env 文件来配置S3连接信息")
         print("参考 .env.example 文件格式")
 
@@ -53,6 +57,7 @@ def main():
     
     try:
         from main_gui import S3GUI
+        startup_timer.mark('import')
         app = S3GUI()
         app.run()
     except Exception as e:
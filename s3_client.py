@@ -1,28 +1,73 @@
-import boto3
-from botocore.config import Config
 from botocore.exceptions import ClientError, NoCredentialsError
 from typing import List, Dict, Any, Optional, Tuple
 import os
-from datetime import datetime
-import mimetypes
+from datetime import datetime, timedelta
 from pathlib import Path
 import threading
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import random
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+
+from transfer_config import TransferSettings, guess_content_type, MAX_POOL_CONNECTIONS
+from multipart_upload import ResumableUploader, get_journal_dir
+from ranged_download import RangedDownloader, download_verified
+from checksums import (ChecksumMismatchError, ExpectedChecksum, SUPPORTED_ALGORITHMS, fetch_expected_checksum,
+                       is_algorithm_available, verification_result)
+from folder_rename import FolderRenamer, RenameJournal, copy_object
+from listing_cache import ListingCache, parent_prefix
+from bucket_index import BucketIndex, get_index_path
+from folder_stats import DEFAULT_TOP, FolderStats, FolderStatsCache, stats_result
+from object_search import SearchQuery
+from sharded_lister import ShardedLister
+from folder_sync import FolderSync, SyncPlan, UPLOAD, COMPARE_MTIME
+from transfer_scheduler import TransferScheduler, TransferJob, TransferCancelled, PRIORITY_HIGH, PRIORITY_NORMAL
+from progress_bus import FolderProgress
+from request_metrics import RequestMetrics
+from adaptive_concurrency import AdaptiveLimiter
 
 class S3Client:
     def __init__(self, config_manager):
         self.config_manager = config_manager
         self.client = None
+        self.bucket_index = None
+        # 最近一次传输校验的结果，按对象键记录，供属性对话框显示
+        self.checksum_results: Dict[str, Dict[str, Any]] = {}
+        self.scheduler: Optional[TransferScheduler] = None
+        self.small_file_pool: Optional[ThreadPoolExecutor] = None
+        # 按 API 统计请求数、重试、限流和延迟，重新连接后继续累计
+        self.metrics = RequestMetrics()
+        self._scheduler_lock = threading.Lock()
+        app_settings = config_manager.get_app_settings()
+        # 按限流和延迟自动调整同时在途的请求数，所有批量操作共用
+        self.limiter = AdaptiveLimiter(
+            app_settings.get('adaptive_initial_requests', 8),
+            app_settings.get('adaptive_min_requests', 2),
+            min(app_settings.get('adaptive_max_requests', MAX_POOL_CONNECTIONS), MAX_POOL_CONNECTIONS)
+        )
+        self.listing_cache = ListingCache(
+            app_settings.get('listing_cache_ttl', 300),
+            app_settings.get('listing_cache_max_bytes', 64 * 1024 * 1024)
+        )
+        self.folder_stats_cache = FolderStatsCache(app_settings.get('folder_stats_ttl', 600))
         self.connect()
     
     def connect(self):
         s3_config = self.config_manager.get_s3_config()
         
         try:
+            # boto3 加载较慢（服务模型、端点数据），推迟到创建客户端时再导入
+            import boto3
+            from botocore.config import Config
+            
+            app_settings = self.config_manager.get_app_settings()
+            # adaptive 重试模式：带抖动的指数退避，并在收到限流响应后在客户端限速
             config = Config(
                 region_name=s3_config.get('region', 'auto'),
-                retries={'max_attempts': 3},
-                max_pool_connections=50
+                retries={
+                    'max_attempts': app_settings.get('max_retry_attempts', 5),
+                    'mode': app_settings.get('retry_mode', 'adaptive')
+                },
+                max_pool_connections=MAX_POOL_CONNECTIONS
             )
             
             self.client = boto3.client(
@@ -32,6 +77,9 @@ class S3Client:
                 aws_secret_access_key=s3_config['secret_key'],
                 config=config
             )
+            self.metrics.install(self.client)
+            if app_settings.get('adaptive_concurrency', True):
+                self.limiter.install(self.client)
             
             self.bucket_name = s3_config['bucket']
             return True
@@ -39,6 +87,125 @@ class S3Client:
             print(f"连接S3失败: {e}")
             return False
     
+    def get_request_stats(self) -> Dict[str, Any]:
+        """各 API 的请求统计（格式见 RequestMetrics.snapshot），concurrency 为自适应并发的当前状态"""
+        stats = self.metrics.snapshot()
+        stats['concurrency'] = self.limiter.snapshot()
+        return stats
+    
+    def get_transfer_settings(self) -> TransferSettings:
+        return TransferSettings(self.config_manager.get_app_settings())
+    
+    def get_scheduler(self) -> TransferScheduler:
+        """所有上传下载共用的调度器，首次传输时创建"""
+        with self._scheduler_lock:
+            if self.scheduler is None:
+                app_settings = self.config_manager.get_app_settings()
+                self.scheduler = TransferScheduler(
+                    app_settings.get('max_concurrent_transfers', 8),
+                    app_settings.get('bandwidth_limit', 0)
+                )
+            return self.scheduler
+    
+    def get_small_file_pool(self) -> ThreadPoolExecutor:
+        """小文件上传专用的线程池：请求耗时以往返延迟为主，并发数高于普通传输"""
+        with self._scheduler_lock:
+            if self.small_file_pool is None:
+                self.small_file_pool = ThreadPoolExecutor(
+                    max_workers=self.get_transfer_settings().small_file_concurrency,
+                    thread_name_prefix="small-put"
+                )
+            return self.small_file_pool
+    
+    def get_resumable_uploader(self, shared_workers: int = 1) -> ResumableUploader:
+        settings = self.get_transfer_settings()
+        return ResumableUploader(
+            self.client,
+            self.bucket_name,
+            get_journal_dir(self.config_manager),
+            settings.chunk_size,
+            settings.per_file_concurrency(shared_workers),
+            self._upload_checksum_algorithm()
+        )
+    
+    def _upload_checksum_algorithm(self) -> Optional[str]:
+        """上传时使用的附加校验算法（app_settings.checksum_algorithm），未启用时返回 None"""
+        algorithm = (self.config_manager.get_app_settings().get('checksum_algorithm') or '').upper()
+        if not algorithm:
+            return None
+        if algorithm not in SUPPORTED_ALGORITHMS or not is_algorithm_available(algorithm):
+            print(f"校验算法 {algorithm} 不可用，上传时不附加校验值（CRC32C 需要安装 crc32c 或 awscrt）")
+            return None
+        return algorithm
+    
+    def _fetch_expected_checksum(self, s3_key: str) -> Optional[ExpectedChecksum]:
+        try:
+            expected = fetch_expected_checksum(self.client, self.bucket_name, s3_key)
+        except Exception as e:
+            print(f"读取校验值失败 {s3_key}: {e}")
+            return None
+        if expected is not None and not is_algorithm_available(expected.algorithm):
+            print(f"本地无法计算 {expected.algorithm}，跳过校验 {s3_key}")
+            return None
+        return expected
+    
+    def _cache_scope(self) -> Tuple[str, str]:
+        return self.config_manager.get_s3_config().get('endpoint', ''), self.bucket_name
+    
+    def get_bucket_index(self, create: bool = False) -> Optional[BucketIndex]:
+        """返回本地存储桶索引；未启用 use_bucket_index 时返回 None"""
+        if not create and not self.config_manager.get_app_settings().get('use_bucket_index', False):
+            return None
+        path = get_index_path(self.config_manager, *self._cache_scope())
+        if self.bucket_index is None or self.bucket_index.path != path:
+            self.bucket_index = BucketIndex(path)
+        return self.bucket_index
+    
+    def build_bucket_index(self, progress_callback=None) -> int:
+        """全量扫描存储桶建立本地索引，并启用索引"""
+        try:
+            index = self.get_bucket_index(create=True)
+            count = index.crawl(self.iter_object_pages(""), progress_callback)
+            self.config_manager.config['app_settings']['use_bucket_index'] = True
+            self.config_manager.save_config()
+            self.listing_cache.clear()
+            self.folder_stats_cache.clear()
+            return count
+        except Exception as e:
+            print(f"建立索引失败: {e}")
+            return 0
+    
+    def _record_put(self, s3_key: str, size: int):
+        # 本地变更直接更新缓存和索引，不必重新列出
+        self.listing_cache.record_put(*self._cache_scope(), s3_key, size)
+        self.folder_stats_cache.invalidate_key(*self._cache_scope(), s3_key)
+        index = self.get_bucket_index()
+        if index is not None:
+            index.record_put(s3_key, size)
+    
+    def _record_delete(self, s3_key: str):
+        self._record_deletes([s3_key])
+    
+    def _record_deletes(self, keys: List[str]):
+        # 批量删除时整批更新：目录列表按上级目录合并，统计缓存只加一次锁
+        if not keys:
+            return
+        self.listing_cache.record_deletes(*self._cache_scope(), keys)
+        self.folder_stats_cache.invalidate_keys(*self._cache_scope(), keys)
+        index = self.get_bucket_index()
+        if index is not None:
+            index.record_deletes(keys)
+    
+    def _invalidate_tree(self, prefix: str, removed: bool = True):
+        """前缀下的对象整体变化后使缓存失效；removed 为 False（部分删除失败）时保留索引和上级目录中的文件夹，
+        已确认删除的键应先通过 _record_deletes 或索引的 record_deletes 移除
+        """
+        self.listing_cache.invalidate_tree(*self._cache_scope(), prefix, remove_folder=removed)
+        self.folder_stats_cache.invalidate_tree(*self._cache_scope(), prefix)
+        index = self.get_bucket_index()
+        if index is not None and removed:
+            index.delete_tree(prefix)
+    
     def test_connection(self) -> bool:
         try:
             self.client.head_bucket(Bucket=self.bucket_name)
@@ -46,107 +213,270 @@ class S3Client:
         except Exception:
             return False
     
-    def list_objects(self, prefix: str = "", delimiter: str = "/", progress_callback=None) -> Tuple[List[Dict], List[Dict]]:
+    def list_objects(self, prefix: str = "", delimiter: str = "/", progress_callback=None,
+                     use_cache: bool = True, reconcile_callback=None) -> Tuple[List[Dict], List[Dict]]:
+        """列出目录内容；use_cache=False 时强制重新请求并刷新缓存
+
+        启用本地索引时直接从索引返回，同时在后台实时列出进行核对，
+        结果有变化时调用 reconcile_callback(folders, files)。
+        """
+        folders = []
+        files = []
+        page_count = 0
+        for page_folders, page_files, has_more in self.list_objects_stream(
+                prefix, delimiter, use_cache=use_cache, reconcile_callback=reconcile_callback):
+            page_count += 1
+            folders.extend(page_folders)
+            files.extend(page_files)
+            # 回调进度更新
+            if progress_callback:
+                progress_callback(page_count, len(folders) + len(files), has_more)
+        return folders, files
+    
+    def list_objects_stream(self, prefix: str = "", delimiter: str = "/", use_cache: bool = True,
+                            reconcile_callback=None, cancel_event: Optional[threading.Event] = None):
+        """list_objects 的流式版本：每收到一页就产出 (folders, files, has_more)
+
+        命中缓存或索引时一次性产出全部结果；cancel_event 被设置后停止请求后续页。
+        """
+        if use_cache and delimiter == "/":
+            cached = self.listing_cache.get(*self._cache_scope(), prefix)
+            if cached is not None:
+                yield cached[0], cached[1], False
+                return
+            
+            index = self.get_bucket_index()
+            if index is not None and index.is_ready():
+                max_objects = self.config_manager.get_app_settings().get('max_list_objects', 10000)
+                folders, files = index.list_prefix(prefix, max_objects)
+                self.listing_cache.put(*self._cache_scope(), prefix, folders, files)
+                threading.Thread(target=self._reconcile_listing, args=(prefix, reconcile_callback),
+                                 daemon=True).start()
+                yield folders, files, False
+                return
+        
+        folders = []
+        files = []
+        complete = False
+        try:
+            for page_folders, page_files, has_more in self.iter_list_pages(prefix, delimiter, cancel_event):
+                folders.extend(page_folders)
+                files.extend(page_files)
+                complete = not has_more
+                yield page_folders, page_files, has_more
+        except ClientError as e:
+            print(f"列出对象失败: {e}")
+            return
+        
+        if cancel_event is not None and cancel_event.is_set():
+            return
+        
+        if delimiter == "/":
+            self.listing_cache.put(*self._cache_scope(), prefix, folders, files)
+            index = self.get_bucket_index()
+            if index is not None and complete:
+                index.reconcile_prefix(prefix, folders, files)
+    
+    def _reconcile_listing(self, prefix: str, reconcile_callback=None):
+        """后台实时列出目录，并用结果更新索引和缓存"""
         try:
-            # 获取最大文件数限制
-            max_objects = self.config_manager.get_app_settings().get('max_list_objects', 10000)
+            folders = []
+            files = []
+            complete = False
+            for page_folders, page_files, has_more in self.iter_list_pages(prefix, "/"):
+                folders.extend(page_folders)
+                files.extend(page_files)
+                complete = not has_more
+        except Exception as e:
+            print(f"后台核对列表失败 {prefix}: {e}")
+            return
+        
+        self.listing_cache.put(*self._cache_scope(), prefix, folders, files)
+        index = self.get_bucket_index()
+        # 列表被 max_list_objects 截断时不能据此删除索引中的条目
+        if index is not None and complete and index.reconcile_prefix(prefix, folders, files):
+            if reconcile_callback:
+                reconcile_callback(folders, files)
+    
+    def iter_list_pages(self, prefix: str, delimiter: str = "/", cancel_event: Optional[threading.Event] = None):
+        """实时分页列出目录，每页产出 (folders, files, has_more)；达到 max_list_objects 时停止"""
+        # 获取最大文件数限制
+        max_objects = self.config_manager.get_app_settings().get('max_list_objects', 10000)
+        total_objects = 0
+        
+        for response in self.get_sharded_lister().iter_pages(prefix, delimiter, cancel_event):
+            common_prefixes = response.get('CommonPrefixes', [])
+            contents = response.get('Contents', [])
+            
+            # 截断到最大文件数
+            remaining = max_objects - total_objects
+            common_prefixes = common_prefixes[:remaining]
+            contents = contents[:remaining - len(common_prefixes)]
+            total_objects += len(common_prefixes) + len(contents)
             
             folders = []
             files = []
-            continuation_token = None
-            total_objects = 0
-            page_count = 0
             
-            while total_objects < max_objects:
-                page_count += 1
-                
-                # 构建请求参数
-                params = {
-                    'Bucket': self.bucket_name,
-                    'Prefix': prefix,
-                    'Delimiter': delimiter,
-                    'MaxKeys': min(1000, max_objects - total_objects)
-                }
+            # 处理文件夹
+            for common_prefix in common_prefixes:
+                folder_name = common_prefix['Prefix'].rstrip('/')
+                if prefix:
+                    folder_name = folder_name[len(prefix):].lstrip('/')
                 
-                if continuation_token:
-                    params['ContinuationToken'] = continuation_token
+                folders.append({
+                    'name': folder_name,
+                    'type': 'folder',
+                    'full_path': common_prefix['Prefix']
+                })
+            
+            # 处理文件
+            for obj in contents:
+                if obj['Key'] == prefix:
+                    continue
                 
-                response = self.client.list_objects_v2(**params)
+                file_name = obj['Key']
+                if prefix:
+                    file_name = file_name[len(prefix):].lstrip('/')
                 
-                # 处理文件夹
-                for common_prefix in response.get('CommonPrefixes', []):
-                    folder_name = common_prefix['Prefix'].rstrip('/')
-                    if prefix:
-                        folder_name = folder_name[len(prefix):].lstrip('/')
-                    
-                    folders.append({
-                        'name': folder_name,
-                        'type': 'folder',
-                        'full_path': common_prefix['Prefix']
+                if '/' not in file_name:
+                    files.append({
+                        'name': file_name,
+                        'type': 'file',
+                        'size': obj['Size'],
+                        'last_modified': obj['LastModified'],
+                        'full_path': obj['Key']
                     })
-                
-                # 处理文件
-                for obj in response.get('Contents', []):
-                    if obj['Key'] == prefix:
-                        continue
-                    
-                    file_name = obj['Key']
-                    if prefix:
-                        file_name = file_name[len(prefix):].lstrip('/')
-                    
-                    if '/' not in file_name:
-                        files.append({
-                            'name': file_name,
-                            'type': 'file',
-                            'size': obj['Size'],
-                            'last_modified': obj['LastModified'],
-                            'full_path': obj['Key']
-                        })
-                
-                # 更新计数和进度
-                current_batch = len(response.get('CommonPrefixes', [])) + len(response.get('Contents', []))
-                total_objects += current_batch
-                
-                # 回调进度更新
-                if progress_callback:
-                    progress_callback(page_count, len(folders) + len(files), response.get('IsTruncated', False))
-                
-                # 检查是否还有更多数据
-                if not response.get('IsTruncated', False):
-                    break
-                
-                continuation_token = response.get('NextContinuationToken')
-                if not continuation_token:
-                    break
             
-            return folders, files
-        except ClientError as e:
-            print(f"列出对象失败: {e}")
-            return [], []
+            has_more = response.get('IsTruncated', False)
+            if total_objects >= max_objects:
+                # 达到上限，列表不完整
+                yield folders, files, True
+                return
+            
+            yield folders, files, has_more
+            
+            # 检查是否还有更多数据
+            if not has_more:
+                return
     
-    def upload_file(self, local_path: str, s3_key: str, progress_callback=None) -> bool:
+    def upload_file(self, local_path: str, s3_key: str, progress_callback=None, shared_workers: int = 1,
+                    job: Optional[TransferJob] = None) -> bool:
+        """job 不为空时传输受该作业的暂停/取消控制，并按作业和全局设置限速"""
         try:
+            throttle = self.get_scheduler().throttle_for(job)
             file_size = os.path.getsize(local_path)
-            content_type = mimetypes.guess_type(local_path)[0] or 'application/octet-stream'
+            if job is not None and not job.presized:
+                job.add_bytes_total(file_size)
+            settings = self.get_transfer_settings()
+            content_type = guess_content_type(local_path)
+            
+            checksum_algorithm = self._upload_checksum_algorithm()
+            
+            if file_size < settings.small_file_threshold:
+                # 小文件一次读入后直接 put_object，省去传输管理器的线程、future 和回调开销
+                with open(local_path, 'rb') as f:
+                    data = f.read()
+                throttle(len(data))
+                params = {'Bucket': self.bucket_name, 'Key': s3_key, 'Body': data, 'ContentType': content_type}
+                if checksum_algorithm:
+                    params['ChecksumAlgorithm'] = checksum_algorithm
+                self.client.put_object(**params)
+                if progress_callback:
+                    progress_callback(100)
+                self._record_put(s3_key, file_size)
+                self._record_upload_checksum(s3_key, checksum_algorithm)
+                return True
+            
+            # 大文件走可续传的分片上传，中断后可从第一个缺失分片继续
+            if file_size >= settings.resumable_threshold:
+                uploader = self.get_resumable_uploader(shared_workers)
+                uploader.upload(local_path, s3_key, {'ContentType': content_type}, progress_callback, throttle)
+                self._record_put(s3_key, file_size)
+                self._record_upload_checksum(s3_key, checksum_algorithm)
+                return True
+            
+            transfer_config = settings.upload_config(file_size, shared_workers)
+            
+            transferred = 0
+            progress_lock = threading.Lock()
             
             def upload_callback(bytes_transferred):
+                # boto3 每次回调传入的是本次新增的字节数，且来自多个分片线程
+                nonlocal transferred
+                throttle(bytes_transferred)
                 if progress_callback:
-                    progress = (bytes_transferred / file_size) * 100
+                    with progress_lock:
+                        transferred += bytes_transferred
+                        progress = (transferred / file_size) * 100 if file_size else 100
                     progress_callback(progress)
             
+            extra_args = {'ContentType': content_type}
+            if checksum_algorithm:
+                # 由 boto3 计算校验值随请求发送，服务端校验不一致时拒绝写入
+                extra_args['ChecksumAlgorithm'] = checksum_algorithm
+            
             self.client.upload_file(
                 local_path,
                 self.bucket_name,
                 s3_key,
-                ExtraArgs={'ContentType': content_type},
-                Callback=upload_callback
+                ExtraArgs=extra_args,
+                Callback=upload_callback,
+                Config=transfer_config
             )
+            self._record_put(s3_key, file_size)
+            self._record_upload_checksum(s3_key, checksum_algorithm)
             return True
+        except TransferCancelled:
+            print(f"上传已取消 {local_path}")
+            return False
+        except ChecksumMismatchError as e:
+            self.checksum_results[s3_key] = verification_result(None, 'mismatch', str(e))
+            print(f"上传文件校验失败 {local_path}: {e}")
+            return False
         except Exception as e:
             print(f"上传文件失败 {local_path}: {e}")
             return False
     
-    def upload_folder(self, local_folder: str, s3_prefix: str = "", progress_callback=None, max_workers: int = 5):
+    def _record_upload_checksum(self, s3_key: str, algorithm: Optional[str]):
+        if algorithm:
+            result = verification_result(None, 'verified', "上传时由服务端校验")
+            result['algorithm'] = algorithm
+            self.checksum_results[s3_key] = result
+    
+    def submit_upload(self, local_path: str, s3_key: str, progress_callback=None,
+                      priority: int = PRIORITY_HIGH) -> Tuple[TransferJob, Future]:
+        """把单个文件的上传提交给调度器，默认优先于文件夹传输；返回作业（用于暂停/取消）和结果 Future"""
+        scheduler = self.get_scheduler()
+        job = scheduler.create_job(f"上传 {os.path.basename(local_path)}", priority)
+        future = scheduler.submit(job, self.upload_file, local_path, s3_key, progress_callback,
+                                  scheduler.max_workers, job)
+        job.seal()
+        return job, future
+    
+    def submit_download(self, s3_key: str, local_path: str, progress_callback=None,
+                        priority: int = PRIORITY_HIGH) -> Tuple[TransferJob, Future]:
+        scheduler = self.get_scheduler()
+        job = scheduler.create_job(f"下载 {os.path.basename(s3_key)}", priority)
+        future = scheduler.submit(job, self.download_file, s3_key, local_path, progress_callback,
+                                  scheduler.max_workers, job)
+        job.seal()
+        return job, future
+    
+    def upload_folder(self, local_folder: str, s3_prefix: str = "", progress_callback=None, max_workers: Optional[int] = None,
+                      job: Optional[TransferJob] = None, priority: int = PRIORITY_NORMAL,
+                      errors: Optional[List[Dict[str, str]]] = None):
+        """各文件作为同一作业的任务提交给全局调度器，max_workers 限制本作业同时上传的文件数
+
+        progress_callback 接收统计字典：files_done、files_failed、files_total、bytes_done、
+        bytes_failed、bytes_total、rate（字节/秒）、listing_complete；失败的文件记录到 errors。
+        """
+        settings = self.get_transfer_settings()
+        if max_workers is None:
+            max_workers = settings.max_concurrent_uploads
+        scheduler = self.get_scheduler()
+        if job is None:
+            job = scheduler.create_job(f"上传 {local_folder}", priority, max_running=max_workers, presized=True)
+        progress = FolderProgress(progress_callback)
         local_folder = Path(local_folder)
         files_to_upload = []
         
@@ -154,248 +484,631 @@ class S3Client:
             if file_path.is_file():
                 relative_path = file_path.relative_to(local_folder)
                 s3_key = f"{s3_prefix}/{relative_path}".replace('\\', '/').lstrip('/')
-                files_to_upload.append((str(file_path), s3_key))
+                size = file_path.stat().st_size
+                files_to_upload.append((str(file_path), s3_key, size))
+                progress.add_file(size)
+                if job.presized:
+                    job.add_bytes_total(size)
         
-        successful_uploads = 0
-        total_files = len(files_to_upload)
+        futures = {}
+        for local_path, s3_key, size in files_to_upload:
+            args = (self.upload_file, local_path, s3_key, progress.file_callback(s3_key, size), scheduler.max_workers, job)
+            if size < settings.small_file_threshold:
+                # 小文件走高并发的 put_object 线程池，大文件仍由调度器按全局并发数执行
+                future = scheduler.submit_to(self.get_small_file_pool(), job, *args)
+            else:
+                future = scheduler.submit(job, *args)
+            futures[future] = (local_path, s3_key, size)
+        job.seal()
         
-        def upload_single_file(file_info):
-            local_path, s3_key = file_info
-            success = self.upload_file(local_path, s3_key)
-            return success
-        
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            future_to_file = {executor.submit(upload_single_file, file_info): file_info 
-                              for file_info in files_to_upload}
-            
-            for future in as_completed(future_to_file):
-                if future.result():
-                    successful_uploads += 1
-                
-                if progress_callback:
-                    progress = (successful_uploads / total_files) * 100
-                    progress_callback(progress)
+        for future in as_completed(futures):
+            local_path, s3_key, size = futures[future]
+            try:
+                success = future.result()
+            except TransferCancelled:
+                success = False
+            except Exception as e:
+                print(f"上传文件失败 {local_path}: {e}")
+                success = False
+            if not success and errors is not None:
+                errors.append({'Key': s3_key, 'Message': "已取消" if job.cancelled else "上传失败"})
+            progress.file_finished(s3_key, size, success)
         
-        return successful_uploads, total_files
+        progress.report(force=True)
+        return progress.stats['files_done'], progress.stats['files_total']
+    
+    def plan_sync(self, local_folder: str, s3_prefix: str = "", direction: str = UPLOAD,
+                  delete: bool = False, compare: str = COMPARE_MTIME) -> SyncPlan:
+        """比较本地目录和 S3 前缀，返回需要执行的变更（不做任何修改，可用于试运行）"""
+        return FolderSync(self, compare).plan(local_folder, s3_prefix, direction, delete)
     
-    def download_file(self, s3_key: str, local_path: str, progress_callback=None) -> bool:
+    def sync_folder(self, local_folder: str, s3_prefix: str = "", direction: str = UPLOAD,
+                    delete: bool = False, compare: str = COMPARE_MTIME, progress_callback=None,
+                    errors: Optional[List[Dict[str, str]]] = None) -> Dict[str, int]:
+        """同步本地目录和 S3 前缀，只传输新增或变化的文件
+
+        direction 为 upload（本地→S3）或 download（S3→本地）；delete=True 时镜像同步，
+        删除目标端多出的文件。compare 为 mtime（大小+修改时间）或 checksum（大小+内容摘要）。
+        返回统计字典，progress_callback 接收同样格式的字典。
+        """
+        sync = FolderSync(self, compare)
+        try:
+            plan = sync.plan(local_folder, s3_prefix, direction, delete)
+            return sync.execute(plan, progress_callback, errors)
+        except Exception as e:
+            print(f"同步文件夹失败: {e}")
+            return {'files_done': 0, 'files_failed': 0, 'files_total': 0, 'bytes_done': 0,
+                    'bytes_total': 0, 'deleted': 0, 'delete_failed': 0, 'unchanged': 0, 'error': str(e)}
+    
+    def cleanup_multipart_uploads(self, prefix: str = "", older_than_hours: float = 24) -> int:
+        """中止存储桶中遗留的未完成分片上传"""
+        try:
+            uploader = self.get_resumable_uploader()
+            return uploader.abort_orphaned_uploads(prefix, timedelta(hours=older_than_hours))
+        except Exception as e:
+            print(f"清理分片上传失败: {e}")
+            return 0
+    
+    def download_file(self, s3_key: str, local_path: str, progress_callback=None, shared_workers: int = 1,
+                      job: Optional[TransferJob] = None) -> bool:
+        """job 的含义同 upload_file"""
+        expected = None
         try:
+            throttle = self.get_scheduler().throttle_for(job)
             os.makedirs(os.path.dirname(local_path), exist_ok=True)
+            settings = self.get_transfer_settings()
             
             try:
                 response = self.client.head_object(Bucket=self.bucket_name, Key=s3_key)
+            except ClientError:
+                response = None
+            if response is not None and job is not None and not job.presized:
+                job.add_bytes_total(response['ContentLength'])
+            
+            if response is not None and self.config_manager.get_app_settings().get('verify_download_checksums', False):
+                expected = self._fetch_expected_checksum(s3_key)
+            
+            if response is None:
+                self.client.download_file(self.bucket_name, s3_key, local_path,
+                                          Callback=throttle,
+                                          Config=settings.download_config(shared_workers=shared_workers))
+            elif response['ContentLength'] >= settings.resumable_threshold:
+                # 大对象按区间并发下载，已完成的区间记录在 sidecar 文件中，重新下载时只补缺失部分
+                downloader = RangedDownloader(
+                    self.client,
+                    self.bucket_name,
+                    settings.chunk_size,
+                    settings.per_file_concurrency(shared_workers)
+                )
+                downloader.download(s3_key, local_path, response, progress_callback, expected, throttle)
+            elif expected is not None:
+                # 需要校验的小对象顺序下载，写入的同时计算校验值
+                download_verified(self.client, self.bucket_name, s3_key, local_path, expected, progress_callback,
+                                  throttle)
+            else:
                 file_size = response['ContentLength']
+                transfer_config = settings.download_config(file_size, shared_workers)
+                
+                transferred = 0
+                progress_lock = threading.Lock()
                 
                 def download_callback(bytes_transferred):
+                    nonlocal transferred
+                    throttle(bytes_transferred)
                     if progress_callback:
-                        progress = (bytes_transferred / file_size) * 100
+                        with progress_lock:
+                            transferred += bytes_transferred
+                            progress = (transferred / file_size) * 100 if file_size else 100
                         progress_callback(progress)
                 
                 self.client.download_file(
                     self.bucket_name,
                     s3_key,
                     local_path,
-                    Callback=download_callback
+                    Callback=download_callback,
+                    Config=transfer_config
                 )
-            except:
-                self.client.download_file(self.bucket_name, s3_key, local_path)
             
+            if expected is not None:
+                self.checksum_results[s3_key] = verification_result(expected, 'verified')
             return True
+        except TransferCancelled:
+            print(f"下载已取消 {s3_key}")
+            return False
+        except ChecksumMismatchError as e:
+            self.checksum_results[s3_key] = verification_result(expected, 'mismatch', str(e))
+            print(f"下载文件校验失败 {s3_key}: {e}")
+            return False
         except Exception as e:
             print(f"下载文件失败 {s3_key}: {e}")
             return False
     
-    def download_folder(self, s3_prefix: str, local_folder: str, progress_callback=None, max_workers: int = 3):
+    def get_sharded_lister(self) -> ShardedLister:
+        shards = self.config_manager.get_app_settings().get('listing_shards', 8)
+        return ShardedLister(self.client, self.bucket_name, shards, bucket_index=self.get_bucket_index())
+    
+    def iter_object_pages(self, prefix: str = "", page_size: int = 1000,
+                          cancel_event: Optional[threading.Event] = None):
+        """逐页列出前缀下的所有对象（不使用分隔符），每次产出一页 Contents
+
+        超过一页时按键区间分片并发列出，结果仍按键顺序产出。
+        """
+        for page in self.get_sharded_lister().iter_pages(prefix, cancel_event=cancel_event):
+            if page['Contents']:
+                yield page['Contents']
+    
+    def get_folder_stats(self, prefix: str, use_cache: bool = True, progress_callback=None,
+                         cancel_event: Optional[threading.Event] = None,
+                         top: int = DEFAULT_TOP) -> Optional[Dict[str, Any]]:
+        """递归统计前缀下的对象数、总大小、最大的若干对象和修改时间范围
+
+        依次使用统计缓存、本地索引（已建立时）和并发全量列表；扫描时按页调用
+        progress_callback(objects, bytes)。结果写入缓存，前缀下有上传、删除或移动时失效。
+        取消或失败时返回 None。
+        """
+        scope = self._cache_scope()
+        if use_cache:
+            cached = self.folder_stats_cache.get(*scope, prefix)
+            if cached is not None:
+                return cached
+        
+        generation = self.folder_stats_cache.generation
         try:
-            response = self.client.list_objects_v2(
-                Bucket=self.bucket_name,
-                Prefix=s3_prefix
-            )
-            
-            files_to_download = []
-            for obj in response.get('Contents', []):
-                s3_key = obj['Key']
-                relative_path = s3_key[len(s3_prefix):].lstrip('/')
-                if relative_path:
-                    local_path = os.path.join(local_folder, relative_path)
-                    files_to_download.append((s3_key, local_path))
-            
-            successful_downloads = 0
-            total_files = len(files_to_download)
-            
-            def download_single_file(file_info):
-                s3_key, local_path = file_info
-                return self.download_file(s3_key, local_path)
-            
-            with ThreadPoolExecutor(max_workers=max_workers) as executor:
-                future_to_file = {executor.submit(download_single_file, file_info): file_info 
-                                  for file_info in files_to_download}
-                
-                for future in as_completed(future_to_file):
-                    if future.result():
-                        successful_downloads += 1
-                    
+            index = self.get_bucket_index()
+            if index is not None and index.is_ready():
+                summary = index.prefix_stats(prefix, top)
+                stats = stats_result(prefix, summary['objects'], summary['bytes'], summary['largest'],
+                                     summary['oldest'], summary['newest'], 'index')
+            else:
+                folder_stats = FolderStats(prefix, top)
+                for page in self.iter_object_pages(prefix, cancel_event=cancel_event):
+                    folder_stats.add_page(page)
                     if progress_callback:
-                        progress = (successful_downloads / total_files) * 100
-                        progress_callback(progress)
-            
-            return successful_downloads, total_files
+                        progress_callback(folder_stats.objects, folder_stats.bytes)
+                if cancel_event is not None and cancel_event.is_set():
+                    return None
+                stats = folder_stats.to_dict()
         except Exception as e:
-            print(f"下载文件夹失败: {e}")
-            return 0, 0
+            print(f"统计文件夹失败 {prefix}: {e}")
+            return None
+        
+        self.folder_stats_cache.put(*scope, prefix, stats, generation)
+        return stats
+    
+    def search_objects(self, prefix: str, query: SearchQuery, max_results: Optional[int] = None,
+                       progress_callback=None, cancel_event: Optional[threading.Event] = None):
+        """在前缀下递归搜索对象，按批产出匹配的文件列表（name 为相对于 prefix 的路径）
+
+        已建立本地索引时直接在索引中查询（大小、时间和可转换的名称条件由 SQLite 过滤）；
+        否则用按键区间分片的并发全量列表边列边过滤。progress_callback(scanned, matched)
+        在每批之后调用，索引查询时 scanned 为 None。
+        """
+        matched = 0
+        scanned = 0
+        index = self.get_bucket_index()
+        if index is not None and index.is_ready():
+            batches = index.search(prefix, **query.index_filter())
+            pages = ([{'Key': key, 'Size': size, 'LastModified': last_modified}
+                      for key, size, last_modified in batch] for batch in batches)
+            from_index = True
+        else:
+            pages = self.iter_object_pages(prefix, cancel_event=cancel_event)
+            from_index = False
+        
+        for page in pages:
+            if cancel_event is not None and cancel_event.is_set():
+                return
+            scanned += len(page)
+            files = []
+            for obj in page:
+                key = obj['Key']
+                if key.endswith('/'):
+                    continue
+                last_modified = obj.get('LastModified')
+                if not query.matches(key, obj.get('Size', 0), last_modified, prefix):
+                    continue
+                files.append({
+                    'name': key[len(prefix):],
+                    'type': 'file',
+                    'size': obj.get('Size', 0),
+                    'last_modified': last_modified,
+                    'full_path': key
+                })
+                if max_results is not None and matched + len(files) >= max_results:
+                    break
+            matched += len(files)
+            if files:
+                yield files
+            if progress_callback:
+                progress_callback(None if from_index else scanned, matched)
+            if max_results is not None and matched >= max_results:
+                return
+    
+    def download_folder(self, s3_prefix: str, local_folder: str, progress_callback=None, max_workers: Optional[int] = None,
+                        job: Optional[TransferJob] = None, priority: int = PRIORITY_NORMAL,
+                        errors: Optional[List[Dict[str, str]]] = None):
+        """边列出边下载：每列出一页就把其中的文件提交给全局调度器，已提交未完成的任务数有上限
+
+        progress_callback 接收的统计字典同 upload_folder；列表完成前 files_total、bytes_total
+        为已列出的部分，listing_complete 为 False。
+        """
+        if max_workers is None:
+            max_workers = self.get_transfer_settings().max_concurrent_downloads
+        scheduler = self.get_scheduler()
+        if job is None:
+            job = scheduler.create_job(f"下载 {s3_prefix}", priority, max_running=max_workers, presized=True)
+        
+        max_inflight = max_workers * 4
+        inflight = threading.BoundedSemaphore(max_inflight)
+        progress = FolderProgress(progress_callback, listing_complete=False)
+        # 已提交但完成回调尚未执行完的任务数
+        outstanding = [0]
+        outstanding_changed = threading.Condition()
+        
+        def task_finished():
+            inflight.release()
+            with outstanding_changed:
+                outstanding[0] -= 1
+                outstanding_changed.notify_all()
+        
+        def on_done(future, s3_key, size):
+            try:
+                try:
+                    success = future.result()
+                except Exception:
+                    # 作业取消后未开始的任务以 TransferCancelled 结束
+                    success = False
+                if not success and errors is not None:
+                    errors.append({'Key': s3_key, 'Message': "已取消" if job.cancelled else "下载失败"})
+                progress.file_finished(s3_key, size, success)
+            finally:
+                task_finished()
+        
+        try:
+            for page in self.iter_object_pages(s3_prefix):
+                if job.cancelled:
+                    break
+                for obj in page:
+                    s3_key = obj['Key']
+                    relative_path = s3_key[len(s3_prefix):].lstrip('/')
+                    if not relative_path:
+                        continue
+                    local_path = os.path.join(local_folder, relative_path)
+                    if s3_key.endswith('/'):
+                        # 文件夹占位对象只创建本地目录
+                        os.makedirs(local_path, exist_ok=True)
+                        continue
+                    size = obj.get('Size', 0)
+                    progress.add_file(size)
+                    if job.presized:
+                        job.add_bytes_total(size)
+                    inflight.acquire()
+                    with outstanding_changed:
+                        outstanding[0] += 1
+                    try:
+                        future = scheduler.submit(job, self.download_file, s3_key, local_path,
+                                                  progress.file_callback(s3_key, size), scheduler.max_workers, job)
+                    except Exception:
+                        # 提交失败（调度器已关闭等）时归还许可，否则最后的等待永远不会结束
+                        task_finished()
+                        raise
+                    future.add_done_callback(lambda f, s3_key=s3_key, size=size: on_done(f, s3_key, size))
+                progress.report()
+        except Exception as e:
+            print(f"列出文件夹失败 {s3_prefix}: {e}")
+        finally:
+            job.seal()
+            progress.finish_listing()
+        
+        # 等待所有已提交任务的完成回调执行完毕
+        with outstanding_changed:
+            while outstanding[0]:
+                outstanding_changed.wait()
+        progress.report(force=True)
+        return progress.stats['files_done'], progress.stats['files_total']
     
     def delete_object(self, s3_key: str) -> bool:
         try:
             self.client.delete_object(Bucket=self.bucket_name, Key=s3_key)
+            self._record_delete(s3_key)
             return True
         except Exception as e:
             print(f"删除对象失败 {s3_key}: {e}")
             return False
     
-    def delete_folder(self, s3_prefix: str, progress_callback=None) -> Tuple[int, int]:
-        try:
-            # 第一步：列出所有要删除的对象
-            if progress_callback:
-                progress_callback("scan", 0, 0, "正在扫描文件夹内容...")
-            
-            all_objects = []
-            continuation_token = None
+    def delete_keys_batch(self, keys: List[str], max_attempts: int = 4,
+                          record: bool = True) -> Tuple[int, List[Dict[str, str]]]:
+        """按每批1000个调用 delete_objects，失败的键带退避重试，返回 (删除数, 最终失败列表)
+
+        record 为 False 时不逐批更新缓存和索引，由调用方在结束后整体失效（删除、重命名文件夹）。
+        """
+        deleted = 0
+        failures = []
+        
+        for i in range(0, len(keys), 1000):
+            pending = keys[i:i + 1000]
+            batch_errors = []
             
-            # 分页获取所有对象
-            while True:
-                params = {
-                    'Bucket': self.bucket_name,
-                    'Prefix': s3_prefix,
-                    'MaxKeys': 1000
-                }
-                
-                if continuation_token:
-                    params['ContinuationToken'] = continuation_token
-                
-                response = self.client.list_objects_v2(**params)
+            for attempt in range(max_attempts):
+                if attempt:
+                    # 指数退避加随机抖动
+                    time.sleep(min(8.0, 0.5 * (2 ** (attempt - 1))) * (0.5 + random.random()))
                 
-                batch_objects = [{'Key': obj['Key']} for obj in response.get('Contents', [])]
-                all_objects.extend(batch_objects)
-                
-                if progress_callback:
-                    progress_callback("scan", len(all_objects), 0, f"已扫描到 {len(all_objects)} 个文件...")
-                
-                if not response.get('IsTruncated', False):
-                    break
+                try:
+                    response = self.client.delete_objects(
+                        Bucket=self.bucket_name,
+                        Delete={'Objects': [{'Key': key} for key in pending], 'Quiet': True}
+                    )
+                except Exception as e:
+                    batch_errors = [{'Key': key, 'Code': 'RequestFailed', 'Message': str(e)} for key in pending]
+                    continue
                 
-                continuation_token = response.get('NextContinuationToken')
-                if not continuation_token:
+                batch_errors = response.get('Errors', [])
+                deleted += len(pending) - len(batch_errors)
+                if not batch_errors:
                     break
+                pending = [error['Key'] for error in batch_errors]
             
-            if not all_objects:
-                if progress_callback:
-                    progress_callback("complete", 0, 0, "文件夹为空")
-                return 0, 0
+            failures.extend({'Key': error.get('Key'), 'Code': error.get('Code', ''), 'Message': error.get('Message', '')}
+                            for error in batch_errors)
+            
+            if record:
+                failed_keys = {error.get('Key') for error in batch_errors}
+                self._record_deletes([key for key in keys[i:i + 1000] if key not in failed_keys])
+        
+        return deleted, failures
+    
+    def delete_folder(self, s3_prefix: str, progress_callback=None, errors: Optional[List[Dict[str, str]]] = None,
+                      max_inflight: Optional[int] = None) -> Tuple[int, int]:
+        """边列出边删除：每页列表直接交给 delete_objects 工作线程
+
+        progress_callback(phase, current, total, message)，phase 为 scan/delete/complete/error；
+        重试后仍删除失败的键追加到 errors 列表中。
+        """
+        if max_inflight is None:
+            max_inflight = self.config_manager.get_app_settings().get('max_inflight_deletes', 4)
+        
+        stats_lock = threading.Lock()
+        stats = {'scanned': 0, 'deleted': 0, 'failed': 0}
+        slots = threading.BoundedSemaphore(max_inflight)
+        
+        def delete_batch(keys):
+            try:
+                # 目录列表和统计缓存在结束后整个前缀一起失效，不逐个键更新；
+                # 索引只删除已确认删除的键，部分失败时仍与存储桶一致
+                deleted, failures = self.delete_keys_batch(keys, record=False)
+                index = self.get_bucket_index()
+                if index is not None:
+                    failed_keys = {failure['Key'] for failure in failures}
+                    index.record_deletes(key for key in keys if key not in failed_keys)
+            finally:
+                slots.release()
             
-            total_count = len(all_objects)
-            deleted_count = 0
+            with stats_lock:
+                stats['deleted'] += deleted
+                stats['failed'] += len(failures)
+                if errors is not None:
+                    errors.extend(failures)
+                deleted_count, scanned = stats['deleted'], stats['scanned']
             
             if progress_callback:
-                progress_callback("delete", 0, total_count, f"开始删除 {total_count} 个文件...")
+                progress_callback("delete", deleted_count, scanned,
+                                  f"已删除 {deleted_count}/{scanned} 个文件...")
+        
+        try:
+            if progress_callback:
+                progress_callback("scan", 0, 0, "正在扫描文件夹内容...")
             
-            # 分批删除（每批最多1000个对象）
-            batch_size = 1000
-            for i in range(0, len(all_objects), batch_size):
-                batch = all_objects[i:i + batch_size]
-                
-                try:
-                    delete_response = self.client.delete_objects(
-                        Bucket=self.bucket_name,
-                        Delete={'Objects': batch}
-                    )
+            with ThreadPoolExecutor(max_workers=max_inflight) as executor:
+                futures = []
+                for page in self.iter_object_pages(s3_prefix):
+                    keys = [obj['Key'] for obj in page]
+                    if not keys:
+                        continue
                     
-                    batch_deleted = len(delete_response.get('Deleted', []))
-                    deleted_count += batch_deleted
+                    with stats_lock:
+                        stats['scanned'] += len(keys)
+                        scanned = stats['scanned']
                     
                     if progress_callback:
-                        progress_callback("delete", deleted_count, total_count, 
-                                        f"已删除 {deleted_count}/{total_count} 个文件...")
+                        progress_callback("scan", scanned, 0, f"已扫描到 {scanned} 个文件...")
                     
-                    # 检查是否有删除失败的对象
-                    errors = delete_response.get('Errors', [])
-                    if errors:
-                        for error in errors:
-                            print(f"删除失败: {error.get('Key')} - {error.get('Message')}")
+                    # 限制同时进行的删除请求数，列表会在此处等待空闲的删除线程
+                    slots.acquire()
+                    futures.append(executor.submit(delete_batch, keys))
                 
-                except Exception as e:
-                    print(f"批量删除失败: {e}")
-                    # 继续删除其他批次
-                    continue
+                for future in futures:
+                    future.result()
+            
+            deleted_count, total_count = stats['deleted'], stats['scanned']
+            self._invalidate_tree(s3_prefix, removed=not stats['failed'])
+            
+            if not total_count:
+                if progress_callback:
+                    progress_callback("complete", 0, 0, "文件夹为空")
+                return 0, 0
             
             if progress_callback:
-                progress_callback("complete", deleted_count, total_count, 
-                                f"删除完成: {deleted_count}/{total_count} 个文件")
+                message = f"删除完成: {deleted_count}/{total_count} 个文件"
+                if stats['failed']:
+                    message += f"，{stats['failed']} 个删除失败"
+                progress_callback("complete", deleted_count, total_count, message)
             
             return deleted_count, total_count
         except Exception as e:
             print(f"删除文件夹失败: {e}")
+            self._invalidate_tree(s3_prefix, removed=False)
             if progress_callback:
-                progress_callback("error", 0, 0, f"删除失败: {str(e)}")
-            return 0, 0
+                progress_callback("error", stats['deleted'], stats['scanned'], f"删除失败: {str(e)}")
+            return stats['deleted'], stats['scanned']
+    
+    def delete_many(self, targets: List[str], progress_callback=None,
+                    errors: Optional[List[Dict[str, str]]] = None) -> Tuple[int, int]:
+        """批量删除：以 / 结尾的视为文件夹前缀并发展开，其余键按每批1000个合并为 delete_objects
+
+        progress_callback(phase, current, total, message) 汇总所有选中项的进度。
+        """
+        keys = [target for target in targets if not target.endswith('/')]
+        prefixes = [target for target in targets if target.endswith('/')]
+        
+        stats_lock = threading.Lock()
+        # 每个任务各自的 (已删除, 已扫描)，汇总后得到整体进度
+        task_stats = {}
+        
+        def report(task, deleted, scanned, phase="delete"):
+            with stats_lock:
+                task_stats[task] = (deleted, scanned)
+                total_deleted = sum(d for d, _ in task_stats.values())
+                total_scanned = sum(t for _, t in task_stats.values())
+            if progress_callback:
+                progress_callback(phase, total_deleted, total_scanned,
+                                  f"已删除 {total_deleted}/{total_scanned} 个文件...")
+        
+        def delete_key_batch(index, batch):
+            deleted, failures = self.delete_keys_batch(batch)
+            if errors is not None:
+                with stats_lock:
+                    errors.extend(failures)
+            report(('keys', index), deleted, len(batch))
+        
+        def delete_prefix(prefix):
+            def folder_callback(phase, current, total, message):
+                if phase == "scan":
+                    report(prefix, task_stats.get(prefix, (0, 0))[0], current, "scan")
+                elif phase in ("delete", "complete", "error"):
+                    report(prefix, current, max(total, task_stats.get(prefix, (0, 0))[1]))
+            
+            folder_errors = []
+            self.delete_folder(prefix, folder_callback, folder_errors)
+            if errors is not None:
+                with stats_lock:
+                    errors.extend(folder_errors)
+        
+        if progress_callback:
+            progress_callback("scan", 0, len(keys), f"正在删除 {len(targets)} 个项目...")
+        
+        max_inflight = self.config_manager.get_app_settings().get('max_inflight_deletes', 4)
+        with ThreadPoolExecutor(max_workers=max_inflight) as executor:
+            futures = [executor.submit(delete_prefix, prefix) for prefix in prefixes]
+            futures += [executor.submit(delete_key_batch, i, keys[i:i + 1000])
+                        for i in range(0, len(keys), 1000)]
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                except Exception as e:
+                    print(f"批量删除失败: {e}")
+        
+        total_deleted = sum(d for d, _ in task_stats.values())
+        total_scanned = sum(t for _, t in task_stats.values())
+        if progress_callback:
+            message = f"删除完成: {total_deleted}/{total_scanned} 个文件"
+            if total_deleted < total_scanned:
+                message += f"，{total_scanned - total_deleted} 个删除失败"
+            progress_callback("complete", total_deleted, total_scanned, message)
+        return total_deleted, total_scanned
     
     def get_object_info(self, s3_key: str) -> Optional[Dict[str, Any]]:
         try:
             response = self.client.head_object(Bucket=self.bucket_name, Key=s3_key)
-            return {
+            info = {
                 'size': response['ContentLength'],
                 'last_modified': response['LastModified'],
                 'content_type': response.get('ContentType', ''),
-                'etag': response['ETag'].strip('"')
+                'etag': response['ETag'].strip('"'),
+                'checksum': None,
+                'verification': self.checksum_results.get(s3_key)
             }
+            try:
+                expected = fetch_expected_checksum(self.client, self.bucket_name, s3_key)
+                if expected is not None:
+                    info['checksum'] = expected.to_dict()
+            except Exception:
+                pass
+            return info
         except Exception:
             return None
     
     def rename_object(self, old_key: str, new_key: str) -> bool:
         """重命名S3对象（文件或文件夹前缀）"""
         try:
-            # 复制对象到新位置
-            copy_source = {'Bucket': self.bucket_name, 'Key': old_key}
-            self.client.copy_object(
-                CopySource=copy_source,
-                Bucket=self.bucket_name,
-                Key=new_key
-            )
+            # 复制对象到新位置（超过5GB的对象使用分片复制）
+            size = self.client.head_object(Bucket=self.bucket_name, Key=old_key)['ContentLength']
+            copy_object(self.client, self.bucket_name, old_key, new_key, size)
             
             # 删除原对象
             self.client.delete_object(Bucket=self.bucket_name, Key=old_key)
+            self._record_delete(old_key)
+            self._record_put(new_key, size)
             return True
         except Exception as e:
             print(f"重命名对象失败 {old_key} -> {new_key}: {e}")
             return False
     
-    def rename_folder(self, old_prefix: str, new_prefix: str) -> Tuple[int, int]:
-        """重命名文件夹（重命名所有以该前缀开头的对象）"""
+    def copy_file(self, src_key: str, dst_key: str) -> bool:
+        """在存储桶内服务端复制对象"""
         try:
-            # 列出所有以旧前缀开头的对象
-            response = self.client.list_objects_v2(
-                Bucket=self.bucket_name,
-                Prefix=old_prefix
-            )
-            
-            objects_to_rename = response.get('Contents', [])
-            if not objects_to_rename:
-                return 0, 0
-            
-            renamed_count = 0
-            total_count = len(objects_to_rename)
-            
-            for obj in objects_to_rename:
-                old_key = obj['Key']
-                # 将旧前缀替换为新前缀
-                new_key = old_key.replace(old_prefix, new_prefix, 1)
-                
-                if self.rename_object(old_key, new_key):
-                    renamed_count += 1
-            
-            return renamed_count, total_count
+            size = self.client.head_object(Bucket=self.bucket_name, Key=src_key)['ContentLength']
+            copy_object(self.client, self.bucket_name, src_key, dst_key, size)
+            self._record_put(dst_key, size)
+            return True
+        except Exception as e:
+            print(f"复制对象失败 {src_key} -> {dst_key}: {e}")
+            return False
+
+    def get_folder_renamer(self) -> FolderRenamer:
+        settings = self.config_manager.get_app_settings()
+        return FolderRenamer(
+            self,
+            get_journal_dir(self.config_manager, "rename_journal"),
+            settings.get('max_concurrent_copies', 16)
+        )
+    
+    def rename_folder(self, old_prefix: str, new_prefix: str, progress_callback=None) -> Tuple[int, int]:
+        """重命名文件夹（重命名所有以该前缀开头的对象）
+
+        progress_callback(moved, failed, total) 在每页处理完成后调用。
+        中断或部分失败时日志会保留，可通过 rename_folder 继续或 rollback_rename 回滚。
+        """
+        try:
+            return self.get_folder_renamer().rename(old_prefix, new_prefix, progress_callback)
         except Exception as e:
             print(f"重命名文件夹失败: {e}")
             return 0, 0
+        finally:
+            self._invalidate_renamed(old_prefix, new_prefix)
+    
+    def rollback_rename(self, old_prefix: str, new_prefix: str, progress_callback=None) -> Tuple[int, int]:
+        """回滚未完成的文件夹重命名"""
+        try:
+            return self.get_folder_renamer().rollback(old_prefix, new_prefix, progress_callback)
+        except Exception as e:
+            print(f"回滚重命名失败: {e}")
+            return 0, 0
+        finally:
+            self._invalidate_renamed(old_prefix, new_prefix)
+    
+    def _invalidate_renamed(self, old_prefix: str, new_prefix: str):
+        scope = self._cache_scope()
+        self.listing_cache.invalidate_tree(*scope, old_prefix)
+        self.listing_cache.invalidate_tree(*scope, new_prefix)
+        # 部分移动时两个文件夹可能同时存在，上级目录需要重新列出
+        self.listing_cache.invalidate(*scope, parent_prefix(old_prefix))
+        self.listing_cache.invalidate(*scope, parent_prefix(new_prefix))
+        self.folder_stats_cache.invalidate_tree(*scope, old_prefix)
+        self.folder_stats_cache.invalidate_tree(*scope, new_prefix)
+        
+        index = self.get_bucket_index()
+        if index is not None:
+            try:
+                index.replace_tree(old_prefix, self.iter_object_pages(old_prefix))
+                index.replace_tree(new_prefix, self.iter_object_pages(new_prefix))
+            except Exception as e:
+                print(f"更新索引失败: {e}")
+    
+    def get_pending_renames(self) -> List[Dict[str, Any]]:
+        """列出当前存储桶中未完成的文件夹重命名"""
+        journal_dir = get_journal_dir(self.config_manager, "rename_journal")
+        return RenameJournal.list_pending(journal_dir, self.bucket_name)
     
     def create_folder(self, folder_path: str) -> bool:
         """创建文件夹（在S3中创建一个以/结尾的空对象）"""
@@ -409,6 +1122,7 @@ class S3Client:
                 Key=folder_path,
                 Body=b''
             )
+            self._record_put(folder_path, 0)
             return True
         except Exception as e:
             print(f"创建文件夹失败 {folder_path}: {e}")
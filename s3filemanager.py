@@ -0,0 +1,449 @@
+#!/usr/bin/env python3
+"""
+S3 API 文件管理器命令行模式（不依赖图形界面）
+
+用法:
+    python -m s3filemanager ls [s3://前缀] [-r]
+    python -m s3filemanager cp 源 目标 [-r]
+    python -m s3filemanager sync 源目录 目标目录 [--delete] [--checksum] [--dry-run]
+    python -m s3filemanager rm s3://键或前缀... [-r]
+    python -m s3filemanager mv s3://源 s3://目标 [-r]
+    python -m s3filemanager du [s3://前缀] [--top N]
+    python -m s3filemanager search [s3://前缀] 模式 [--glob|--regex] [--min-size 10M] [--after 2024-01-01]
+
+以 s3:// 开头的路径表示当前配置的存储桶中的键，其余为本地路径。
+结果和进度以 JSON 行输出到标准输出，其他提示信息输出到标准错误。
+
+--metrics PATH 在结束时写入各 API 的请求数、重试、限流和延迟统计。
+
+退出码: 0 成功，1 失败，2 参数错误，3 部分失败
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from config_manager import ConfigManager
+from folder_sync import UPLOAD, DOWNLOAD, COMPARE_MTIME, COMPARE_CHECKSUM
+from object_search import SearchQuery, MODE_SUBSTRING, MODE_GLOB, MODE_REGEX, parse_size, parse_date
+from run import load_env_file
+
+EXIT_OK = 0
+EXIT_FAILURE = 1
+EXIT_USAGE = 2
+EXIT_PARTIAL = 3
+
+S3_SCHEME = "s3://"
+
+
+class UsageError(Exception):
+    pass
+
+
+def is_remote(path: str) -> bool:
+    return path.startswith(S3_SCHEME)
+
+
+def to_key(path: str) -> str:
+    """s3://a/b -> a/b"""
+    return path[len(S3_SCHEME):].lstrip('/')
+
+
+def to_prefix(path: str) -> str:
+    """s3://a/b -> a/b/，s3:// -> 空前缀"""
+    key = to_key(path)
+    return key if not key or key.endswith('/') else key + '/'
+
+
+def exit_code(done: int, total: int) -> int:
+    if done >= total:
+        return EXIT_OK
+    return EXIT_FAILURE if done == 0 else EXIT_PARTIAL
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+class Output:
+    """JSON 行输出，进度事件按最小间隔节流"""
+
+    def __init__(self, stream, progress: bool = True, interval: float = 0.5):
+        self.stream = stream
+        self.progress_enabled = progress
+        self.interval = interval
+        self._last_progress = 0.0
+        self._lock = threading.Lock()
+
+    def emit(self, event: str, **fields):
+        record = {'event': event}
+        record.update(fields)
+        line = json.dumps(record, ensure_ascii=False, default=_json_default)
+        # 传输回调来自多个工作线程
+        with self._lock:
+            self.stream.write(line + "\n")
+            self.stream.flush()
+
+    def progress(self, op: str, force: bool = False, **fields):
+        if not self.progress_enabled:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if not force and now - self._last_progress < self.interval:
+                return
+            self._last_progress = now
+        self.emit('progress', op=op, **fields)
+
+    def result(self, op: str, code: int, **fields):
+        self.emit('result', op=op, ok=code == EXIT_OK, exit_code=code, **fields)
+        return code
+
+
+def cmd_ls(s3, args, out: Output) -> int:
+    prefix = to_prefix(args.path) if args.path else ""
+    folders = 0
+    files = 0
+    if args.recursive:
+        for page in s3.iter_object_pages(prefix):
+            for obj in page:
+                files += 1
+                out.emit('entry', type='file', key=obj['Key'], size=obj.get('Size', 0),
+                         last_modified=obj.get('LastModified'))
+    else:
+        truncated = False
+        for page_folders, page_files, has_more in s3.list_objects_stream(prefix, "/", use_cache=False):
+            for folder in page_folders:
+                folders += 1
+                out.emit('entry', type='folder', key=folder['full_path'])
+            for file in page_files:
+                files += 1
+                out.emit('entry', type='file', key=file['full_path'], size=file['size'],
+                         last_modified=file['last_modified'])
+            truncated = has_more
+        if truncated:
+            print("列表已达到 max_list_objects 上限，结果不完整", file=sys.stderr)
+    return out.result('ls', EXIT_OK, prefix=prefix, folders=folders, files=files)
+
+
+def cmd_du(s3, args, out: Output) -> int:
+    prefix = to_prefix(args.path) if args.path else ""
+
+    def progress_callback(objects, total_bytes):
+        out.progress('du', objects=objects, bytes=total_bytes)
+
+    stats = s3.get_folder_stats(prefix, progress_callback=progress_callback, top=args.top)
+    if stats is None:
+        return out.result('du', EXIT_FAILURE, prefix=prefix, message="统计失败")
+    return out.result('du', EXIT_OK, prefix=prefix, objects=stats['objects'], bytes=stats['bytes'],
+                      largest=stats['largest'], oldest=stats['oldest'], newest=stats['newest'],
+                      source=stats['source'])
+
+
+def cmd_search(s3, args, out: Output) -> int:
+    if args.path and not is_remote(args.path):
+        # 只给出模式时在整个存储桶中搜索
+        if args.pattern:
+            raise UsageError("搜索范围必须是 s3:// 前缀")
+        args.path, args.pattern = "", args.path
+    prefix = to_prefix(args.path) if args.path else ""
+    try:
+        query = SearchQuery(
+            args.pattern, args.mode, args.case_sensitive,
+            min_size=parse_size(args.min_size) if args.min_size else None,
+            max_size=parse_size(args.max_size) if args.max_size else None,
+            modified_after=parse_date(args.after) if args.after else None,
+            modified_before=parse_date(args.before) if args.before else None
+        )
+    except ValueError as e:
+        raise UsageError(str(e))
+
+    def progress_callback(scanned, matched):
+        out.progress('search', scanned=scanned, matched=matched)
+
+    matched = 0
+    for files in s3.search_objects(prefix, query, max_results=args.limit, progress_callback=progress_callback):
+        for file in files:
+            matched += 1
+            out.emit('entry', type='file', key=file['full_path'], size=file['size'],
+                     last_modified=file['last_modified'])
+    return out.result('search', EXIT_OK, prefix=prefix, matched=matched)
+
+
+def _folder_callback(out: Output, op: str):
+    def callback(stats):
+        finished = stats['listing_complete'] and stats['files_done'] + stats['files_failed'] == stats['files_total']
+        out.progress(op, force=finished, **stats)
+    return callback
+
+
+def _emit_errors(out: Output, op: str, errors: List[Dict[str, str]]):
+    for error in errors:
+        out.emit('error', op=op, key=error.get('Key'), message=error.get('Message'))
+
+
+def _upload(s3, src: str, dst: str, recursive: bool, out: Output, op: str) -> int:
+    if os.path.isdir(src):
+        if not recursive:
+            raise UsageError(f"{src} 是目录，请使用 -r")
+        prefix = to_key(dst).rstrip('/')
+
+        errors: List[Dict[str, str]] = []
+        done, total = s3.upload_folder(src, prefix, _folder_callback(out, op), errors=errors)
+        _emit_errors(out, op, errors)
+        return out.result(op, exit_code(done, total), files_done=done, files_total=total)
+
+    if not os.path.isfile(src):
+        raise UsageError(f"本地文件不存在: {src}")
+    key = to_key(dst)
+    if not key or key.endswith('/'):
+        key += os.path.basename(src)
+
+    def file_callback(percent):
+        out.progress(op, key=key, percent=round(percent, 1))
+
+    success = s3.upload_file(src, key, file_callback)
+    return out.result(op, EXIT_OK if success else EXIT_FAILURE, key=key, files_done=int(success), files_total=1)
+
+
+def _download(s3, src: str, dst: str, recursive: bool, out: Output, op: str) -> int:
+    key = to_key(src)
+    if recursive or not key or key.endswith('/'):
+        if not recursive:
+            raise UsageError(f"{src} 是文件夹，请使用 -r")
+
+        errors: List[Dict[str, str]] = []
+        done, total = s3.download_folder(to_prefix(src), dst, _folder_callback(out, op), errors=errors)
+        _emit_errors(out, op, errors)
+        return out.result(op, exit_code(done, total), files_done=done, files_total=total)
+
+    local_path = dst
+    if os.path.isdir(dst) or dst.endswith(('/', os.sep)):
+        local_path = os.path.join(dst, key.rsplit('/', 1)[-1])
+    local_path = os.path.abspath(local_path)
+
+    def file_callback(percent):
+        out.progress(op, key=key, percent=round(percent, 1))
+
+    success = s3.download_file(key, local_path, file_callback)
+    return out.result(op, EXIT_OK if success else EXIT_FAILURE, key=key, local_path=local_path,
+                      files_done=int(success), files_total=1)
+
+
+def _copy_remote(s3, src: str, dst: str, recursive: bool, out: Output) -> int:
+    src_key = to_key(src)
+    if not recursive:
+        if not src_key or src_key.endswith('/'):
+            raise UsageError(f"{src} 是文件夹，请使用 -r")
+        dst_key = to_key(dst)
+        if not dst_key or dst_key.endswith('/'):
+            dst_key += src_key.rsplit('/', 1)[-1]
+        success = s3.copy_file(src_key, dst_key)
+        return out.result('cp', EXIT_OK if success else EXIT_FAILURE, key=dst_key,
+                          files_done=int(success), files_total=1)
+
+    src_prefix = to_prefix(src)
+    dst_prefix = to_prefix(dst)
+    done = 0
+    total = 0
+    max_workers = s3.config_manager.get_app_settings().get('max_concurrent_copies', 16)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for page in s3.iter_object_pages(src_prefix):
+            keys = [obj['Key'] for obj in page]
+            results = executor.map(lambda key: s3.copy_file(key, dst_prefix + key[len(src_prefix):]), keys)
+            done += sum(1 for ok in results if ok)
+            total += len(keys)
+            out.progress('cp', files_done=done, files_total=total)
+    return out.result('cp', exit_code(done, total), files_done=done, files_total=total)
+
+
+def cmd_cp(s3, args, out: Output, op: str = "cp") -> int:
+    src_remote = is_remote(args.src)
+    dst_remote = is_remote(args.dst)
+    if src_remote and dst_remote:
+        return _copy_remote(s3, args.src, args.dst, args.recursive, out)
+    if dst_remote:
+        return _upload(s3, args.src, args.dst, args.recursive, out, op)
+    if src_remote:
+        return _download(s3, args.src, args.dst, args.recursive, out, op)
+    raise UsageError("源和目标至少有一个需要是 s3:// 路径")
+
+
+def cmd_sync(s3, args, out: Output) -> int:
+    if is_remote(args.src) == is_remote(args.dst):
+        raise UsageError("sync 需要一个本地目录和一个 s3:// 前缀")
+    if is_remote(args.dst):
+        local_folder, s3_prefix, direction = args.src, to_key(args.dst), UPLOAD
+        if not os.path.isdir(local_folder):
+            raise UsageError(f"本地目录不存在: {local_folder}")
+    else:
+        local_folder, s3_prefix, direction = args.dst, to_key(args.src), DOWNLOAD
+    compare = COMPARE_CHECKSUM if args.checksum else COMPARE_MTIME
+
+    if args.dry_run:
+        plan = s3.plan_sync(local_folder, s3_prefix, direction, args.delete, compare)
+        for action in plan.transfers:
+            out.emit('plan', action=direction, **action.to_dict())
+        for target in plan.deletes:
+            out.emit('plan', action='delete', path=target)
+        return out.result('sync', EXIT_OK, dry_run=True, **plan.summary())
+
+    def sync_callback(stats):
+        out.progress('sync', **stats)
+
+    errors: List[Dict[str, str]] = []
+    stats = s3.sync_folder(local_folder, s3_prefix, direction, args.delete, compare, sync_callback, errors)
+    _emit_errors(out, 'sync', errors)
+    if 'error' in stats:
+        return out.result('sync', EXIT_FAILURE, message=stats.pop('error'), **stats)
+    done = stats['files_done'] + stats['deleted']
+    total = done + stats['files_failed'] + stats['delete_failed']
+    return out.result('sync', exit_code(done, total), **stats)
+
+
+def cmd_rm(s3, args, out: Output) -> int:
+    targets = []
+    for path in args.paths:
+        if not is_remote(path):
+            raise UsageError(f"只能删除 s3:// 路径: {path}")
+        key = to_key(path)
+        if args.recursive:
+            targets.append(to_prefix(path))
+        elif not key or key.endswith('/'):
+            raise UsageError(f"{path} 是文件夹，请使用 -r")
+        else:
+            targets.append(key)
+
+    def delete_callback(phase, current, total, message):
+        out.progress('rm', force=phase == "complete", phase=phase, deleted=current, total=total)
+
+    errors: List[Dict[str, str]] = []
+    deleted, total = s3.delete_many(targets, delete_callback, errors)
+    _emit_errors(out, 'rm', errors)
+    return out.result('rm', exit_code(deleted, total), deleted=deleted, total=total)
+
+
+def cmd_mv(s3, args, out: Output) -> int:
+    if not (is_remote(args.src) and is_remote(args.dst)):
+        raise UsageError("mv 只支持存储桶内移动（s3:// -> s3://）")
+    src_key = to_key(args.src)
+    if args.recursive or not src_key or src_key.endswith('/'):
+        if not src_key:
+            raise UsageError("不能移动整个存储桶")
+
+        def rename_callback(moved, failed, total):
+            out.progress('mv', moved=moved, failed=failed, total=total)
+
+        moved, total = s3.rename_folder(to_prefix(args.src), to_prefix(args.dst), rename_callback)
+        return out.result('mv', exit_code(moved, total), moved=moved, total=total)
+
+    dst_key = to_key(args.dst)
+    if not dst_key or dst_key.endswith('/'):
+        dst_key += src_key.rsplit('/', 1)[-1]
+    success = s3.rename_object(src_key, dst_key)
+    return out.result('mv', EXIT_OK if success else EXIT_FAILURE, key=dst_key, moved=int(success), total=1)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="s3filemanager", description="S3 文件管理器命令行模式")
+    parser.add_argument("--config", default="config.json", help="配置文件路径（默认 config.json）")
+    parser.add_argument("--no-progress", action="store_true", help="不输出进度事件，只输出结果")
+    parser.add_argument("--metrics", metavar="PATH",
+                        help="结束时写入请求统计（.prom/.txt 为 Prometheus 文本格式，其余为 JSON）")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    ls_parser = subparsers.add_parser("ls", help="列出目录")
+    ls_parser.add_argument("path", nargs="?", default="")
+    ls_parser.add_argument("-r", "--recursive", action="store_true", help="递归列出所有对象")
+    ls_parser.set_defaults(handler=cmd_ls)
+
+    cp_parser = subparsers.add_parser("cp", help="上传、下载或在存储桶内复制")
+    cp_parser.add_argument("src")
+    cp_parser.add_argument("dst")
+    cp_parser.add_argument("-r", "--recursive", action="store_true", help="复制整个目录或前缀")
+    cp_parser.set_defaults(handler=cmd_cp)
+
+    sync_parser = subparsers.add_parser("sync", help="同步本地目录和 s3:// 前缀")
+    sync_parser.add_argument("src")
+    sync_parser.add_argument("dst")
+    sync_parser.add_argument("--delete", action="store_true", help="镜像同步：删除目标端多出的文件")
+    sync_parser.add_argument("--checksum", action="store_true", help="按内容摘要（ETag）而不是修改时间判断变化")
+    sync_parser.add_argument("--dry-run", action="store_true", help="只列出将要执行的变更")
+    sync_parser.set_defaults(handler=cmd_sync)
+
+    rm_parser = subparsers.add_parser("rm", help="删除对象或前缀")
+    rm_parser.add_argument("paths", nargs="+")
+    rm_parser.add_argument("-r", "--recursive", action="store_true", help="删除前缀下的所有对象")
+    rm_parser.set_defaults(handler=cmd_rm)
+
+    mv_parser = subparsers.add_parser("mv", help="在存储桶内移动（重命名）对象或文件夹")
+    mv_parser.add_argument("src")
+    mv_parser.add_argument("dst")
+    mv_parser.add_argument("-r", "--recursive", action="store_true", help="移动整个文件夹")
+    mv_parser.set_defaults(handler=cmd_mv)
+
+    du_parser = subparsers.add_parser("du", help="统计前缀下的对象数量和总大小")
+    du_parser.add_argument("path", nargs="?", default="")
+    du_parser.add_argument("--top", type=int, default=10, help="同时列出最大的 N 个对象")
+    du_parser.set_defaults(handler=cmd_du)
+
+    search_parser = subparsers.add_parser("search", help="在前缀下按名称、大小和修改时间递归搜索对象")
+    search_parser.add_argument("path", nargs="?", default="", help="搜索范围（s3://前缀，默认整个存储桶）")
+    search_parser.add_argument("pattern", nargs="?", default="",
+                               help="名称模式，含 / 时匹配相对路径，否则匹配对象名")
+    mode_group = search_parser.add_mutually_exclusive_group()
+    mode_group.add_argument("--glob", dest="mode", action="store_const", const=MODE_GLOB, help="通配符（* ? []）")
+    mode_group.add_argument("--regex", dest="mode", action="store_const", const=MODE_REGEX, help="正则表达式")
+    search_parser.set_defaults(mode=MODE_SUBSTRING)
+    search_parser.add_argument("--case-sensitive", action="store_true", help="区分大小写")
+    search_parser.add_argument("--min-size", help="最小大小，如 10M")
+    search_parser.add_argument("--max-size", help="最大大小，如 1G")
+    search_parser.add_argument("--after", help="修改时间不早于，如 2024-01-31")
+    search_parser.add_argument("--before", help="修改时间早于")
+    search_parser.add_argument("--limit", type=int, help="最多输出的结果数")
+    search_parser.set_defaults(handler=cmd_search)
+
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    out = Output(sys.stdout, progress=not args.no_progress)
+
+    # S3Client 内部用 print 输出错误信息，转到标准错误以保持标准输出为纯 JSON
+    with contextlib.redirect_stdout(sys.stderr):
+        load_env_file(verbose=False)
+        from s3_client import S3Client
+
+        config_manager = ConfigManager(args.config)
+        s3 = S3Client(config_manager)
+        if s3.client is None:
+            return out.result(args.command, EXIT_FAILURE, message="连接S3失败")
+
+        try:
+            return args.handler(s3, args, out)
+        except UsageError as e:
+            return out.result(args.command, EXIT_USAGE, message=str(e))
+        except KeyboardInterrupt:
+            return out.result(args.command, EXIT_FAILURE, message="已中断")
+        except Exception as e:
+            print(f"{args.command} 失败: {e}")
+            return out.result(args.command, EXIT_FAILURE, message=str(e))
+        finally:
+            if args.metrics:
+                try:
+                    s3.metrics.dump(args.metrics)
+                except OSError as e:
+                    print(f"写入请求统计失败: {e}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
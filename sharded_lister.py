@@ -0,0 +1,402 @@
+import heapq
+import itertools
+import math
+import queue
+import threading
+from bisect import bisect_left, bisect_right
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# 无上界区间在切分时使用的上界
+KEY_MAX = '\U0010ffff'
+# 估算键分布时考虑的字符位置数（前缀之后）
+MODEL_DEPTH = 24
+
+_DONE = object()
+
+
+class KeyModel:
+    """按字符位置统计已列出的键（去掉前缀后）中出现过的字符，把键映射为整数
+
+    映射保持键序，键空间中的一段区间因此可以按比例切分。出现过字母或数字的位置
+    补全所有位置上出现过的字母和数字：日期、编号、十六进制等键的高位在前几页中
+    只出现一两种取值，补全后以后才出现的取值也落在模型之内。
+    """
+
+    def __init__(self, prefix: str):
+        self.prefix = prefix
+        self._seen: List[set] = []
+        self._alnum = set()
+        self._columns: Optional[List[str]] = None
+        self._lock = threading.Lock()
+
+    def learn(self, keys: Iterable[str]):
+        with self._lock:
+            for key in keys:
+                for i, c in enumerate(key[len(self.prefix):len(self.prefix) + MODEL_DEPTH]):
+                    if c == KEY_MAX:
+                        break
+                    if i == len(self._seen):
+                        self._seen.append(set())
+                    if c not in self._seen[i]:
+                        self._seen[i].add(c)
+                        if c.isascii() and c.isalnum():
+                            self._alnum.add(c)
+                        self._columns = None
+
+    def columns(self) -> List[str]:
+        with self._lock:
+            if self._columns is None:
+                columns = []
+                for seen in self._seen:
+                    chars = seen | self._alnum if seen & self._alnum else seen
+                    columns.append(''.join(sorted(chars)))
+                self._columns = columns
+            return self._columns
+
+    def value(self, key: str) -> int:
+        """键对应的整数；不在模型中的字符映射到它前面最近的字符，其后各位取最大值"""
+        rest = key[len(self.prefix):]
+        value = 0
+        saturated = False
+        for i, column in enumerate(self.columns()):
+            radix = len(column) + 1
+            if saturated:
+                digit = radix - 1
+            elif i >= len(rest):
+                digit = 0
+            else:
+                index = bisect_left(column, rest[i])
+                if index < len(column) and column[index] == rest[i]:
+                    digit = index + 1
+                else:
+                    digit = index
+                    saturated = True
+            value = value * radix + digit
+        return value
+
+    def max_value(self) -> int:
+        value = 0
+        for column in self.columns():
+            value = value * (len(column) + 1) + len(column)
+        return value
+
+    def key(self, value: int) -> str:
+        """value 对应的键（value 的逆映射）"""
+        digits = []
+        for column in reversed(self.columns()):
+            value, digit = divmod(value, len(column) + 1)
+            digits.append(column[digit - 1] if digit else None)
+        chars = []
+        for c in reversed(digits):
+            if c is None:
+                break
+            chars.append(c)
+        return self.prefix + ''.join(chars)
+
+
+def span_boundaries(model: KeyModel, start: str, last: str, upper: Optional[str], page_size: int,
+                    keys_per_range: int, parts: int) -> List[str]:
+    """第一页的键为 [start, last]，在剩余的 (last, upper] 中选出最多 parts-1 个边界
+
+    以第一页的跨度估计键密度：有上界时按估计的键数把区间等分为每份约 keys_per_range 个键；
+    无上界时剩余键数未知（模型也只见过已列出的字符），边界离 last 的距离按 1、2、4... 页的跨度倍增，
+    最后一个区间仍无上界，列出它的第一页时会再次切分。跨度均在 KeyModel 映射的整数上计算，
+    第一个不同字符之前的公共部分不参与切分。
+    """
+    low = model.value(last)
+    width = max(1, low - model.value(start))
+    if upper is None:
+        high = model.max_value()
+        return [model.key(low + width * 2 ** i) for i in range(parts - 1) if low + width * 2 ** i < high]
+    span = model.value(upper) - low
+    if span <= 0:
+        return []
+    parts = min(parts, math.ceil(span / width * page_size / keys_per_range))
+    return [model.key(low + span * i // parts) for i in range(1, parts)]
+
+
+def _page_key(item: Dict) -> str:
+    return item.get('Key') or item.get('Prefix')
+
+
+def _last_key(contents: List[Dict], common_prefixes: List[Dict]) -> str:
+    items = sorted(contents + common_prefixes, key=_page_key)
+    last = _page_key(items[-1])
+    if 'Prefix' in items[-1]:
+        # 最后一项是 CommonPrefix 时需跳过其下所有键
+        last += KEY_MAX
+    return last
+
+
+class _Range:
+    """键区间 (lower, upper]，upper 为 None 表示到前缀末尾；out 中依次放入页面、子区间列表和结束标记"""
+
+    __slots__ = ('lower', 'upper', 'out')
+
+    def __init__(self, lower: str, upper: Optional[str], prefetch_pages: int):
+        self.lower = lower
+        self.upper = upper
+        self.out = queue.Queue(maxsize=prefetch_pages)
+
+
+class _OrderedSlots:
+    """并发请求名额；名额不足时键序靠前的区间优先，让请求集中在消费者即将读取的位置"""
+
+    def __init__(self, count: int):
+        self._free = count
+        self._waiting: List[Tuple[str, int]] = []
+        self._order = itertools.count()
+        self._condition = threading.Condition()
+
+    def acquire(self, priority: str):
+        with self._condition:
+            entry = (priority, next(self._order))
+            heapq.heappush(self._waiting, entry)
+            while self._free == 0 or self._waiting[0] != entry:
+                self._condition.wait()
+            heapq.heappop(self._waiting)
+            self._free -= 1
+            self._condition.notify_all()
+
+    def release(self):
+        with self._condition:
+            self._free += 1
+            self._condition.notify_all()
+
+
+class _ListingState:
+    """一次分片列表的共享状态：并发名额、键分布模型、已知的空区间和还可以启动的区间数"""
+
+    def __init__(self, concurrency: int, max_ranges: int, model: KeyModel):
+        self.stop = threading.Event()
+        self.slots = _OrderedSlots(concurrency)
+        self.model = model
+        self.lock = threading.Lock()
+        # (a, b, keys)：a 之后到 b 为止的键恰好是 keys（已排序），b 为 None 表示 a 之后的全部键
+        self.spans: List[Tuple[str, Optional[str], List[str]]] = []
+        self.remaining_ranges = max_ranges
+
+    def record_span(self, after: str, last: Optional[str], keys: List[str]):
+        with self.lock:
+            self.spans.append((after, last, keys))
+
+    def is_empty(self, lower: str, upper: Optional[str]) -> bool:
+        """已返回的某一页覆盖了 (lower, upper] 且其中没有键"""
+        with self.lock:
+            for after, last, keys in self.spans:
+                if after > lower or (last is not None and (upper is None or last < upper)):
+                    continue
+                index = bisect_right(keys, lower)
+                if index == len(keys) or (upper is not None and keys[index] > upper):
+                    return True
+        return False
+
+    def reserve(self, count: int) -> int:
+        """申请最多 count 个新区间，返回实际得到的个数"""
+        with self.lock:
+            count = min(count, self.remaining_ranges)
+            self.remaining_ranges -= count
+            return count
+
+    def release(self):
+        """区间的列表线程结束（其队列中最多还有 prefetch_pages 页）"""
+        with self.lock:
+            self.remaining_ranges += 1
+
+
+class ShardedLister:
+    """按 StartAfter 边界把前缀切分为多个键区间并发列出，按键顺序合并结果
+
+    边界优先取本地索引的分位点，否则根据已列出的键估计剩余键空间的分布后切分（见 span_boundaries）。
+    某个区间的第一页仍是满页时，把它剩余的部分再切分（自适应）；估计不到一个区间大小的不再切分，
+    已知没有键的区间不发送请求。第一页不满（未截断）时直接返回，小目录不会产生额外请求。
+    """
+
+    def __init__(self, client, bucket: str, shards: int = 8, page_size: int = 1000,
+                 prefetch_pages: int = 4, bucket_index=None, max_ranges_per_shard: int = 8):
+        self.client = client
+        self.bucket = bucket
+        self.shards = max(1, shards)
+        self.page_size = page_size
+        self.prefetch_pages = prefetch_pages
+        self.bucket_index = bucket_index
+        self.max_ranges_per_shard = max_ranges_per_shard
+
+    def _boundaries(self, prefix: str, delimiter: Optional[str], start: str, last: str, upper: Optional[str],
+                    state: _ListingState, use_index: bool = False) -> List[str]:
+        boundaries = []
+        if use_index and self.bucket_index is not None and self.bucket_index.is_ready():
+            boundaries = self.bucket_index.key_quantiles(prefix, self.shards)
+        if not boundaries:
+            boundaries = span_boundaries(state.model, start, last, upper, self.page_size,
+                                         self.page_size * self.prefetch_pages, self.shards)
+
+        if delimiter:
+            # 使用分隔符时把边界截断到当前层级，避免同一个 CommonPrefix 出现在两个区间中
+            trimmed = []
+            for boundary in boundaries:
+                position = boundary.find(delimiter, len(prefix))
+                trimmed.append(boundary[:position] if position >= 0 else boundary)
+            boundaries = trimmed
+
+        return sorted(set(b for b in boundaries
+                          if b > last and (upper is None or b < upper) and b.startswith(prefix)))
+
+    def _start(self, prefix: str, delimiter: Optional[str], start: str, last: str, upper: Optional[str],
+               state: _ListingState, use_index: bool = False) -> Optional[List[_Range]]:
+        """第一页的键为 [start, last]，把剩余的 (last, upper] 切分为多个区间并启动列表线程，无法切分时返回 None"""
+        boundaries = self._boundaries(prefix, delimiter, start, last, upper, state, use_index)
+        count = state.reserve(len(boundaries) + 1) if boundaries else 0
+        if count < 2:
+            return None
+        if count < len(boundaries) + 1:
+            step = (len(boundaries) + 1) / count
+            boundaries = [boundaries[int(i * step) - 1] for i in range(1, count)]
+        lower_bounds = [last] + boundaries
+        upper_bounds = boundaries + [upper]
+        ranges = [_Range(lo, hi, self.prefetch_pages) for lo, hi in zip(lower_bounds, upper_bounds)]
+        for rng in ranges:
+            threading.Thread(target=self._list_range, args=(prefix, delimiter, rng, state), daemon=True).start()
+        return ranges
+
+    def _list_range(self, prefix: str, delimiter: Optional[str], rng: _Range, state: _ListingState):
+        """列出 (lower, upper] 区间内的对象，按页放入有界队列；第一页为满页时把剩余部分切分给子区间"""
+        try:
+            params = {'Bucket': self.bucket, 'Prefix': prefix, 'MaxKeys': self.page_size, 'StartAfter': rng.lower}
+            if delimiter:
+                params['Delimiter'] = delimiter
+            first = True
+            while not state.stop.is_set():
+                # 只在请求期间占用并发名额，等待消费者时不占用，避免前面的区间得不到名额；
+                # 名额按键序分配，轮到本区间时前面区间的第一页通常已返回，可据此跳过空区间
+                state.slots.acquire(rng.lower)
+                try:
+                    if first and state.is_empty(rng.lower, rng.upper):
+                        break
+                    response = self.client.list_objects_v2(**params)
+                finally:
+                    state.slots.release()
+                contents = response.get('Contents', [])
+                common_prefixes = response.get('CommonPrefixes', [])
+                if first:
+                    keys = sorted(_page_key(item) for item in contents + common_prefixes)
+                    first_key = keys[0] if keys else None
+                    truncated = response.get('IsTruncated', False)
+                    state.record_span(rng.lower, _last_key(contents, common_prefixes) if truncated else None, keys)
+                    state.model.learn(keys)
+                reached_upper = False
+                if rng.upper is not None:
+                    kept_contents = [obj for obj in contents if obj['Key'] <= rng.upper]
+                    kept_prefixes = [p for p in common_prefixes if p['Prefix'] <= rng.upper]
+                    reached_upper = (len(kept_contents) < len(contents) or
+                                     len(kept_prefixes) < len(common_prefixes))
+                    contents, common_prefixes = kept_contents, kept_prefixes
+
+                if contents or common_prefixes:
+                    self._put(rng.out, {'Contents': contents, 'CommonPrefixes': common_prefixes,
+                                        'IsTruncated': True}, state.stop)
+
+                token = response.get('NextContinuationToken')
+                if reached_upper or not response.get('IsTruncated', False) or not token:
+                    break
+                if first:
+                    first = False
+                    # 第一页已满，区间内可能还有大量键：剩余部分再切分并发列出
+                    children = self._start(prefix, delimiter, first_key, _last_key(contents, common_prefixes),
+                                           rng.upper, state)
+                    if children is not None:
+                        self._put(rng.out, children, state.stop)
+                        break
+                params.pop('StartAfter', None)
+                params['ContinuationToken'] = token
+        except Exception as e:
+            self._put(rng.out, e, state.stop)
+        finally:
+            self._put(rng.out, _DONE, state.stop)
+            state.release()
+
+    @staticmethod
+    def _put(out: queue.Queue, item, stop: threading.Event):
+        while not stop.is_set():
+            try:
+                out.put(item, timeout=0.2)
+                return
+            except queue.Full:
+                continue
+
+    def _drain(self, rng: _Range, cancel_event: Optional[threading.Event]):
+        """按顺序读取一个区间的页面，遇到子区间列表时依次读取各子区间"""
+        while True:
+            if cancel_event is not None and cancel_event.is_set():
+                return
+            try:
+                item = rng.out.get(timeout=0.2)
+            except queue.Empty:
+                continue
+            if item is _DONE:
+                return
+            if isinstance(item, Exception):
+                raise item
+            if isinstance(item, list):
+                for child in item:
+                    yield from self._drain(child, cancel_event)
+                continue
+            yield item
+
+    def iter_pages(self, prefix: str = "", delimiter: Optional[str] = None,
+                   cancel_event: Optional[threading.Event] = None):
+        """按键顺序产出页面字典 {'Contents': [...], 'CommonPrefixes': [...], 'IsTruncated': bool}
+
+        IsTruncated 为 False 的页是最后一页；分片模式下最后会额外产出一个空的结束页。
+        """
+        params = {'Bucket': self.bucket, 'Prefix': prefix, 'MaxKeys': self.page_size}
+        if delimiter:
+            params['Delimiter'] = delimiter
+        first = self.client.list_objects_v2(**params)
+        first_page = {
+            'Contents': first.get('Contents', []),
+            'CommonPrefixes': first.get('CommonPrefixes', []),
+            'IsTruncated': first.get('IsTruncated', False)
+        }
+        yield first_page
+
+        if not first.get('IsTruncated', False) or self.shards == 1:
+            if first.get('IsTruncated', False):
+                # 不分片时按常规方式继续分页
+                yield from self._iter_sequential(params, first.get('NextContinuationToken'), cancel_event)
+            return
+
+        start_after = _last_key(first_page['Contents'], first_page['CommonPrefixes'])
+        first_keys = sorted(_page_key(item) for item in first_page['Contents'] + first_page['CommonPrefixes'])
+        model = KeyModel(prefix)
+        model.learn(first_keys)
+        state = _ListingState(self.shards, self.shards * self.max_ranges_per_shard, model)
+        try:
+            ranges = self._start(prefix, delimiter, first_keys[0], start_after, None, state, use_index=True)
+            if ranges is None:
+                # 剩余键空间无法切分，按顺序分页
+                yield from self._iter_sequential(params, first.get('NextContinuationToken'), cancel_event)
+                return
+            # 区间首尾相接且互不重叠，依次读取各区间即得到按键排序的结果
+            for rng in ranges:
+                yield from self._drain(rng, cancel_event)
+                if cancel_event is not None and cancel_event.is_set():
+                    return
+            yield {'Contents': [], 'CommonPrefixes': [], 'IsTruncated': False}
+        finally:
+            state.stop.set()
+
+    def _iter_sequential(self, params: Dict, token: Optional[str], cancel_event: Optional[threading.Event]):
+        while token:
+            if cancel_event is not None and cancel_event.is_set():
+                return
+            response = self.client.list_objects_v2(ContinuationToken=token, **params)
+            token = response.get('NextContinuationToken')
+            truncated = response.get('IsTruncated', False) and bool(token)
+            yield {
+                'Contents': response.get('Contents', []),
+                'CommonPrefixes': response.get('CommonPrefixes', []),
+                'IsTruncated': truncated
+            }
+            if not truncated:
+                return
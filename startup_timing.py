@@ -0,0 +1,60 @@
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+# 模块在启动脚本中最先导入，以此作为启动起点
+_START = time.perf_counter()
+
+STAGE_LABELS = {
+    'import': "模块导入",
+    'window': "窗口显示",
+    'client': "客户端创建",
+    'connect': "连接检查",
+    'first_listing': "首次列表"
+}
+
+
+class StartupTimer:
+    """记录启动各阶段相对于进程启动的耗时，首次列表完成后输出报告
+
+    设置环境变量 S3FM_STARTUP_LOG 为文件路径时，每次启动追加一行 JSON，便于跟踪回归。
+    """
+
+    def __init__(self, start: float = _START):
+        self.start = start
+        self._marks: List[Tuple[str, float]] = []
+        self._reported = False
+        self._lock = threading.Lock()
+
+    def mark(self, stage: str):
+        with self._lock:
+            if self._reported or any(name == stage for name, _ in self._marks):
+                return
+            self._marks.append((stage, time.perf_counter() - self.start))
+
+    def as_dict(self) -> Dict[str, float]:
+        with self._lock:
+            return {name: round(elapsed, 3) for name, elapsed in self._marks}
+
+    def report(self, log_path: Optional[str] = None):
+        """打印各阶段耗时（只输出一次）"""
+        with self._lock:
+            if self._reported:
+                return
+            self._reported = True
+        timings = self.as_dict()
+        parts = [f"{STAGE_LABELS.get(name, name)} {elapsed:.3f}s" for name, elapsed in timings.items()]
+        print("启动耗时: " + ", ".join(parts))
+
+        log_path = log_path or os.getenv('S3FM_STARTUP_LOG')
+        if log_path:
+            try:
+                with open(log_path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps({'time': time.time(), 'timings': timings}) + "\n")
+            except OSError as e:
+                print(f"写入启动耗时记录失败: {e}")
+
+
+startup_timer = StartupTimer()
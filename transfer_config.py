@@ -0,0 +1,85 @@
+import mimetypes
+import os
+from functools import lru_cache
+from typing import Dict, Any, Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from boto3.s3.transfer import TransferConfig
+
+MB = 1024 * 1024
+GB = 1024 * MB
+
+# S3 分片上传限制
+MIN_PART_SIZE = 5 * MB
+MAX_PART_SIZE = 5 * GB
+MAX_PARTS = 10000
+
+# 与 S3Client.connect 中的 max_pool_connections 保持一致
+MAX_POOL_CONNECTIONS = 50
+
+
+@lru_cache(maxsize=1024)
+def _content_type_for_extension(extension: str) -> str:
+    return mimetypes.guess_type(f"file{extension}")[0] or 'application/octet-stream'
+
+
+def guess_content_type(path: str) -> str:
+    """按扩展名查询 MIME 类型并缓存，大量小文件上传时不必每次都查表"""
+    return _content_type_for_extension(os.path.splitext(path)[1].lower())
+
+
+def choose_part_size(file_size: int, chunk_size: int = 8 * MB) -> int:
+    """根据文件大小选择分片大小，保证分片数不超过 10000"""
+    part_size = max(chunk_size, MIN_PART_SIZE)
+    while file_size > part_size * MAX_PARTS and part_size < MAX_PART_SIZE:
+        part_size *= 2
+    return min(part_size, MAX_PART_SIZE)
+
+
+class TransferSettings:
+    """从 app_settings 构建 boto3 TransferConfig，供所有传输路径共用"""
+
+    def __init__(self, app_settings: Dict[str, Any]):
+        self.chunk_size = int(app_settings.get('chunk_size', 8 * MB))
+        self.multipart_threshold = int(app_settings.get('multipart_threshold', self.chunk_size))
+        self.max_concurrent_uploads = int(app_settings.get('max_concurrent_uploads', 5))
+        self.max_concurrent_downloads = int(app_settings.get('max_concurrent_downloads', 3))
+        self.multipart_concurrency = int(app_settings.get('multipart_concurrency', 10))
+        self.max_inflight_bytes = int(app_settings.get('max_inflight_bytes', 256 * MB))
+        self.resumable_threshold = int(app_settings.get('resumable_threshold', 64 * MB))
+        # 小于该大小的文件一次读入后直接 put_object，0 表示关闭
+        self.small_file_threshold = int(app_settings.get('small_file_threshold', 1 * MB))
+        self.small_file_concurrency = max(1, min(int(app_settings.get('small_file_concurrency', 32)),
+                                                 MAX_POOL_CONNECTIONS))
+
+    def per_file_concurrency(self, shared_workers: int) -> int:
+        # 文件夹传输时多个文件共享连接池，按工作线程数平分
+        budget = max(1, MAX_POOL_CONNECTIONS // max(1, shared_workers))
+        return max(1, min(self.multipart_concurrency, budget))
+
+    def upload_config(self, file_size: Optional[int] = None, shared_workers: int = 1) -> "TransferConfig":
+        from boto3.s3.transfer import TransferConfig
+
+        part_size = choose_part_size(file_size or 0, self.chunk_size)
+        config = TransferConfig(
+            multipart_threshold=max(self.multipart_threshold, MIN_PART_SIZE),
+            multipart_chunksize=part_size,
+            max_concurrency=self.per_file_concurrency(shared_workers)
+        )
+        # 限制内存中排队的分片数，控制单个文件的在途字节数
+        inflight = self.max_inflight_bytes // max(1, shared_workers)
+        config.max_in_memory_upload_chunks = max(1, inflight // part_size)
+        return config
+
+    def download_config(self, file_size: Optional[int] = None, shared_workers: int = 1) -> "TransferConfig":
+        from boto3.s3.transfer import TransferConfig
+
+        part_size = choose_part_size(file_size or 0, self.chunk_size)
+        config = TransferConfig(
+            multipart_threshold=max(self.multipart_threshold, MIN_PART_SIZE),
+            multipart_chunksize=part_size,
+            max_concurrency=self.per_file_concurrency(shared_workers)
+        )
+        inflight = self.max_inflight_bytes // max(1, shared_workers)
+        config.max_in_memory_download_chunks = max(1, inflight // config.io_chunksize)
+        return config
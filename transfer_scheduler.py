@@ -0,0 +1,351 @@
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Callable, List, Optional
+
+# 数值越小优先级越高
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 10
+PRIORITY_LOW = 20
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_PAUSED = "paused"
+JOB_CANCELLED = "cancelled"
+JOB_DONE = "done"
+
+
+class TransferCancelled(Exception):
+    pass
+
+
+class TokenBucket:
+    """令牌桶限速：rate 为每秒字节数，0 表示不限速；允许透支，透支部分通过等待偿还"""
+
+    def __init__(self, rate: float = 0):
+        self._lock = threading.Lock()
+        self.set_rate(rate)
+
+    def set_rate(self, rate: float):
+        with self._lock:
+            self.rate = max(0.0, float(rate or 0))
+            # 最多积累 1 秒的突发量
+            self.capacity = self.rate
+            self.tokens = self.capacity
+            self.updated = time.monotonic()
+
+    def consume(self, nbytes: int, cancelled: Optional[Callable[[], bool]] = None):
+        with self._lock:
+            if self.rate <= 0:
+                return
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= nbytes
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+        deadline = time.monotonic() + wait
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            if cancelled is not None and cancelled():
+                raise TransferCancelled()
+            time.sleep(min(remaining, 0.2))
+
+
+class TransferJob:
+    """一组传输任务（单个文件或整个文件夹），可整体暂停、继续和取消
+
+    max_running 限制本作业同时运行的任务数（0 不限制，仍受调度器全局并发数约束）；
+    bandwidth_limit 为本作业的额外限速（字节/秒）。presized 为 True 时由提交方通过
+    add_bytes_total 预先累计总字节数，否则由各文件传输在得知大小时累计。
+    """
+
+    _ids = itertools.count(1)
+
+    def __init__(self, scheduler: "TransferScheduler", name: str, priority: int = PRIORITY_NORMAL,
+                 max_running: int = 0, bandwidth_limit: float = 0, presized: bool = False):
+        self.id = next(self._ids)
+        self.scheduler = scheduler
+        self.name = name
+        self.priority = priority
+        self.max_running = max_running
+        self.bucket = TokenBucket(bandwidth_limit)
+        self.created = time.time()
+        self.pending = 0
+        self.running = 0
+        self.done = 0
+        self.failed = 0
+        self.bytes_transferred = 0
+        self.bytes_total = 0
+        self.presized = presized
+        self.sealed = False
+        # 本作业排队中的 (序号, 任务)，按提交顺序；由调度器在持有 lock 时访问
+        self._tasks = deque()
+        self._scheduled = False
+        self._paused = threading.Event()
+        self._cancelled = threading.Event()
+
+    @property
+    def paused(self) -> bool:
+        return self._paused.is_set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    @property
+    def state(self) -> str:
+        if self.cancelled:
+            return JOB_CANCELLED
+        if self.paused:
+            return JOB_PAUSED
+        if self.running:
+            return JOB_RUNNING
+        if self.pending:
+            return JOB_QUEUED
+        return JOB_DONE if self.sealed else JOB_QUEUED
+
+    def pause(self):
+        self._paused.set()
+
+    def resume(self):
+        self._paused.clear()
+        self.scheduler.wake(self)
+
+    def cancel(self):
+        self._cancelled.set()
+        self._paused.clear()
+        self.scheduler.wake(self)
+
+    def add_bytes_total(self, nbytes: int):
+        with self.scheduler.lock:
+            self.bytes_total += nbytes
+
+    def seal(self):
+        """不再提交新任务；全部任务结束后作业状态变为 done"""
+        self.sealed = True
+
+    def checkpoint(self, nbytes: int = 0):
+        """传输线程每读写一块数据调用一次：已取消时抛出 TransferCancelled，暂停时阻塞，并按限速等待"""
+        while self.paused and not self.cancelled:
+            time.sleep(0.2)
+        if self.cancelled:
+            raise TransferCancelled()
+        if nbytes:
+            self.bucket.consume(nbytes, lambda: self.cancelled)
+            with self.scheduler.lock:
+                self.bytes_transferred += nbytes
+
+
+class _Task:
+    __slots__ = ('job', 'fn', 'args', 'kwargs', 'future')
+
+    def __init__(self, job: TransferJob, fn, args, kwargs):
+        self.job = job
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.future = Future()
+
+
+class TransferScheduler:
+    """全局传输调度器：所有上传下载任务共用一组工作线程（全局并发预算），按优先级取任务，
+    支持按作业暂停/继续/取消，以及全局令牌桶限速
+
+    任务排在各自作业的队列中，全局堆里每个有任务的作业只有一项（按作业优先级和队首任务的
+    提交顺序排序）。暂停中或已达到 max_running 的作业被取出后不再放回，继续或有任务结束时
+    重新加入，取任务的开销与排队的任务数无关。
+    """
+
+    def __init__(self, max_workers: int = 8, bandwidth_limit: float = 0):
+        self.max_workers = max(1, max_workers)
+        self.bucket = TokenBucket(bandwidth_limit)
+        self.lock = threading.Lock()
+        self._condition = threading.Condition(self.lock)
+        self._queue = []
+        self._sequence = itertools.count()
+        self._jobs: List[TransferJob] = []
+        self._shutdown = False
+        self._workers = []
+        for index in range(self.max_workers):
+            worker = threading.Thread(target=self._worker, name=f"transfer-{index}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def create_job(self, name: str, priority: int = PRIORITY_NORMAL, max_running: int = 0,
+                   bandwidth_limit: float = 0, presized: bool = False) -> TransferJob:
+        job = TransferJob(self, name, priority, max_running, bandwidth_limit, presized)
+        with self.lock:
+            self._jobs.append(job)
+        return job
+
+    def jobs(self) -> List[TransferJob]:
+        with self.lock:
+            return list(self._jobs)
+
+    def remove_finished_jobs(self):
+        with self.lock:
+            self._jobs = [job for job in self._jobs if job.state not in (JOB_DONE, JOB_CANCELLED)
+                          or job.running or job.pending]
+
+    def submit(self, job: TransferJob, fn, *args, **kwargs) -> Future:
+        task = _Task(job, fn, args, kwargs)
+        with self._condition:
+            if self._shutdown:
+                raise RuntimeError("传输调度器已关闭")
+            if job.cancelled:
+                task.future.set_exception(TransferCancelled())
+                return task.future
+            job.pending += 1
+            job._tasks.append((next(self._sequence), task))
+            self._schedule(job)
+            self._condition.notify()
+        return task.future
+
+    def submit_to(self, executor, job: TransferJob, fn, *args, **kwargs) -> Future:
+        """交给另一个线程池执行（如小文件上传池），仍计入作业的计数并响应暂停和取消"""
+        with self.lock:
+            job.pending += 1
+
+        def run():
+            with self.lock:
+                job.pending -= 1
+            # 暂停时在这里等待，已取消时直接结束
+            job.checkpoint()
+            with self.lock:
+                job.running += 1
+            success = False
+            try:
+                result = fn(*args, **kwargs)
+                success = result is not False
+                return result
+            finally:
+                with self._condition:
+                    job.running -= 1
+                    if success:
+                        job.done += 1
+                    else:
+                        job.failed += 1
+                    # 本作业的并发数释放，等待中的任务可能已可运行
+                    if self._schedule(job):
+                        self._condition.notify()
+
+        return executor.submit(run)
+
+    def throttle_for(self, job: Optional[TransferJob]) -> Callable[[int], None]:
+        """返回传输回调中使用的节流函数：作业的取消/暂停/限速，以及全局限速"""
+        def throttle(nbytes: int):
+            if job is not None:
+                job.checkpoint(nbytes)
+            if nbytes:
+                self.bucket.consume(nbytes, (lambda: job.cancelled) if job is not None else None)
+        return throttle
+
+    def set_bandwidth_limit(self, rate: float):
+        self.bucket.set_rate(rate)
+
+    def pause_all(self):
+        for job in self.jobs():
+            job.pause()
+
+    def resume_all(self):
+        for job in self.jobs():
+            job.resume()
+
+    def cancel_all(self):
+        for job in self.jobs():
+            job.cancel()
+
+    def wake(self, job: Optional[TransferJob] = None):
+        """唤醒工作线程；job 继续或取消时把它重新加入调度"""
+        with self._condition:
+            if job is not None:
+                self._schedule(job)
+            self._condition.notify_all()
+
+    def shutdown(self):
+        """停止工作线程；尚未开始的任务以 TransferCancelled 结束，之后 submit 抛出 RuntimeError"""
+        dropped = []
+        with self._condition:
+            self._shutdown = True
+            for job in self._jobs:
+                job.pending -= len(job._tasks)
+                dropped.extend(task for _, task in job._tasks)
+                job._tasks.clear()
+            self._condition.notify_all()
+        for task in dropped:
+            task.future.set_exception(TransferCancelled())
+
+    def _schedule(self, job: TransferJob) -> bool:
+        """作业有排队的任务且不在堆中时加入堆（需持有 lock），返回是否加入"""
+        if job._scheduled or not job._tasks:
+            return False
+        heapq.heappush(self._queue, (job.priority, job._tasks[0][0], job))
+        job._scheduled = True
+        return True
+
+    def _next_task(self, dropped: List[_Task]) -> Optional[_Task]:
+        """取出优先级最高的可运行任务；已取消作业的任务移入 dropped
+
+        暂停中或已达到并发上限的作业从堆中移出，由 wake 或任务结束时的 _schedule 重新加入。
+        """
+        while self._queue:
+            job = heapq.heappop(self._queue)[2]
+            job._scheduled = False
+            if job.cancelled:
+                job.pending -= len(job._tasks)
+                dropped.extend(task for _, task in job._tasks)
+                job._tasks.clear()
+                continue
+            if job.paused or (job.max_running and job.running >= job.max_running):
+                continue
+            task = job._tasks.popleft()[1]
+            self._schedule(job)
+            return task
+        return None
+
+    def _worker(self):
+        while True:
+            dropped = []
+            with self._condition:
+                task = None
+                while not self._shutdown:
+                    task = self._next_task(dropped)
+                    if task is not None or dropped:
+                        break
+                    self._condition.wait(0.5)
+                if task is not None:
+                    task.job.pending -= 1
+                    task.job.running += 1
+
+            # 在锁外完成 Future，避免完成回调中再次访问调度器时死锁
+            for cancelled in dropped:
+                cancelled.future.set_exception(TransferCancelled())
+            if task is None:
+                if self._shutdown:
+                    return
+                continue
+
+            success = False
+            if task.future.set_running_or_notify_cancel():
+                try:
+                    result = task.fn(*task.args, **task.kwargs)
+                    success = result is not False
+                    task.future.set_result(result)
+                except BaseException as e:
+                    task.future.set_exception(e)
+
+            with self._condition:
+                task.job.running -= 1
+                if success:
+                    task.job.done += 1
+                else:
+                    task.job.failed += 1
+                # 作业并发数释放后，之前移出堆的作业可能已可运行
+                if self._schedule(task.job):
+                    self._condition.notify()
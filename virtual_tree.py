@@ -0,0 +1,331 @@
+import tkinter as tk
+from tkinter import ttk
+from array import array
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+FOLDER_ICON = "📁"
+FILE_ICON = "📄"
+
+
+class ColumnStore:
+    """按列存储的目录条目：名称、是否文件夹、大小、修改时间（时间戳）和完整路径"""
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.names: List[str] = []
+        self.full_paths: List[str] = []
+        self.is_folder = bytearray()
+        self.sizes = array('q')
+        self.mtimes = array('d')
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def append(self, folders: List[Dict], files: List[Dict]):
+        for folder in folders:
+            self.names.append(folder['name'])
+            self.full_paths.append(folder['full_path'])
+            self.is_folder.append(1)
+            self.sizes.append(folder.get('size', -1))
+            self.mtimes.append(0.0)
+        for file in files:
+            self.names.append(file['name'])
+            self.full_paths.append(file['full_path'])
+            self.is_folder.append(0)
+            self.sizes.append(file.get('size', 0))
+            last_modified = file.get('last_modified')
+            self.mtimes.append(last_modified.timestamp() if last_modified else 0.0)
+
+
+class VirtualTreeView:
+    """只创建可见行（加少量预渲染行）的 Treeview 列表
+
+    接口与 ttk.Treeview 的常用部分保持一致（selection、item、identify_row、
+    selection_set、yview 等），行 id 为数据下标的字符串。
+    """
+
+    def __init__(self, master, columns, show='tree headings', size_formatter: Callable[[int], str] = str,
+                 overscan: int = 5):
+        self.tree = ttk.Treeview(master, columns=columns, show=show, selectmode='extended')
+        self.store = ColumnStore()
+        self.size_formatter = size_formatter
+        self.overscan = overscan
+
+        self.order = array('l')
+        self.offset = 0
+        # 当前排序方式，以及按它排好序的文件夹、文件下标；_sorted 之后的条目尚未排序
+        self._sort_key = "name"
+        self._sort_reverse = False
+        self._folder_order: List[int] = []
+        self._file_order: List[int] = []
+        self._sorted = 0
+        # 小写名称，按名称排序时使用，随条目追加
+        self._name_keys: List[str] = []
+        self._selected = set()
+        self._yscrollcommand = None
+        self._row_height = int(ttk.Style().lookup('Treeview', 'rowheight') or 20)
+        self._render_pending = False
+        # 格式化后的显示文本缓存，下标与 store 一致
+        self._size_text: List[Optional[str]] = []
+        self._time_text: List[Optional[str]] = []
+
+        self.tree.bind("<Configure>", lambda e: self._schedule_render())
+        self.tree.bind("<<TreeviewSelect>>", self._on_select)
+        self.tree.bind("<ButtonPress-1>", self._on_click, add="+")
+        self.tree.bind("<MouseWheel>", self._on_mousewheel)
+        self.tree.bind("<Button-4>", lambda e: self._scroll_by(-3))
+        self.tree.bind("<Button-5>", lambda e: self._scroll_by(3))
+        for key, delta in (("<Up>", -1), ("<Down>", 1), ("<Prior>", "-page"), ("<Next>", "page"),
+                           ("<Home>", "home"), ("<End>", "end")):
+            self.tree.bind(key, lambda e, d=delta: self._on_key(d))
+
+    # ---- 与 ttk.Treeview 兼容的接口 ----
+
+    def heading(self, *args, **kwargs):
+        return self.tree.heading(*args, **kwargs)
+
+    def column(self, *args, **kwargs):
+        return self.tree.column(*args, **kwargs)
+
+    def grid(self, *args, **kwargs):
+        return self.tree.grid(*args, **kwargs)
+
+    def bind(self, *args, **kwargs):
+        return self.tree.bind(*args, **kwargs)
+
+    def configure(self, yscrollcommand=None, **kwargs):
+        if yscrollcommand is not None:
+            self._yscrollcommand = yscrollcommand
+        if kwargs:
+            self.tree.configure(**kwargs)
+
+    def identify_row(self, y: int) -> str:
+        return self.tree.identify_row(y)
+
+    def selection(self):
+        positions = {index: pos for pos, index in enumerate(self.order)} if len(self._selected) > 1 else {}
+        return tuple(str(index) for index in sorted(self._selected, key=lambda i: positions.get(i, 0)))
+
+    def selection_set(self, *items):
+        self._selected = {int(item) for item in items}
+        self._render()
+
+    def item(self, iid, option: Optional[str] = None):
+        index = int(iid)
+        icon = FOLDER_ICON if self.store.is_folder[index] else FILE_ICON
+        text = f"{icon} {self.store.names[index]}"
+        if option == "text":
+            return text
+        return {'text': text, 'values': self._row_values(index)}
+
+    def yview(self, *args):
+        if not args:
+            return self._fractions()
+        if args[0] == 'moveto':
+            self._scroll_to(int(float(args[1]) * len(self.order)))
+        elif args[0] == 'scroll':
+            amount = int(args[1])
+            if args[2] == 'pages':
+                amount *= self._visible_rows()
+            self._scroll_by(amount)
+
+    # ---- 数据 ----
+
+    def _reset_order(self):
+        self.order = array('l')
+        self._folder_order = []
+        self._file_order = []
+        self._sorted = 0
+
+    def clear(self):
+        self.store.clear()
+        self._name_keys = []
+        self._reset_order()
+        self.offset = 0
+        self._selected.clear()
+        self._size_text = []
+        self._time_text = []
+        self._render()
+
+    def set_items(self, folders: List[Dict], files: List[Dict]):
+        self.store.clear()
+        self.store.append(folders, files)
+        self._name_keys = [name.lower() for name in self.store.names]
+        self._reset_order()
+        self._size_text = [None] * len(self.store)
+        self._time_text = [None] * len(self.store)
+        self._selected.clear()
+        self.offset = 0
+
+    def append_items(self, folders: List[Dict], files: List[Dict]):
+        """追加一批条目（分页加载时使用），保留当前选择和滚动位置，需再调用 sort_new_items 刷新显示"""
+        self.store.append(folders, files)
+        self._name_keys.extend(name.lower() for name in self.store.names[len(self._name_keys):])
+        added = len(self.store) - len(self._size_text)
+        self._size_text.extend([None] * added)
+        self._time_text.extend([None] * added)
+
+    def folder_paths(self, missing_only: bool = True) -> List[str]:
+        """当前列表中文件夹的完整路径，missing_only 时只返回尚未填入大小的"""
+        store = self.store
+        return [store.full_paths[i] for i in range(len(store))
+                if store.is_folder[i] and (not missing_only or store.sizes[i] < 0)]
+
+    def set_folder_sizes(self, sizes: Dict[str, int]):
+        """按完整路径填入文件夹大小（后台统计完成后调用），需再调用 sort 或 refresh 刷新显示"""
+        store = self.store
+        for i in range(len(store)):
+            if store.is_folder[i]:
+                size = sizes.get(store.full_paths[i])
+                if size is not None:
+                    store.sizes[i] = size
+
+    def refresh(self):
+        self._render()
+
+    def _sort_column(self, sort_key: str):
+        if sort_key == "size":
+            return self.store.sizes
+        if sort_key == "modified":
+            return self.store.mtimes
+        if sort_key == "type":
+            return self.store.is_folder
+        return self._name_keys
+
+    def sort(self, sort_key: str = "name", reverse: bool = False):
+        """文件夹始终排在文件前面，各自按指定列排序（全部重新排序，排序方式或排序列的值变化时使用）"""
+        self._sort_key = sort_key
+        self._sort_reverse = reverse
+        self._folder_order = []
+        self._file_order = []
+        self._sorted = 0
+        self.sort_new_items()
+
+    def sort_new_items(self):
+        """按当前排序方式把 append_items 追加的条目排序后归并进已排好序的行，已有的行不重新排序"""
+        store = self.store
+        key = self._sort_column(self._sort_key).__getitem__
+        reverse = self._sort_reverse
+        added = range(self._sorted, len(store))
+        folders = [i for i in added if store.is_folder[i]]
+        files = [i for i in added if not store.is_folder[i]]
+        # 已有的行是一段有序序列，timsort 只需排序新条目再线性归并；排序是稳定的，结果与整体重新排序相同
+        for order, new in ((self._folder_order, folders), (self._file_order, files)):
+            if new:
+                order.extend(new)
+                order.sort(key=key, reverse=reverse)
+        self._sorted = len(store)
+        self.order = array('l', self._folder_order + self._file_order)
+        self._render()
+
+    # ---- 渲染 ----
+
+    def _row_values(self, index: int):
+        if self.store.is_folder[index]:
+            size = self.store.sizes[index]
+            return ("", "文件夹", self.size_formatter(size) if size >= 0 else "", "")
+
+        size_text = self._size_text[index]
+        if size_text is None:
+            size_text = self._size_text[index] = self.size_formatter(self.store.sizes[index])
+        time_text = self._time_text[index]
+        if time_text is None:
+            mtime = datetime.fromtimestamp(self.store.mtimes[index], timezone.utc)
+            time_text = self._time_text[index] = mtime.strftime("%Y-%m-%d %H:%M")
+        return ("", "文件", size_text, time_text)
+
+    def _visible_rows(self) -> int:
+        height = self.tree.winfo_height()
+        # 减去表头高度
+        return max(1, (height - self._row_height) // self._row_height)
+
+    def _fractions(self):
+        total = len(self.order)
+        if not total:
+            return 0.0, 1.0
+        visible = self._visible_rows()
+        return self.offset / total, min(1.0, (self.offset + visible) / total)
+
+    def _schedule_render(self):
+        if not self._render_pending:
+            self._render_pending = True
+            self.tree.after_idle(self._render)
+
+    def _render(self):
+        self._render_pending = False
+        visible = self._visible_rows()
+        total = len(self.order)
+        self.offset = max(0, min(self.offset, total - visible))
+
+        children = self.tree.get_children()
+        if children:
+            self.tree.delete(*children)
+
+        window = self.order[self.offset:self.offset + visible + self.overscan]
+        for index in window:
+            icon = FOLDER_ICON if self.store.is_folder[index] else FILE_ICON
+            self.tree.insert("", "end", iid=str(index), text=f"{icon} {self.store.names[index]}",
+                             values=self._row_values(index),
+                             tags=("folder" if self.store.is_folder[index] else "file",))
+
+        visible_selected = [str(index) for index in window if index in self._selected]
+        self.tree.selection_set(visible_selected)
+        self.tree.yview_moveto(0)
+
+        if self._yscrollcommand:
+            self._yscrollcommand(*self._fractions())
+
+    def _scroll_to(self, offset: int):
+        self.offset = max(0, offset)
+        self._render()
+
+    def _scroll_by(self, rows: int):
+        self._scroll_to(self.offset + rows)
+        return "break"
+
+    def _on_mousewheel(self, event):
+        return self._scroll_by(-3 if event.delta > 0 else 3)
+
+    def _on_click(self, event):
+        # 不带 Ctrl/Shift 的单击会替换选择，清除滚出可见区域的已选条目
+        if not event.state & 0x0005:
+            self._selected.clear()
+
+    def _on_select(self, event):
+        window = {int(iid) for iid in self.tree.get_children()}
+        current = {int(iid) for iid in self.tree.selection()}
+        self._selected = (self._selected - window) | current
+
+    def _on_key(self, delta):
+        total = len(self.order)
+        if not total:
+            return "break"
+        focus = self.tree.focus()
+        position = self.order.index(int(focus)) if focus else self.offset
+        visible = self._visible_rows()
+        if delta == "home":
+            position = 0
+        elif delta == "end":
+            position = total - 1
+        elif delta == "page":
+            position += visible
+        elif delta == "-page":
+            position -= visible
+        else:
+            position += delta
+        position = max(0, min(position, total - 1))
+
+        if position < self.offset:
+            self.offset = position
+        elif position >= self.offset + visible:
+            self.offset = position - visible + 1
+
+        index = self.order[position]
+        self._selected = {index}
+        self._render()
+        self.tree.focus(str(index))
+        self.tree.event_generate("<<TreeviewSelect>>")
+        return "break"